@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import date, datetime
+from enum import Enum
 from app.models import RiskLevel, LeadStatus
 
 
@@ -22,3 +23,151 @@ class TrialFilters(BaseModel):
     score_min: Optional[float] = None
     score_max: Optional[float] = None
     status: Optional[LeadStatus] = None
+    search: Optional[str] = None
+    
+    def matches(self, trial: TrialRecord) -> bool:
+        """
+        In-memory form of the predicates the SQL backend compiles into its
+        WHERE clause. Trials without states are not excluded by a state filter,
+        and `search` is a case-insensitive substring of company or email.
+        """
+        if self.start_date and trial.started < self.start_date:
+            return False
+        if self.end_date and trial.started > self.end_date:
+            return False
+        if self.states and trial.states:
+            if not any(s in self.states for s in trial.states):
+                return False
+        if self.score_min is not None and (trial.score is None or trial.score < self.score_min):
+            return False
+        if self.score_max is not None and (trial.score is None or trial.score > self.score_max):
+            return False
+        if self.status and trial.status != self.status:
+            return False
+        if self.search:
+            search = self.search.lower()
+            if search not in trial.company.lower() and search not in str(trial.email).lower():
+                return False
+        return True
+
+
+SCORE_BAND_WIDTH = 10
+UNSCORED_BAND = "unscored"
+UNRATED = "unrated"
+
+
+def score_band_label(band: Optional[int]) -> str:
+    """
+    Label for a score band index (score // SCORE_BAND_WIDTH, capped at 9).
+    """
+    if band is None:
+        return UNSCORED_BAND
+    lower = band * SCORE_BAND_WIDTH
+    upper = 100 if band >= 9 else lower + SCORE_BAND_WIDTH - 1
+    return f"{lower}-{upper}"
+
+
+def score_band(score: Optional[float]) -> str:
+    if score is None:
+        return UNSCORED_BAND
+    return score_band_label(min(max(int(score), 0) // SCORE_BAND_WIDTH, 9))
+
+
+class TrialFacets(BaseModel):
+    total: int
+    status: Dict[str, int]
+    rating: Dict[str, int]
+    state: Dict[str, int]
+    score_band: Dict[str, int]
+
+
+class ExportFormat(str, Enum):
+    CSV_GZIP = "csv.gz"
+    PARQUET = "parquet"
+
+
+class ExportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    EXPIRED = "expired"
+
+
+class ExportJob(BaseModel):
+    id: str
+    key: str
+    format: ExportFormat
+    filters: Optional[TrialFilters] = None
+    status: ExportJobStatus = ExportJobStatus.PENDING
+    rows_written: int = 0
+    total_rows: Optional[int] = None
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    heartbeat_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+
+class SeriesBucket(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class SeriesGroupBy(str, Enum):
+    STATE = "state"
+    INDUSTRY = "industry"
+    RISK_LEVEL = "risk_level"
+
+
+class SeriesPoint(BaseModel):
+    bucket_start: datetime
+    group: Optional[str] = None
+    assessment_count: int
+    avg_score: Optional[float] = None
+    score_stddev: Optional[float] = None
+    lead_count: int
+
+
+class StatisticsSeries(BaseModel):
+    bucket: SeriesBucket
+    group_by: Optional[SeriesGroupBy] = None
+    start: date
+    end: date
+    points: List[SeriesPoint]
+
+
+class FunnelSummary(BaseModel):
+    started: int
+    # Sessions that answered at least N questions, keyed by N
+    answered_at_least: Dict[int, int]
+    completed: int
+    completion_rate: float
+    # Unfinished sessions by the last question they answered
+    drop_off: Dict[str, int]
+    median_seconds_to_complete: Optional[float] = None
+    p90_seconds_to_complete: Optional[float] = None
+
+
+class AnswerSegment(str, Enum):
+    STATE = "state"
+    INDUSTRY = "industry"
+
+
+class AnswerOptionCount(BaseModel):
+    option_id: str
+    text: str
+    count: int
+    share: float
+
+
+class AnswerDistribution(BaseModel):
+    catalog_version: str
+    question_id: str
+    segment: Optional[AnswerSegment] = None
+    segment_value: Optional[str] = None
+    total: int
+    options: List[AnswerOptionCount]
@@ -1,81 +1,93 @@
-from typing import List, Optional
-from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
 import csv
 import io
-from app.models import Lead, AssessmentResult
-from app.admin_models import TrialRecord, TrialFilters
+import os
+import zlib
+from app.admin_models import TrialRecord, TrialFilters, TrialFacets
+from app.cache import cache_registry
 from app.database import db
 
+FACETS_CACHE_TTL_SECONDS = float(os.getenv("FACETS_CACHE_TTL_SECONDS", "30"))
+
+facets_cache = cache_registry.create("trial_facets", 256, FACETS_CACHE_TTL_SECONDS)
+
+
+def get_trials(filters: Optional[TrialFilters] = None, limit: Optional[int] = None, offset: int = 0) -> List[TrialRecord]:
+    """
+    Trials newest first. Filtering, sorting and pagination happen in the
+    database backend.
+    """
+    return db.query_trials(filters, limit=limit, offset=offset)
+
+
+def get_trial_facets(filters: Optional[TrialFilters] = None) -> TrialFacets:
+    """
+    Trial counts by status, rating, state and score band for the given
+    filters. Results are cached for a short TTL, keyed by the filter set.
+    """
+    key = filters.model_dump_json() if filters else ""
+    facets = facets_cache.get(key)
+    if facets is None:
+        facets = db.trial_facets(filters)
+        facets_cache.set(key, facets)
+    return facets
 
-def get_trials(filters: Optional[TrialFilters] = None) -> List[TrialRecord]:
-    leads = db.get_all_leads()
-    assessments = {a.id: a for a in db.get_all_assessments()}
-    
-    trials = []
-    for lead in leads:
-        assessment = assessments.get(lead.id)
-        
-        completed = None
-        if assessment:
-            completed = assessment.submission_date
-        
-        trial = TrialRecord(
-            email=lead.email,
-            company=lead.company_name,
-            states=lead.operating_states,
-            score=lead.overall_score,
-            rating=lead.overall_risk_level,
-            started=lead.submission_date,
-            completed=completed,
-            status=lead.status
-        )
-        
-        if filters:
-            if filters.start_date and trial.started < filters.start_date:
-                continue
-            if filters.end_date and trial.started > filters.end_date:
-                continue
-            if filters.states and trial.states:
-                if not any(s in filters.states for s in trial.states):
-                    continue
-            if filters.score_min is not None and (trial.score is None or trial.score < filters.score_min):
-                continue
-            if filters.score_max is not None and (trial.score is None or trial.score > filters.score_max):
-                continue
-            if filters.status and trial.status != filters.status:
-                continue
-        
-        trials.append(trial)
-    
-    trials.sort(key=lambda x: x.started, reverse=True)
-    return trials
 
+CSV_HEADER = [
+    "Email",
+    "Company",
+    "States",
+    "Score",
+    "Rating",
+    "Started",
+    "Completed",
+    "Status"
+]
 
-def export_trials_csv(trials: List[TrialRecord]) -> str:
+
+def trial_csv_row(trial: TrialRecord) -> list:
+    return [
+        trial.email,
+        trial.company,
+        ",".join(trial.states) if trial.states else "",
+        trial.score if trial.score is not None else "",
+        trial.rating.value if trial.rating else "",
+        trial.started.isoformat(),
+        trial.completed.isoformat() if trial.completed else "",
+        trial.status.value
+    ]
+
+
+def stream_trials_csv(filters: Optional[TrialFilters] = None, chunk_rows: int = 500) -> Iterator[bytes]:
+    """
+    Yield the trials export as CSV in chunks of `chunk_rows` rows. Rows are
+    read from a server-side cursor, so memory use does not grow with the
+    number of trials.
+    """
     output = io.StringIO()
     writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
     
-    writer.writerow([
-        "Email",
-        "Company",
-        "States",
-        "Score",
-        "Rating",
-        "Started",
-        "Completed",
-        "Status"
-    ])
+    pending = 0
+    for trial in db.iter_trials(filters, batch_size=chunk_rows):
+        writer.writerow(trial_csv_row(trial))
+        pending += 1
+        if pending >= chunk_rows:
+            yield output.getvalue().encode("utf-8")
+            output.seek(0)
+            output.truncate()
+            pending = 0
     
-    for trial in trials:
-        writer.writerow([
-            trial.email,
-            trial.company,
-            ",".join(trial.states) if trial.states else "",
-            trial.score if trial.score is not None else "",
-            trial.rating.value if trial.rating else "",
-            trial.started.isoformat(),
-            trial.completed.isoformat() if trial.completed else "",
-            trial.status.value
-        ])
-    
-    return output.getvalue()
+    yield output.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip a stream of byte chunks on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Tuple
+
+from app.admin_models import AnswerDistribution, AnswerOptionCount, AnswerSegment
+from app.models import Answer, Question
+from app.questions_data import get_question_by_id
+
+# (segment, segment value); ("", "") is every respondent.
+SegmentKey = Tuple[str, str]
+# (catalog version, question id, segment, segment value) -> option counts
+AnswerCountKey = Tuple[str, str, str, str]
+
+ALL_RESPONDENTS: SegmentKey = ("", "")
+
+
+def answer_segments(states: Optional[List[str]], industry: Optional[str]) -> List[SegmentKey]:
+    """
+    Segments one respondent counts in: everyone, each operating state and
+    their industry.
+    """
+    segments = [ALL_RESPONDENTS]
+    segments += [(AnswerSegment.STATE.value, state) for state in sorted(set(states or []))]
+    if industry:
+        segments.append((AnswerSegment.INDUSTRY.value, industry))
+    return segments
+
+
+def chosen_options(answers: List[Answer]) -> List[Tuple[str, str]]:
+    """
+    (question id, option id) pairs for answers that pick one of the
+    question's options, once per question.
+    """
+    chosen = {}
+    for answer in answers:
+        question = get_question_by_id(answer.question_id)
+        if question and question.options and any(option.id == answer.answer_value for option in question.options):
+            chosen[answer.question_id] = answer.answer_value
+    return sorted(chosen.items())
+
+
+def build_distribution(
+    catalog_version: str,
+    question: Question,
+    counts: Dict[str, int],
+    segment: Optional[AnswerSegment] = None,
+    segment_value: Optional[str] = None,
+) -> AnswerDistribution:
+    total = sum(counts.values())
+    return AnswerDistribution(
+        catalog_version=catalog_version,
+        question_id=question.id,
+        segment=segment,
+        segment_value=segment_value,
+        total=total,
+        options=[
+            AnswerOptionCount(
+                option_id=option.id,
+                text=option.text,
+                count=counts.get(option.id, 0),
+                share=counts.get(option.id, 0) / total if total else 0.0,
+            )
+            for option in question.options or []
+        ],
+    )
@@ -1,9 +1,9 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 import uuid
 from app.models import (
     AssessmentSubmission, AssessmentResult, CategoryScore, 
-    RiskLevel, ComplianceCategory, Lead, Answer, CATEGORY_WEIGHTS
+    RiskLevel, ComplianceCategory, Lead, LeadStatus, Answer, CATEGORY_WEIGHTS
 )
 from app.questions_data import get_all_questions, get_question_by_id
 
@@ -84,7 +84,7 @@ def get_category_issues(category: ComplianceCategory, answers: List[Answer]) ->
     return issues
 
 
-def calculate_assessment_result(submission: AssessmentSubmission) -> AssessmentResult:
+def calculate_assessment_result(submission: AssessmentSubmission, assessment_id: Optional[str] = None) -> AssessmentResult:
     questions = get_all_questions()
     
     category_data: Dict[ComplianceCategory, Dict] = {}
@@ -153,7 +153,7 @@ def calculate_assessment_result(submission: AssessmentSubmission) -> AssessmentR
         priority_actions.append("Consider periodic reviews to ensure ongoing compliance")
     
     result = AssessmentResult(
-        id=str(uuid.uuid4()),
+        id=assessment_id or str(uuid.uuid4()),
         submission_date=datetime.now(),
         company_name=submission.company_name,
         contact_name=submission.contact_name,
@@ -169,12 +169,30 @@ def calculate_assessment_result(submission: AssessmentSubmission) -> AssessmentR
     return result
 
 
-def create_lead_from_submission(submission: AssessmentSubmission, result: AssessmentResult) -> Lead:
+def create_lead_from_submission(submission: AssessmentSubmission, result: AssessmentResult, started: Optional[Lead] = None) -> Lead:
+    """
+    Lead for a submitted assessment. A session begun with
+    /assessments/start completes its `started` lead, keeping the start
+    time and the details given there; its name and email are taken from
+    the submission, like the assessment's.
+    """
     high_risk_categories = [
         cs.category.value for cs in result.category_scores 
         if cs.risk_level in [RiskLevel.HIGH_RISK, RiskLevel.MODERATE]
     ]
     
+    if started is not None:
+        return started.model_copy(update={
+            "company_name": result.company_name,
+            "contact_name": result.contact_name,
+            "email": result.email,
+            "phone": submission.phone,
+            "status": LeadStatus.COMPLETED,
+            "overall_score": result.overall_score,
+            "overall_risk_level": result.overall_risk_level,
+            "high_risk_categories": high_risk_categories,
+        })
+    
     lead = Lead(
         id=result.id,
         company_name=submission.company_name,
@@ -185,6 +203,7 @@ def create_lead_from_submission(submission: AssessmentSubmission, result: Assess
         industry=submission.industry,
         submission_date=result.submission_date,
         overall_score=result.overall_score,
+        status=LeadStatus.COMPLETED,
         overall_risk_level=result.overall_risk_level,
         high_risk_categories=high_risk_categories
     )
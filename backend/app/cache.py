@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+try:
+    import psycopg
+except Exception:  # noqa: F401
+    psycopg = None  # type: ignore
+
+try:
+    from sqlalchemy import text
+except Exception:  # noqa: F401
+    text = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Invalidation key that clears a whole cache.
+ALL_KEYS = "*"
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded LRU cache with a per-entry time-to-live.
+    Tracks hits, misses and evictions so hit rates can be reported.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: Optional[float] = 300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Store `value`. Pass the `generation` read before loading the value
+        from the database; if anything was invalidated in the meantime the
+        value may already be stale and is not cached.
+        """
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class CacheRegistry:
+    """
+    Named caches for one process, plus an optional channel that fans
+    invalidations out to the other workers.
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, LRUCache] = {}
+        self.channel: Optional["PostgresInvalidationChannel"] = None
+
+    def create(self, name: str, max_entries: int, ttl_seconds: Optional[float]) -> LRUCache:
+        cache = LRUCache(name, max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.caches[name] = cache
+        return cache
+
+    def invalidate_local(self, name: str, key: Hashable) -> None:
+        cache = self.caches.get(name)
+        if cache is None:
+            return
+        if key == ALL_KEYS:
+            cache.clear()
+        else:
+            cache.invalidate(key)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [cache.stats() for cache in self.caches.values()]
+
+
+class PostgresInvalidationChannel:
+    """
+    Cross-worker invalidation over Postgres LISTEN/NOTIFY.
+
+    Writers publish with `publish_invalidation()` inside their transaction, so
+    other workers only hear about a change once it has been committed.
+    A daemon thread in every worker listens and drops the matching keys.
+    """
+
+    def __init__(self, dsn: str, registry: CacheRegistry, channel: str = "cache_invalidation"):
+        self.dsn = dsn
+        self.registry = registry
+        self.channel = channel
+        self.sender_id = uuid.uuid4().hex
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def payload(self, name: str, key: Hashable) -> str:
+        return json.dumps({"sender": self.sender_id, "cache": name, "key": str(key)})
+
+    def handle(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("sender") == self.sender_id:
+            return
+        self.registry.invalidate_local(message.get("cache", ""), message.get("key"))
+
+    def start(self) -> None:
+        if psycopg is None or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    # Anything published while we were disconnected is lost,
+                    # so start from a clean slate after every (re)connect.
+                    for cache in self.registry.caches.values():
+                        cache.clear()
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self.handle(notify.payload)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+                self._stop.wait(5)
+
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+cache_registry = CacheRegistry()
+
+
+def configure_invalidation_channel(dsn: Optional[str]) -> Optional[PostgresInvalidationChannel]:
+    """
+    Enable the LISTEN/NOTIFY channel when CACHE_INVALIDATION=postgres.
+    """
+    if not dsn or os.getenv("CACHE_INVALIDATION", "").lower() != "postgres" or psycopg is None:
+        return None
+    cache_registry.channel = PostgresInvalidationChannel(dsn, cache_registry)
+    return cache_registry.channel
+
+
+def publish_invalidation(session: Any, name: str, key: Hashable) -> None:
+    """
+    Queue a NOTIFY for `key` on the given SQLAlchemy session. Postgres
+    delivers it when the surrounding transaction commits.
+    """
+    channel = cache_registry.channel
+    if channel is None or text is None:
+        return
+    session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel.channel, "payload": channel.payload(name, key)},
+    )
@@ -0,0 +1,38 @@
+from typing import Dict, Optional, Tuple
+from app.models import ChangeEntity, ChangeOp, ChangePage
+from app.database import db
+
+MAX_PAGE_SIZE = 1000
+
+_LOADERS = {
+    ChangeEntity.LEAD: lambda entity_id: db.get_lead(entity_id),
+    ChangeEntity.ASSESSMENT: lambda entity_id: db.get_assessment(entity_id),
+    ChangeEntity.AUDIT_LOG: lambda entity_id: db.get_audit_log(entity_id),
+}
+
+
+def get_change_page(since: int = 0, limit: int = 500) -> ChangePage:
+    """
+    Changes after the `since` cursor, oldest first. Upserts carry the
+    current state of the record; deletions (including privacy deletions)
+    are tombstones with no data. Pass `next_cursor` back as `since` to
+    continue.
+    """
+    changes = db.get_changes(since, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    current: Dict[Tuple[ChangeEntity, str], Optional[dict]] = {}
+    page = []
+    for change in changes:
+        change = change.model_copy()
+        if change.op == ChangeOp.UPSERT:
+            key = (change.entity, change.entity_id)
+            if key not in current:
+                record = _LOADERS[change.entity](change.entity_id)
+                current[key] = record.model_dump(mode="json") if record else None
+            change.data = current[key]
+        page.append(change)
+
+    next_cursor = changes[-1].seq if changes else since
+    return ChangePage(changes=page, next_cursor=next_cursor, has_more=has_more)
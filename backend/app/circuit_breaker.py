@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for calls to an external provider.
+
+    Closed, it tracks the outcome of the last `window` calls and opens when
+    at least `min_calls` were made and the failure rate reaches
+    `failure_rate`. Open, calls are refused for `open_seconds`. After that
+    it is half open: one probe call at a time is let through, and the
+    breaker closes on a successful probe or opens again on a failed one.
+    """
+
+    def __init__(self, name: str, window: int, min_calls: int, failure_rate: float, open_seconds: float):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes: deque = deque(maxlen=window)
+        self._state = BreakerState.CLOSED
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _cooled_down(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.open_seconds
+
+    def _transition(self, state: BreakerState) -> None:
+        if state == self._state:
+            return
+        logger.warning(f"Circuit breaker {self.name} {self._state.value} -> {state.value}")
+        self._state = state
+        if state == BreakerState.OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == BreakerState.CLOSED:
+            self._outcomes.clear()
+            self._opened_at = None
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            if self._state == BreakerState.OPEN and self._cooled_down():
+                return BreakerState.HALF_OPEN
+            return self._state
+
+    def capacity(self, limit: int) -> int:
+        """
+        How many calls may be started now, out of `limit` wanted: all of
+        them when closed, one probe when half open, none when open.
+        """
+        state = self.state
+        if state == BreakerState.CLOSED:
+            return limit
+        if state == BreakerState.HALF_OPEN:
+            with self._lock:
+                return 0 if self._probe_in_flight else min(limit, 1)
+        return 0
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead. A call allowed while half open is the
+        probe and must report its outcome with `record`.
+        """
+        with self._lock:
+            if self._state == BreakerState.OPEN and self._cooled_down():
+                self._transition(BreakerState.HALF_OPEN)
+            if self._state == BreakerState.CLOSED:
+                return True
+            if self._state == BreakerState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self._state == BreakerState.HALF_OPEN:
+                self._probe_in_flight = False
+                self._transition(BreakerState.CLOSED if success else BreakerState.OPEN)
+                return
+            if self._state == BreakerState.OPEN:
+                # A call started before the breaker opened.
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(BreakerState.OPEN)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._transition(BreakerState.CLOSED)
+            self._outcomes.clear()
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            retry_in = None
+            if state == BreakerState.OPEN:
+                retry_in = round(self.open_seconds - (time.monotonic() - self._opened_at), 1)
+            return {
+                "name": self.name,
+                "state": state.value,
+                "window_calls": calls,
+                "window_failure_rate": failures / calls if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_in_seconds": retry_in,
+            }
@@ -1,42 +1,351 @@
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
-from app.models import AssessmentResult, Lead, InProgressAssessment, AuditLog
+import gzip
+import json
+import threading
+import uuid
+from bisect import bisect_right
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from app.models import AssessmentResult, Lead, InProgressAssessment, AuditLog, LeadStatus, RiskLevel, EmailStatus, ChangeEntity, ChangeOp, ChangeRecord, OutboxKind, OutboxMessage, OutboxStatus
+from app.admin_models import TrialRecord, TrialFilters, TrialFacets, score_band, score_band_label, UNRATED, SCORE_BAND_WIDTH
+from app.search import NgramIndex
+from app.answer_counts import AnswerCountKey, SegmentKey
+from app.funnel import FunnelKey, TIME_TO_COMPLETE, funnel_delta, rebuild_funnel_counters, seconds_since, session_funnel
+from app.sketches import TDigest, lock_sketch_day, merge_sketches, result_metrics, rebuild_day_score_sketches, rebuild_score_sketches
+from app.rollups import DailyRollup, RollupKey, RollupValues, ROLLUP_MEASURES, SERIES_CACHE, assessment_rollup, lead_rollup, rollup_day, rollup_hour, rollup_delta, touches_past_days, accumulate, to_rollups, rebuild_daily_rollups
+from app.cache import cache_registry, configure_invalidation_channel, publish_invalidation, ALL_KEYS, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
 
 try:
-    from sqlalchemy import create_engine, Column, String, DateTime, Integer
+    from sqlalchemy import create_engine, event, select, func, case, and_, or_, text, true, tuple_, type_coerce, Column, Index, String, Date, DateTime, BigInteger, Integer, SmallInteger, Float, Boolean, LargeBinary, Uuid, Enum
     from sqlalchemy.types import JSON
+    from sqlalchemy.dialects.postgresql import JSONB, array, insert as pg_insert
     from sqlalchemy.orm import declarative_base, sessionmaker
 except Exception:  # noqa: F401
     create_engine = None  # type: ignore
+    select = None  # type: ignore
+    func = None  # type: ignore
+    case = None  # type: ignore
+    and_ = None  # type: ignore
+    or_ = None  # type: ignore
+    text = None  # type: ignore
+    true = None  # type: ignore
+    tuple_ = None  # type: ignore
+    type_coerce = None  # type: ignore
+    Index = None  # type: ignore
+    JSONB = None  # type: ignore
+    pg_insert = None  # type: ignore
+    array = None  # type: ignore
     Column = None  # type: ignore
     String = None  # type: ignore
+    Date = None  # type: ignore
     DateTime = None  # type: ignore
+    Float = None  # type: ignore
+    BigInteger = None  # type: ignore
     Integer = None  # type: ignore
+    SmallInteger = None  # type: ignore
+    Boolean = None  # type: ignore
+    LargeBinary = None  # type: ignore
+    Uuid = None  # type: ignore
+    Enum = None  # type: ignore
     JSON = None  # type: ignore
     declarative_base = None  # type: ignore
     sessionmaker = None  # type: ignore
 
 
+# "gzip" or "identity"; results smaller than the threshold are never compressed.
+RESULT_JSON_COMPRESSION = os.getenv("RESULT_JSON_COMPRESSION", "gzip").lower()
+RESULT_JSON_COMPRESSION_MIN_BYTES = int(os.getenv("RESULT_JSON_COMPRESSION_MIN_BYTES", "1024"))
+
+
+def encode_result_json(assessment: AssessmentResult) -> Tuple[bytes, str]:
+    """
+    Serialize an assessment to its canonical API response bytes, compressed
+    when configured. Returns (body, content encoding).
+    """
+    body = assessment.model_dump_json().encode("utf-8")
+    if RESULT_JSON_COMPRESSION == "gzip" and len(body) >= RESULT_JSON_COMPRESSION_MIN_BYTES:
+        return gzip.compress(body, compresslevel=6, mtime=0), "gzip"
+    return body, "identity"
+
+
+def decode_result_json(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+def parse_uuid(value: str) -> Optional[uuid.UUID]:
+    """
+    Parse an API id into a UUID; ids that are not UUIDs cannot exist in the
+    SQL tables, so callers treat None as "not found".
+    """
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _outbox_claimable(message: OutboxMessage, now: datetime) -> bool:
+    """
+    Due pending messages, and messages whose dispatcher lease ran out
+    without a result (e.g. the worker died mid-send).
+    """
+    if message.status == OutboxStatus.PENDING:
+        return message.next_attempt_at <= now
+    return message.status == OutboxStatus.SENDING and message.locked_until is not None and message.locked_until <= now
+
+
+def _finish_outbox_message(message, error: Optional[str], retry_at: Optional[datetime]) -> None:
+    """
+    Record a delivery outcome on an outbox message or row: sent when there
+    is no error, otherwise pending again at `retry_at`, or failed for good
+    when there is no retry.
+    """
+    message.locked_until = None
+    message.last_error = error
+    if error is None:
+        message.status = OutboxStatus.SENT
+        message.sent_at = datetime.now()
+    elif retry_at is not None:
+        message.status = OutboxStatus.PENDING
+        message.next_attempt_at = retry_at
+    else:
+        message.status = OutboxStatus.FAILED
+
+
+def _requeue_outbox_message(message, expires_at: datetime) -> None:
+    """
+    Make a failed outbox message or row due now, with retries allowed
+    until `expires_at`. The attempt count and last error are kept.
+    """
+    message.status = OutboxStatus.PENDING
+    message.next_attempt_at = datetime.now()
+    message.expires_at = expires_at
+
+
+def _batch_ready(buffered: List, max_batch: int, window_seconds: float, now: datetime) -> bool:
+    """
+    Buffered notifications (oldest first, at most `max_batch`) are sent as
+    a batch once there are `max_batch` of them or the oldest has waited
+    for the coalescing window.
+    """
+    if not buffered:
+        return False
+    return len(buffered) >= max_batch or buffered[0].created_at <= now - timedelta(seconds=window_seconds)
+
+
+def _audit_log_outcome(message) -> Dict:
+    status = {
+        OutboxStatus.SENT: EmailStatus.SUCCESS,
+        OutboxStatus.FAILED: EmailStatus.FAILED,
+    }.get(message.status, EmailStatus.PENDING)
+    return {"email_status": status, "attempts": message.attempts, "error_message": message.last_error}
+
+
 class InMemoryDatabase:
     def __init__(self):
         self.assessments: Dict[str, AssessmentResult] = {}
         self.leads: Dict[str, Lead] = {}
         self.in_progress_assessments: Dict[str, InProgressAssessment] = {}
         self.audit_logs: Dict[str, AuditLog] = {}
+        self.search_index = NgramIndex()
+        self.change_log: List[ChangeRecord] = []
+        self._change_seq = 0
+        self.daily_rollups: Dict[RollupKey, RollupValues] = {}
+        self.daily_sketches: Dict[Tuple[date, str], TDigest] = {}
+        self.funnel_counters: Dict[FunnelKey, int] = {}
+        self.completion_times = TDigest()
+        self.answer_counts: Dict[AnswerCountKey, Counter] = {}
+        self.outbox: Dict[str, OutboxMessage] = {}
+        self._outbox_lock = threading.Lock()
+    
+    def _record_change(self, entity: ChangeEntity, entity_id: str, op: ChangeOp) -> None:
+        self._change_seq += 1
+        self.change_log.append(ChangeRecord(
+            seq=self._change_seq, entity=entity, entity_id=entity_id, op=op, changed_at=datetime.now()
+        ))
+    
+    def get_changes(self, since: int = 0, limit: int = 500) -> List[ChangeRecord]:
+        start = bisect_right(self.change_log, since, key=lambda change: change.seq)
+        return self.change_log[start:start + limit]
+    
+    @staticmethod
+    def _assessment_rollup(assessment: Optional[AssessmentResult], lead: Optional[Lead], bucket: Callable = rollup_day) -> Dict[RollupKey, RollupValues]:
+        """
+        An assessment's score counts under the states and industry of its
+        lead, which shares its id.
+        """
+        if assessment is None:
+            return {}
+        states, industry = (lead.operating_states, lead.industry) if lead else (None, None)
+        return assessment_rollup(
+            assessment.submission_date, assessment.overall_percentage, assessment.overall_risk_level, states, industry, bucket=bucket
+        )
+    
+    @staticmethod
+    def _lead_rollup(lead: Optional[Lead], bucket: Callable = rollup_day) -> Dict[RollupKey, RollupValues]:
+        if lead is None:
+            return {}
+        return lead_rollup(lead.submission_date, lead.operating_states, lead.industry, lead.overall_risk_level, bucket=bucket)
+    
+    def _respondent_rollup(self, assessment: Optional[AssessmentResult], lead: Optional[Lead]) -> Dict[RollupKey, RollupValues]:
+        totals = self._assessment_rollup(assessment, lead)
+        accumulate(totals, self._lead_rollup(lead))
+        return totals
     
-    def save_assessment(self, assessment: AssessmentResult) -> AssessmentResult:
+    def _apply_rollup_change(self, before: Dict[RollupKey, RollupValues], after: Dict[RollupKey, RollupValues]) -> None:
+        accumulate(self.daily_rollups, rollup_delta(before, after))
+        if touches_past_days(before, after):
+            cache_registry.invalidate_local(SERIES_CACHE, ALL_KEYS)
+    
+    def get_rollups(self, start_day: Optional[date] = None, end_day: Optional[date] = None) -> List[DailyRollup]:
+        return to_rollups({
+            key: values for key, values in self.daily_rollups.items()
+            if (start_day is None or key[0] >= start_day) and (end_day is None or key[0] <= end_day)
+        })
+    
+    def get_hourly_totals(self, start_day: date, end_day: date) -> Dict[RollupKey, RollupValues]:
+        """
+        Rollup totals keyed by hour instead of day, computed from the source
+        records for a bounded range of days.
+        """
+        totals: Dict[RollupKey, RollupValues] = {}
+        for assessment in self.assessments.values():
+            if start_day <= rollup_day(assessment.submission_date) <= end_day:
+                accumulate(totals, self._assessment_rollup(assessment, self.leads.get(assessment.id), bucket=rollup_hour))
+        for lead in self.leads.values():
+            if start_day <= rollup_day(lead.submission_date) <= end_day:
+                accumulate(totals, self._lead_rollup(lead, bucket=rollup_hour))
+        return totals
+    
+    def aggregate_statistics(self, since: Optional[datetime] = None, top_states: int = 5) -> Tuple[int, float, List[Tuple[str, int]]]:
+        """
+        Assessment count, average score and most common lead states for
+        records submitted since `since`, in one pass over each collection.
+        """
+        count = 0
+        total_score = 0.0
+        for assessment in self.assessments.values():
+            if since is None or assessment.submission_date >= since:
+                count += 1
+                total_score += assessment.overall_percentage
+        state_counter = Counter()
+        for lead in self.leads.values():
+            if lead.operating_states and (since is None or lead.submission_date >= since):
+                state_counter.update(set(lead.operating_states))
+        return count, (total_score / count if count else 0.0), state_counter.most_common(top_states)
+    
+    def rebuild_rollups(self) -> int:
+        totals: Dict[RollupKey, RollupValues] = {}
+        for assessment in self.assessments.values():
+            accumulate(totals, self._assessment_rollup(assessment, self.leads.get(assessment.id)))
+        for lead in self.leads.values():
+            accumulate(totals, self._lead_rollup(lead))
+        self.daily_rollups = totals
+        return len(totals)
+    
+    def _add_to_sketches(self, assessment: AssessmentResult) -> None:
+        day = rollup_day(assessment.submission_date)
+        for metric, value in result_metrics(assessment).items():
+            self.daily_sketches.setdefault((day, metric), TDigest()).add(value)
+    
+    def get_score_sketches(self, start_day: Optional[date] = None, end_day: Optional[date] = None) -> Dict[str, TDigest]:
+        return merge_sketches(
+            (metric, digest.to_dict()) for (day, metric), digest in self.daily_sketches.items()
+            if (start_day is None or day >= start_day) and (end_day is None or day <= end_day)
+        )
+    
+    def _rebuild_day_sketches(self, day: date) -> None:
+        self.daily_sketches = {key: digest for key, digest in self.daily_sketches.items() if key[0] != day}
+        for assessment in self.assessments.values():
+            if rollup_day(assessment.submission_date) == day:
+                self._add_to_sketches(assessment)
+    
+    def rebuild_sketches(self) -> int:
+        self.daily_sketches = {}
+        for assessment in self.assessments.values():
+            self._add_to_sketches(assessment)
+        return len(self.daily_sketches)
+    
+    def _session_question_ids(self, lead_id: str) -> List[str]:
+        progress = self.in_progress_assessments.get(lead_id)
+        return [answer.question_id for answer in progress.answers] if progress else []
+    
+    def _apply_funnel_change(self, before: Dict[FunnelKey, int], after: Dict[FunnelKey, int]) -> None:
+        for key, count in funnel_delta(before, after).items():
+            self.funnel_counters[key] = self.funnel_counters.get(key, 0) + count
+    
+    def get_funnel_counters(self) -> Dict[FunnelKey, int]:
+        return {key: count for key, count in self.funnel_counters.items() if count}
+    
+    def get_completion_times(self) -> TDigest:
+        return TDigest.from_dict(self.completion_times.to_dict())
+    
+    def rebuild_funnel(self) -> int:
+        self.funnel_counters = {}
+        self.completion_times = TDigest()
+        for lead in self.leads.values():
+            self._apply_funnel_change({}, session_funnel(lead.status, self._session_question_ids(lead.id)))
+            assessment = self.assessments.get(lead.id)
+            if lead.status == LeadStatus.COMPLETED and assessment and assessment.submission_date > lead.submission_date:
+                self.completion_times.add((assessment.submission_date - lead.submission_date).total_seconds())
+        return len(self.funnel_counters)
+    
+    def record_answer_counts(self, catalog_version: str, chosen: List[Tuple[str, str]], segments: List[SegmentKey]) -> None:
+        """
+        Add one respondent's answers to the counts. The counts are
+        anonymous and never decremented: submitted answers are not kept per
+        respondent, so deleting their data leaves what they added.
+        """
+        for question_id, option_id in chosen:
+            for segment, value in segments:
+                self.answer_counts.setdefault((catalog_version, question_id, segment, value), Counter())[option_id] += 1
+    
+    def get_answer_counts(self, catalog_version: str, question_ids: List[str], segment: SegmentKey) -> Dict[str, Dict[str, int]]:
+        counts = {}
+        for question_id in question_ids:
+            counter = self.answer_counts.get((catalog_version, question_id) + segment)
+            counts[question_id] = dict(counter) if counter else {}
+        return counts
+    
+    def save_assessment(self, assessment: AssessmentResult, notification: Optional[Tuple[AuditLog, OutboxMessage]] = None) -> AssessmentResult:
+        previous = self.assessments.get(assessment.id)
         self.assessments[assessment.id] = assessment
+        if notification is not None:
+            self.enqueue_outbox(notification[1], notification[0])
+        lead = self.leads.get(assessment.id)
+        self._apply_rollup_change(self._assessment_rollup(previous, lead), self._assessment_rollup(assessment, lead))
+        if previous is None:
+            self._add_to_sketches(assessment)
+        self._record_change(ChangeEntity.ASSESSMENT, assessment.id, ChangeOp.UPSERT)
         return assessment
     
     def get_assessment(self, assessment_id: str) -> Optional[AssessmentResult]:
         return self.assessments.get(assessment_id)
     
+    def get_assessment_json(self, assessment_id: str) -> Optional[Tuple[bytes, str]]:
+        assessment = self.assessments.get(assessment_id)
+        if assessment is None:
+            return None
+        return assessment.model_dump_json().encode("utf-8"), "identity"
+    
     def get_all_assessments(self) -> List[AssessmentResult]:
         return list(self.assessments.values())
     
     def save_lead(self, lead: Lead) -> Lead:
+        previous = self.leads.get(lead.id)
         self.leads[lead.id] = lead
+        assessment = self.assessments.get(lead.id)
+        self._apply_rollup_change(self._respondent_rollup(assessment, previous), self._respondent_rollup(assessment, lead))
+        previous_status = previous.status if previous else None
+        if previous_status != lead.status:
+            question_ids = self._session_question_ids(lead.id)
+            self._apply_funnel_change(session_funnel(previous_status, question_ids), session_funnel(lead.status, question_ids))
+            if previous is not None and lead.status == LeadStatus.COMPLETED:
+                self.completion_times.add(seconds_since(previous.submission_date))
+        self.search_index.add(lead.id, lead.company_name, lead.email)
+        self._record_change(ChangeEntity.LEAD, lead.id, ChangeOp.UPSERT)
         return lead
     
     def get_lead(self, lead_id: str) -> Optional[Lead]:
@@ -45,60 +354,245 @@ class InMemoryDatabase:
     def get_all_leads(self) -> List[Lead]:
         return list(self.leads.values())
     
+    def _candidate_leads(self, filters: Optional[TrialFilters]) -> Iterator[Tuple[Lead, float]]:
+        """
+        Leads to consider for the filters with their search rank. A search
+        only visits leads found through the n-gram index.
+        """
+        if filters is None or not filters.search:
+            for lead in self.leads.values():
+                yield lead, 0.0
+            return
+        for lead_id, rank in self.search_index.search(filters.search):
+            lead = self.leads.get(lead_id)
+            if lead is not None:
+                yield lead, rank
+    
+    def _filtered_trials(self, filters: Optional[TrialFilters]) -> Iterator[Tuple[TrialRecord, float]]:
+        for lead, rank in self._candidate_leads(filters):
+            assessment = self.assessments.get(lead.id)
+            trial = TrialRecord(
+                email=lead.email,
+                company=lead.company_name,
+                states=lead.operating_states,
+                score=lead.overall_score,
+                rating=lead.overall_risk_level,
+                started=lead.submission_date,
+                completed=assessment.submission_date if assessment else None,
+                status=lead.status
+            )
+            if filters is None or filters.matches(trial):
+                yield trial, rank
+    
+    def query_trials(self, filters: Optional[TrialFilters] = None, limit: Optional[int] = None, offset: int = 0) -> List[TrialRecord]:
+        ranked = list(self._filtered_trials(filters))
+        ranked.sort(key=lambda x: (x[1], x[0].started), reverse=True)
+        end = offset + limit if limit is not None else None
+        return [trial for trial, _ in ranked[offset:end]]
+    
+    def iter_trials(self, filters: Optional[TrialFilters] = None, batch_size: int = 500) -> Iterator[TrialRecord]:
+        return iter(self.query_trials(filters))
+    
+    def count_trials(self, filters: Optional[TrialFilters] = None) -> int:
+        return sum(1 for _ in self._filtered_trials(filters))
+    
+    def trial_facets(self, filters: Optional[TrialFilters] = None) -> TrialFacets:
+        total = 0
+        status, rating, state, band = Counter(), Counter(), Counter(), Counter()
+        for trial, _ in self._filtered_trials(filters):
+            total += 1
+            status[trial.status.value] += 1
+            rating[trial.rating.value if trial.rating else UNRATED] += 1
+            band[score_band(trial.score)] += 1
+            for s in set(trial.states or []):
+                state[s] += 1
+        return TrialFacets(total=total, status=status, rating=rating, state=state, score_band=band)
+    
     def save_in_progress_assessment(self, assessment: InProgressAssessment) -> InProgressAssessment:
-        self.in_progress_assessments[assessment.id] = assessment
+        before = self._session_question_ids(assessment.id)
+        self.in_progress_assessments[assessment.id] = assessment.model_copy(deep=True)
+        after = self._session_question_ids(assessment.id)
+        if before != after:
+            lead = self.leads.get(assessment.lead_id)
+            status = lead.status if lead else None
+            self._apply_funnel_change(session_funnel(status, before), session_funnel(status, after))
         return assessment
     
     def get_in_progress_assessment(self, assessment_id: str) -> Optional[InProgressAssessment]:
-        return self.in_progress_assessments.get(assessment_id)
+        progress = self.in_progress_assessments.get(assessment_id)
+        return progress.model_copy(deep=True) if progress else None
     
     def save_audit_log(self, audit_log: AuditLog) -> AuditLog:
         self.audit_logs[audit_log.id] = audit_log
+        self._record_change(ChangeEntity.AUDIT_LOG, audit_log.id, ChangeOp.UPSERT)
         return audit_log
     
     def get_audit_log(self, audit_log_id: str) -> Optional[AuditLog]:
         return self.audit_logs.get(audit_log_id)
     
+    def enqueue_outbox(self, message: OutboxMessage, audit_log: Optional[AuditLog] = None) -> OutboxMessage:
+        if audit_log is not None:
+            self.save_audit_log(audit_log)
+        with self._outbox_lock:
+            self.outbox[message.id] = message.model_copy()
+        return message
+    
+    def get_outbox_message(self, message_id: str) -> Optional[OutboxMessage]:
+        message = self.outbox.get(message_id)
+        return message.model_copy() if message else None
+    
+    def claim_outbox(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+        now = datetime.now()
+        with self._outbox_lock:
+            due = sorted(
+                (m for m in self.outbox.values() if _outbox_claimable(m, now)),
+                key=lambda m: m.next_attempt_at,
+            )[:limit]
+            for message in due:
+                message.status = OutboxStatus.SENDING
+                message.locked_until = now + timedelta(seconds=lease_seconds)
+                message.attempts += 1
+            return [message.model_copy() for message in due]
+    
+    def finish_outbox(self, message_id: str, error: Optional[str] = None, retry_at: Optional[datetime] = None) -> Optional[OutboxMessage]:
+        with self._outbox_lock:
+            message = self.outbox.get(message_id)
+            if message is None:
+                return None
+            _finish_outbox_message(message, error, retry_at)
+            for audit_log in self._outbox_audit_logs(message):
+                self.save_audit_log(audit_log.model_copy(update=_audit_log_outcome(message)))
+            return message.model_copy()
+    
+    def requeue_outbox(self, kind: Optional[OutboxKind], created_since: Optional[datetime], limit: int, expires_at: datetime) -> int:
+        with self._outbox_lock:
+            failed = sorted(
+                (
+                    m for m in self.outbox.values()
+                    if m.status == OutboxStatus.FAILED
+                    and (kind is None or m.kind == kind)
+                    and (created_since is None or m.created_at >= created_since)
+                ),
+                key=lambda m: m.created_at,
+            )[:limit]
+            for message in failed:
+                _requeue_outbox_message(message, expires_at)
+                for audit_log in self._outbox_audit_logs(message):
+                    self.save_audit_log(audit_log.model_copy(update=_audit_log_outcome(message)))
+            return len(failed)
+    
+    def coalesce_outbox(self, window_seconds: float, max_batch: int, build_batch: Callable[[List[AuditLog]], OutboxMessage]) -> Optional[OutboxMessage]:
+        now = datetime.now()
+        with self._outbox_lock:
+            buffered = sorted(
+                (m for m in self.outbox.values() if m.status == OutboxStatus.BUFFERED),
+                key=lambda m: m.created_at,
+            )[:max_batch]
+            if not _batch_ready(buffered, max_batch, window_seconds, now):
+                return None
+            audit_logs = [self.audit_logs[m.audit_log_id] for m in buffered if m.audit_log_id in self.audit_logs]
+            batch = build_batch(audit_logs)
+            self.outbox[batch.id] = batch.model_copy()
+            for message in buffered:
+                message.status = OutboxStatus.BATCHED
+                message.batch_id = batch.id
+            for audit_log in audit_logs:
+                self.save_audit_log(audit_log.model_copy(update={"batch_id": batch.id}))
+            return batch
+    
+    def _outbox_audit_logs(self, message: OutboxMessage) -> List[AuditLog]:
+        """
+        Audit logs reporting on a message: its own, or for a batch, those
+        of every notification folded into it.
+        """
+        if message.kind == OutboxKind.NOTIFICATION_BATCH:
+            return [a for a in self.audit_logs.values() if a.batch_id == message.id]
+        audit_log = self.audit_logs.get(message.audit_log_id) if message.audit_log_id else None
+        return [audit_log] if audit_log is not None else []
+    
     def get_all_audit_logs(self) -> List[AuditLog]:
         return list(self.audit_logs.values())
     
+    def set_assessment_pdf_url(self, assessment_id: str, pdf_url: Optional[str]) -> bool:
+        assessment = self.assessments.get(assessment_id)
+        if assessment is None:
+            return False
+        self.assessments[assessment_id] = assessment.model_copy(update={"pdf_url": pdf_url})
+        self._record_change(ChangeEntity.ASSESSMENT, assessment_id, ChangeOp.UPSERT)
+        return True
+    
     def delete_assessment(self, assessment_id: str) -> bool:
         if assessment_id in self.assessments:
-            del self.assessments[assessment_id]
+            assessment = self.assessments.pop(assessment_id)
+            self._apply_rollup_change(self._assessment_rollup(assessment, self.leads.get(assessment_id)), {})
+            self._rebuild_day_sketches(rollup_day(assessment.submission_date))
+            self._record_change(ChangeEntity.ASSESSMENT, assessment_id, ChangeOp.DELETE)
             return True
         return False
     
     def delete_lead(self, lead_id: str) -> bool:
         if lead_id in self.leads:
-            del self.leads[lead_id]
+            lead = self.leads.pop(lead_id)
+            assessment = self.assessments.get(lead_id)
+            self._apply_rollup_change(self._respondent_rollup(assessment, lead), self._assessment_rollup(assessment, None))
+            self._apply_funnel_change(session_funnel(lead.status, self._session_question_ids(lead_id)), {})
+            self.in_progress_assessments.pop(lead_id, None)
+            self.search_index.remove(lead_id)
+            self._record_change(ChangeEntity.LEAD, lead_id, ChangeOp.DELETE)
             return True
         return False
     
     def delete_audit_log(self, audit_log_id: str) -> bool:
         if audit_log_id in self.audit_logs:
             del self.audit_logs[audit_log_id]
+            self._record_change(ChangeEntity.AUDIT_LOG, audit_log_id, ChangeOp.DELETE)
             return True
         return False
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if DATABASE_URL and create_engine is not None:
-    if DATABASE_URL.startswith("postgresql://"):
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+# The SQL backend targets Postgres only: it relies on JSONB, GROUPING SETS,
+# ON CONFLICT upserts and advisory locks. Its tables and queries are defined
+# whenever SQLAlchemy is installed so they can be compiled without a
+# database; the engine is bound below only when DATABASE_URL is set.
+if create_engine is not None:
     Base = declarative_base()
-    engine = create_engine(DATABASE_URL, future=True)
-    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+    SessionLocal = sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False)
+
+    # Native Postgres enums (4 bytes) storing the enum values, not the names.
+    LEAD_STATUS_TYPE = Enum(LeadStatus, name="lead_status", values_callable=lambda e: [m.value for m in e])
+    RISK_LEVEL_TYPE = Enum(RiskLevel, name="risk_level", values_callable=lambda e: [m.value for m in e])
+    EMAIL_STATUS_TYPE = Enum(EmailStatus, name="email_status", values_callable=lambda e: [m.value for m in e])
+    CHANGE_ENTITY_TYPE = Enum(ChangeEntity, name="change_entity", values_callable=lambda e: [m.value for m in e])
+    CHANGE_OP_TYPE = Enum(ChangeOp, name="change_op", values_callable=lambda e: [m.value for m in e])
+    OUTBOX_KIND_TYPE = Enum(OutboxKind, name="outbox_kind", values_callable=lambda e: [m.value for m in e])
+    OUTBOX_STATUS_TYPE = Enum(OutboxStatus, name="outbox_status", values_callable=lambda e: [m.value for m in e])
+
+    # Arbitrary key for the pg_advisory_xact_lock taken by writes that append
+    # to the change log, see _record_change.
+    CHANGE_LOG_LOCK_KEY = 7318421
 
     class AssessmentORM(Base):
         __tablename__ = "assessments"
-        id = Column(String, primary_key=True, index=True)
+        id = Column(Uuid, primary_key=True)
         submission_date = Column(DateTime, nullable=False)
-        data = Column(JSON, nullable=False)
+        # Legacy rows only have `data`; new rows store the response bytes.
+        data = Column(JSON(none_as_null=True), nullable=True)
+        result_json = Column(LargeBinary, nullable=True)
+        result_encoding = Column(String, nullable=True)
+        # Scalar copies of result fields, for rollups and SQL aggregates
+        overall_percentage = Column(Float, nullable=True)
+        overall_risk_level = Column(RISK_LEVEL_TYPE, nullable=True)
+
+        __table_args__ = (
+            # Covers the date-bounded COUNT/AVG in aggregate_statistics
+            Index("ix_assessments_submission_date", "submission_date", postgresql_include=["overall_percentage"]),
+        )
 
     class LeadORM(Base):
         __tablename__ = "leads"
-        id = Column(String, primary_key=True, index=True)
+        id = Column(Uuid, primary_key=True)
         company_name = Column(String, nullable=False)
         contact_name = Column(String, nullable=False)
         email = Column(String, nullable=False)
@@ -106,60 +600,553 @@ if DATABASE_URL and create_engine is not None:
         company_size = Column(String, nullable=False)
         industry = Column(String, nullable=True)
         employee_range = Column(String, nullable=True)
-        operating_states = Column(JSON, nullable=True)
+        operating_states = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)
         business_age = Column(String, nullable=True)
-        consent = Column(String, nullable=False, default="false")
-        status = Column(String, nullable=False, default="started")
+        consent = Column(Boolean, nullable=False, default=False)
+        status = Column(LEAD_STATUS_TYPE, nullable=False, default=LeadStatus.STARTED)
         ip_hash = Column(String, nullable=True)
         user_agent = Column(String, nullable=True)
         submission_date = Column(DateTime, nullable=False)
-        overall_score = Column(Integer, nullable=True)
-        overall_risk_level = Column(String, nullable=True)
+        overall_score = Column(SmallInteger, nullable=True)
+        overall_risk_level = Column(RISK_LEVEL_TYPE, nullable=True)
         high_risk_categories = Column(JSON, nullable=True)
 
+        __table_args__ = (
+            Index("ix_leads_submission_date", "submission_date"),
+            Index("ix_leads_status_submission_date", "status", "submission_date"),
+            Index("ix_leads_overall_score", "overall_score"),
+            Index("ix_leads_operating_states", "operating_states", postgresql_using="gin"),
+            # The pg_trgm search indexes are created by migration 0004, since
+            # create_all runs before the extension exists.
+        )
+
     class AuditLogORM(Base):
         __tablename__ = "audit_logs"
-        id = Column(String, primary_key=True, index=True)
-        assessment_id = Column(String, nullable=False)
+        id = Column(Uuid, primary_key=True)
+        assessment_id = Column(Uuid, nullable=False)
         company_name = Column(String, nullable=False)
         email = Column(String, nullable=False)
-        score = Column(Integer, nullable=False)
-        email_status = Column(String, nullable=False)
-        attempts = Column(Integer, nullable=False)
+        score = Column(SmallInteger, nullable=False)
+        email_status = Column(EMAIL_STATUS_TYPE, nullable=False)
+        attempts = Column(SmallInteger, nullable=False)
         error_message = Column(String, nullable=True)
         timestamp = Column(DateTime, nullable=False)
+        batch_id = Column(Uuid, nullable=True)
 
-    Base.metadata.create_all(bind=engine)
+        __table_args__ = (
+            # Delivery outcome of a batch send is copied to its members
+            Index("ix_audit_logs_batch_id", "batch_id"),
+        )
+
+    class DailyRollupORM(Base):
+        __tablename__ = "daily_rollups"
+        day = Column(Date, primary_key=True)
+        state = Column(String, primary_key=True)
+        industry = Column(String, primary_key=True)
+        risk_level = Column(String, primary_key=True)
+        assessment_count = Column(Integer, nullable=False, default=0)
+        score_sum = Column(Float, nullable=False, default=0.0)
+        score_sq_sum = Column(Float, nullable=False, default=0.0)
+        lead_count = Column(Integer, nullable=False, default=0)
+
+    class DailyScoreSketchORM(Base):
+        __tablename__ = "daily_score_sketches"
+        day = Column(Date, primary_key=True)
+        metric = Column(String, primary_key=True)
+        digest = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+
+    class InProgressAssessmentORM(Base):
+        __tablename__ = "in_progress_assessments"
+        id = Column(Uuid, primary_key=True)
+        lead_id = Column(Uuid, nullable=False)
+        answers = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+        created_at = Column(DateTime, nullable=False)
+        updated_at = Column(DateTime, nullable=False)
+
+    class FunnelCounterORM(Base):
+        __tablename__ = "funnel_counters"
+        step = Column(String, primary_key=True)
+        key = Column(String, primary_key=True)
+        count = Column(BigInteger, nullable=False, default=0)
+
+    class FunnelSketchORM(Base):
+        __tablename__ = "funnel_sketches"
+        metric = Column(String, primary_key=True)
+        digest = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+
+    class AnswerCountORM(Base):
+        __tablename__ = "answer_counts"
+        catalog_version = Column(String, primary_key=True)
+        question_id = Column(String, primary_key=True)
+        segment = Column(String, primary_key=True)
+        segment_value = Column(String, primary_key=True)
+        option_id = Column(String, primary_key=True)
+        count = Column(BigInteger, nullable=False, default=0)
+
+    class OutboxORM(Base):
+        __tablename__ = "email_outbox"
+        id = Column(Uuid, primary_key=True)
+        kind = Column(OUTBOX_KIND_TYPE, nullable=False)
+        audit_log_id = Column(Uuid, nullable=True)
+        recipient = Column(String, nullable=False)
+        subject = Column(String, nullable=False)
+        body = Column(String, nullable=False)
+        html = Column(Boolean, nullable=False, default=False)
+        status = Column(OUTBOX_STATUS_TYPE, nullable=False)
+        attempts = Column(SmallInteger, nullable=False, default=0)
+        last_error = Column(String, nullable=True)
+        created_at = Column(DateTime, nullable=False)
+        next_attempt_at = Column(DateTime, nullable=False)
+        expires_at = Column(DateTime, nullable=True)
+        locked_until = Column(DateTime, nullable=True)
+        sent_at = Column(DateTime, nullable=True)
+        batch_id = Column(Uuid, nullable=True)
+
+        __table_args__ = (
+            # Dispatcher claim query: due rows by status
+            Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        )
+
+    class ChangeLogORM(Base):
+        __tablename__ = "change_log"
+        seq = Column(BigInteger, primary_key=True, autoincrement=True)
+        entity = Column(CHANGE_ENTITY_TYPE, nullable=False)
+        entity_id = Column(Uuid, nullable=False)
+        op = Column(CHANGE_OP_TYPE, nullable=False)
+        changed_at = Column(DateTime, nullable=False)
+
+    def _as_datetime(value) -> datetime:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+    def _lead_from_row(obj: LeadORM) -> Lead:
+        return Lead(
+            id=str(obj.id),
+            company_name=obj.company_name,
+            contact_name=obj.contact_name,
+            email=obj.email,
+            phone=obj.phone,
+            company_size=obj.company_size,
+            industry=obj.industry,
+            employee_range=obj.employee_range,
+            operating_states=obj.operating_states,
+            business_age=obj.business_age,
+            consent=obj.consent,
+            status=obj.status,
+            ip_hash=obj.ip_hash,
+            user_agent=obj.user_agent,
+            submission_date=obj.submission_date,
+            overall_score=obj.overall_score,
+            overall_risk_level=obj.overall_risk_level,
+            high_risk_categories=obj.high_risk_categories,
+        )
+
+    def _audit_log_from_row(obj: AuditLogORM) -> AuditLog:
+        return AuditLog(
+            id=str(obj.id),
+            assessment_id=str(obj.assessment_id),
+            company_name=obj.company_name,
+            email=obj.email,
+            score=float(obj.score),
+            email_status=obj.email_status,
+            attempts=obj.attempts,
+            error_message=obj.error_message,
+            timestamp=obj.timestamp,
+            batch_id=str(obj.batch_id) if obj.batch_id else None,
+        )
+
+    def _audit_log_row(audit_log: AuditLog) -> AuditLogORM:
+        return AuditLogORM(
+            id=uuid.UUID(audit_log.id),
+            assessment_id=uuid.UUID(audit_log.assessment_id),
+            company_name=audit_log.company_name,
+            email=str(audit_log.email),
+            score=int(audit_log.score),
+            email_status=audit_log.email_status,
+            attempts=audit_log.attempts,
+            error_message=audit_log.error_message,
+            timestamp=_as_datetime(audit_log.timestamp),
+            batch_id=uuid.UUID(audit_log.batch_id) if audit_log.batch_id else None,
+        )
+
+    def _outbox_from_row(obj: OutboxORM) -> OutboxMessage:
+        return OutboxMessage(
+            id=str(obj.id),
+            kind=obj.kind,
+            audit_log_id=str(obj.audit_log_id) if obj.audit_log_id else None,
+            recipient=obj.recipient,
+            subject=obj.subject,
+            body=obj.body,
+            html=obj.html,
+            status=obj.status,
+            attempts=obj.attempts,
+            last_error=obj.last_error,
+            created_at=obj.created_at,
+            next_attempt_at=obj.next_attempt_at,
+            expires_at=obj.expires_at,
+            locked_until=obj.locked_until,
+            sent_at=obj.sent_at,
+            batch_id=str(obj.batch_id) if obj.batch_id else None,
+        )
+
+    def _add_outbox(session, message: OutboxMessage, audit_log: Optional[AuditLog]) -> None:
+        """
+        Insert an outbox message, and the audit log it reports to, in the
+        caller's transaction.
+        """
+        if audit_log is not None:
+            session.merge(_audit_log_row(audit_log))
+            _record_change(session, ChangeEntity.AUDIT_LOG, audit_log.id, ChangeOp.UPSERT)
+        session.add(OutboxORM(
+            id=uuid.UUID(message.id),
+            kind=message.kind,
+            audit_log_id=uuid.UUID(message.audit_log_id) if message.audit_log_id else None,
+            recipient=message.recipient,
+            subject=message.subject,
+            body=message.body,
+            html=message.html,
+            status=message.status,
+            attempts=message.attempts,
+            last_error=message.last_error,
+            created_at=message.created_at,
+            next_attempt_at=message.next_attempt_at,
+            expires_at=message.expires_at,
+        ))
+
+    def _outbox_audit_logs(session, obj: OutboxORM) -> List[AuditLogORM]:
+        """
+        Audit log rows reporting on an outbox row: its own, or for a batch,
+        those of every notification folded into it.
+        """
+        if obj.kind == OutboxKind.NOTIFICATION_BATCH:
+            return session.scalars(select(AuditLogORM).where(AuditLogORM.batch_id == obj.id)).all()
+        if obj.audit_log_id is None:
+            return []
+        audit_log = session.get(AuditLogORM, obj.audit_log_id)
+        return [audit_log] if audit_log is not None else []
+
+    def _record_change(session, entity: ChangeEntity, entity_id: str, op: ChangeOp) -> None:
+        """
+        Append to the change log in the caller's transaction. The row is
+        written when the transaction commits, see _write_change_log.
+        """
+        if not session.in_transaction():
+            # So a rollback fires _discard_change_log
+            session.begin()
+        session.info.setdefault("change_log", []).append(ChangeLogORM(
+            entity=entity, entity_id=uuid.UUID(entity_id), op=op, changed_at=datetime.now()
+        ))
+
+    @event.listens_for(SessionLocal, "before_commit")
+    def _write_change_log(session) -> None:
+        """
+        Insert the transaction's change log rows as the last step before
+        commit.
+
+        Sequence values are handed out at insert time, so two concurrent
+        writers could commit seq 11 before seq 10, and a reader polling in
+        between would skip 10 for good. The advisory lock makes seq order
+        match commit order. It is held from the insert until commit only,
+        so writers queue on the commit itself, not on their whole
+        transaction.
+        """
+        changes = session.info.pop("change_log", None)
+        if not changes:
+            return
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK_KEY})
+        session.add_all(changes)
+
+    @event.listens_for(SessionLocal, "after_soft_rollback")
+    def _discard_change_log(session, previous_transaction) -> None:
+        session.info.pop("change_log", None)
+
+    def _apply_rollup_change(session, before: Dict[RollupKey, RollupValues], after: Dict[RollupKey, RollupValues]) -> bool:
+        """
+        Add the difference between two contributions to the daily rollups
+        in the caller's transaction. Keys are upserted in sorted order so
+        concurrent writers cannot deadlock. Returns whether a past day
+        changed, in which case other workers are told to drop their cached
+        statistics buckets; the caller drops its own after committing.
+        """
+        past = touches_past_days(before, after)
+        if past:
+            publish_invalidation(session, SERIES_CACHE, ALL_KEYS)
+        delta = rollup_delta(before, after)
+        if not delta:
+            return past
+        rows = [rollup.model_dump() for rollup in to_rollups(delta)]
+        stmt = pg_insert(DailyRollupORM).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "state", "industry", "risk_level"],
+            set_={name: getattr(DailyRollupORM, name) + getattr(stmt.excluded, name) for name in ROLLUP_MEASURES},
+        )
+        session.execute(stmt)
+        return past
+
+    def _add_to_sketches(session, assessment: AssessmentResult) -> None:
+        """
+        Add a new assessment's scores to its day's sketches. Writers to a
+        day, including a rebuild after a delete, serialize on the day's
+        advisory lock instead of overwriting each other.
+        """
+        day = rollup_day(assessment.submission_date)
+        metrics = result_metrics(assessment)
+        lock_sketch_day(session, day)
+        session.execute(
+            pg_insert(DailyScoreSketchORM)
+            .values([{"day": day, "metric": metric, "digest": TDigest().to_dict()} for metric in sorted(metrics)])
+            .on_conflict_do_nothing()
+        )
+        rows = session.scalars(
+            select(DailyScoreSketchORM)
+            .where(DailyScoreSketchORM.day == day, DailyScoreSketchORM.metric.in_(metrics))
+            .order_by(DailyScoreSketchORM.metric)
+            .with_for_update()
+        )
+        for row in rows:
+            digest = TDigest.from_dict(row.digest)
+            digest.add(metrics[row.metric])
+            row.digest = digest.to_dict()
+
+    def _apply_funnel_change(session, before: Dict[FunnelKey, int], after: Dict[FunnelKey, int]) -> None:
+        """
+        Add the difference between two session contributions to the funnel
+        counters in the caller's transaction, in key order like the rollups.
+        """
+        delta = funnel_delta(before, after)
+        if not delta:
+            return
+        stmt = pg_insert(FunnelCounterORM).values([
+            {"step": step, "key": key, "count": count} for (step, key), count in sorted(delta.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["step", "key"],
+            set_={"count": FunnelCounterORM.count + stmt.excluded.count},
+        )
+        session.execute(stmt)
+
+    def _add_completion_time(session, seconds: float) -> None:
+        session.execute(
+            pg_insert(FunnelSketchORM)
+            .values(metric=TIME_TO_COMPLETE, digest=TDigest().to_dict())
+            .on_conflict_do_nothing()
+        )
+        row = session.get(FunnelSketchORM, TIME_TO_COMPLETE, with_for_update=True)
+        digest = TDigest.from_dict(row.digest)
+        digest.add(seconds)
+        row.digest = digest.to_dict()
+
+    def _progress_question_ids(obj) -> List[str]:
+        if obj is None:
+            return []
+        return [answer["question_id"] for answer in obj.answers]
+
+    def _assessment_row_rollup(obj, lead) -> Dict[RollupKey, RollupValues]:
+        """
+        An assessment row's score counts under the states and industry of
+        the lead row with its id. Writers lock the lead row before the
+        assessment row, so both stay put while the contribution is moved.
+        """
+        if obj is None:
+            return {}
+        states, industry = (lead.operating_states, lead.industry) if lead is not None else (None, None)
+        return assessment_rollup(obj.submission_date, obj.overall_percentage, obj.overall_risk_level, states, industry)
+
+    def _lead_row_rollup(obj) -> Dict[RollupKey, RollupValues]:
+        if obj is None:
+            return {}
+        return lead_rollup(obj.submission_date, obj.operating_states, obj.industry, obj.overall_risk_level)
+
+    def _respondent_row_rollup(assessment, lead) -> Dict[RollupKey, RollupValues]:
+        totals = _assessment_row_rollup(assessment, lead)
+        accumulate(totals, _lead_row_rollup(lead))
+        return totals
+
+    def _trial_conditions(filters: Optional[TrialFilters]) -> list:
+        """
+        SQL form of TrialFilters.matches.
+        """
+        if filters is None:
+            return []
+        conditions = []
+        if filters.start_date:
+            conditions.append(LeadORM.submission_date >= filters.start_date)
+        if filters.end_date:
+            conditions.append(LeadORM.submission_date <= filters.end_date)
+        if filters.states:
+            states = type_coerce(LeadORM.operating_states, JSONB)
+            conditions.append(or_(
+                LeadORM.operating_states.is_(None),
+                func.jsonb_array_length(states) == 0,
+                states.has_any(array(filters.states)),
+            ))
+        if filters.score_min is not None:
+            conditions.append(LeadORM.overall_score >= filters.score_min)
+        if filters.score_max is not None:
+            conditions.append(LeadORM.overall_score <= filters.score_max)
+        if filters.status:
+            conditions.append(LeadORM.status == filters.status)
+        if filters.search:
+            # Served by the pg_trgm GIN indexes on company_name and email
+            pattern = f"%{_escape_like(filters.search)}%"
+            conditions.append(or_(
+                LeadORM.company_name.ilike(pattern, escape="\\"),
+                LeadORM.email.ilike(pattern, escape="\\"),
+            ))
+        return conditions
+
+    def _escape_like(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def _trial_order(filters: Optional[TrialFilters]) -> list:
+        """
+        Newest first, or best trigram match first when searching.
+        """
+        order = [LeadORM.submission_date.desc()]
+        if filters is not None and filters.search:
+            rank = func.greatest(
+                func.similarity(LeadORM.company_name, filters.search),
+                func.similarity(LeadORM.email, filters.search),
+            )
+            order.insert(0, rank.desc())
+        return order
+
+    def _trial_query(filters: Optional[TrialFilters]):
+        return (
+            select(
+                LeadORM.email,
+                LeadORM.company_name,
+                LeadORM.operating_states,
+                LeadORM.overall_score,
+                LeadORM.overall_risk_level,
+                LeadORM.submission_date,
+                LeadORM.status,
+                AssessmentORM.submission_date.label("completed"),
+            )
+            .outerjoin(AssessmentORM, AssessmentORM.id == LeadORM.id)
+            .where(*_trial_conditions(filters))
+        )
+
+    def _trial_from_row(row) -> TrialRecord:
+        # Rows come from our own tables, so skip re-validating every field.
+        return TrialRecord.model_construct(
+            email=row.email,
+            company=row.company_name,
+            states=row.operating_states,
+            score=row.overall_score,
+            rating=row.overall_risk_level,
+            started=row.submission_date,
+            completed=row.completed,
+            status=row.status,
+        )
 
     class SQLDatabase:
-        def save_assessment(self, assessment: AssessmentResult) -> AssessmentResult:
+        def __init__(self):
+            self.assessment_cache = cache_registry.create("assessments", CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+            self.lead_cache = cache_registry.create("leads", CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+            self.assessment_json_cache = cache_registry.create("assessment_json", CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+        def _invalidate_assessment(self, session, assessment_id: str) -> None:
+            publish_invalidation(session, "assessments", assessment_id)
+            publish_invalidation(session, "assessment_json", assessment_id)
+
+        def _evict_assessment(self, assessment_id: str) -> None:
+            self.assessment_cache.invalidate(assessment_id)
+            self.assessment_json_cache.invalidate(assessment_id)
+
+        @staticmethod
+        def _hydrate_assessment(obj) -> AssessmentResult:
+            if obj.result_json is not None:
+                return AssessmentResult.model_validate_json(decode_result_json(obj.result_json, obj.result_encoding))
+            return AssessmentResult.model_validate(obj.data)
+
+        def save_assessment(self, assessment: AssessmentResult, notification: Optional[Tuple[AuditLog, OutboxMessage]] = None) -> AssessmentResult:
+            body, encoding = encode_result_json(assessment)
             with SessionLocal() as session:
-                payload = assessment.model_dump(mode="json")
+                # Lock the previous version so its rollup contribution is
+                # subtracted exactly once under concurrent re-saves.
+                lead = session.get(LeadORM, uuid.UUID(assessment.id), with_for_update=True)
+                previous = session.get(AssessmentORM, uuid.UUID(assessment.id), with_for_update=True)
+                before = _assessment_row_rollup(previous, lead)
                 obj = AssessmentORM(
-                    id=assessment.id,
-                    submission_date=assessment.submission_date if isinstance(assessment.submission_date, datetime) else datetime.fromisoformat(str(assessment.submission_date)),
-                    data=payload,
+                    id=uuid.UUID(assessment.id),
+                    submission_date=_as_datetime(assessment.submission_date),
+                    data=None,
+                    result_json=body,
+                    result_encoding=encoding,
+                    overall_percentage=assessment.overall_percentage,
+                    overall_risk_level=assessment.overall_risk_level,
                 )
-                session.merge(obj)
+                obj = session.merge(obj)
+                past = _apply_rollup_change(session, before, _assessment_row_rollup(obj, lead))
+                # Sketches cannot remove values, so only first saves count
+                if previous is None:
+                    _add_to_sketches(session, assessment)
+                if notification is not None:
+                    _add_outbox(session, notification[1], notification[0])
+                self._invalidate_assessment(session, assessment.id)
+                _record_change(session, ChangeEntity.ASSESSMENT, assessment.id, ChangeOp.UPSERT)
                 session.commit()
-                return assessment
+            self._evict_assessment(assessment.id)
+            if past:
+                cache_registry.invalidate_local(SERIES_CACHE, ALL_KEYS)
+            return assessment
 
         def get_assessment(self, assessment_id: str) -> Optional[AssessmentResult]:
+            key = parse_uuid(assessment_id)
+            if key is None:
+                return None
+            cached = self.assessment_cache.get(assessment_id)
+            if cached is not None:
+                return cached
+            generation = self.assessment_cache.generation
             with SessionLocal() as session:
-                obj = session.get(AssessmentORM, assessment_id)
+                obj = session.get(AssessmentORM, key)
                 if not obj:
                     return None
-                return AssessmentResult.model_validate(obj.data)
+                assessment = self._hydrate_assessment(obj)
+            self.assessment_cache.set(assessment_id, assessment, generation)
+            return assessment
+
+        def get_assessment_json(self, assessment_id: str) -> Optional[Tuple[bytes, str]]:
+            """
+            Return the stored response bytes and their content encoding
+            without building an AssessmentResult.
+            """
+            key = parse_uuid(assessment_id)
+            if key is None:
+                return None
+            cached = self.assessment_json_cache.get(assessment_id)
+            if cached is not None:
+                return cached
+            generation = self.assessment_json_cache.generation
+            with SessionLocal() as session:
+                row = session.execute(
+                    select(AssessmentORM.result_json, AssessmentORM.result_encoding, AssessmentORM.data)
+                    .where(AssessmentORM.id == key)
+                ).first()
+            if row is None:
+                return None
+            if row.result_json is not None:
+                stored = (row.result_json, row.result_encoding or "identity")
+            else:
+                stored = (json.dumps(row.data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), "identity")
+            self.assessment_json_cache.set(assessment_id, stored, generation)
+            return stored
 
         def get_all_assessments(self) -> List[AssessmentResult]:
             with SessionLocal() as session:
                 rows = session.query(AssessmentORM).all()
-                return [AssessmentResult.model_validate(r.data) for r in rows]
+                return [self._hydrate_assessment(r) for r in rows]
 
         def save_lead(self, lead: Lead) -> Lead:
             with SessionLocal() as session:
+                previous = session.get(LeadORM, uuid.UUID(lead.id), with_for_update=True)
+                assessment = session.get(AssessmentORM, uuid.UUID(lead.id))
+                before = _respondent_row_rollup(assessment, previous)
+                previous_status = previous.status if previous else None
+                previous_started = previous.submission_date if previous else None
                 obj = LeadORM(
-                    id=lead.id,
+                    id=uuid.UUID(lead.id),
                     company_name=lead.company_name,
                     contact_name=lead.contact_name,
                     email=str(lead.email),
@@ -169,155 +1156,555 @@ if DATABASE_URL and create_engine is not None:
                     employee_range=lead.employee_range,
                     operating_states=lead.operating_states,
                     business_age=lead.business_age,
-                    consent=str(lead.consent).lower(),
-                    status=str(lead.status),
+                    consent=bool(lead.consent),
+                    status=lead.status,
                     ip_hash=lead.ip_hash,
                     user_agent=lead.user_agent,
-                    submission_date=lead.submission_date if isinstance(lead.submission_date, datetime) else datetime.fromisoformat(str(lead.submission_date)),
+                    submission_date=_as_datetime(lead.submission_date),
                     overall_score=lead.overall_score,
-                    overall_risk_level=str(lead.overall_risk_level) if lead.overall_risk_level else None,
+                    overall_risk_level=lead.overall_risk_level,
                     high_risk_categories=lead.high_risk_categories,
                 )
-                session.merge(obj)
+                obj = session.merge(obj)
+                past = _apply_rollup_change(session, before, _respondent_row_rollup(assessment, obj))
+                if previous_status != lead.status:
+                    # In-progress writers lock the lead row first, so the
+                    # answers cannot change under this update.
+                    question_ids = _progress_question_ids(session.get(InProgressAssessmentORM, uuid.UUID(lead.id)))
+                    _apply_funnel_change(session, session_funnel(previous_status, question_ids), session_funnel(lead.status, question_ids))
+                    if previous_started is not None and lead.status == LeadStatus.COMPLETED:
+                        _add_completion_time(session, seconds_since(previous_started))
+                publish_invalidation(session, "leads", lead.id)
+                _record_change(session, ChangeEntity.LEAD, lead.id, ChangeOp.UPSERT)
                 session.commit()
-                return lead
+            self.lead_cache.invalidate(lead.id)
+            if past:
+                cache_registry.invalidate_local(SERIES_CACHE, ALL_KEYS)
+            return lead
 
         def get_lead(self, lead_id: str) -> Optional[Lead]:
+            key = parse_uuid(lead_id)
+            if key is None:
+                return None
+            cached = self.lead_cache.get(lead_id)
+            if cached is not None:
+                return cached
+            generation = self.lead_cache.generation
             with SessionLocal() as session:
-                obj = session.get(LeadORM, lead_id)
+                obj = session.get(LeadORM, key)
                 if not obj:
                     return None
-                data = {
-                    "id": obj.id,
-                    "company_name": obj.company_name,
-                    "contact_name": obj.contact_name,
-                    "email": obj.email,
-                    "phone": obj.phone,
-                    "company_size": obj.company_size,
-                    "industry": obj.industry,
-                    "employee_range": obj.employee_range,
-                    "operating_states": obj.operating_states,
-                    "business_age": obj.business_age,
-                    "consent": obj.consent.lower() == "true" if obj.consent else False,
-                    "status": obj.status,
-                    "ip_hash": obj.ip_hash,
-                    "user_agent": obj.user_agent,
-                    "submission_date": obj.submission_date.isoformat(),
-                    "overall_score": obj.overall_score,
-                    "overall_risk_level": obj.overall_risk_level,
-                    "high_risk_categories": obj.high_risk_categories,
-                }
-                return Lead.model_validate(data)
+                lead = _lead_from_row(obj)
+            self.lead_cache.set(lead_id, lead, generation)
+            return lead
 
         def get_all_leads(self) -> List[Lead]:
             with SessionLocal() as session:
                 rows = session.query(LeadORM).all()
-                out: List[Lead] = []
-                for obj in rows:
-                    data = {
-                        "id": obj.id,
-                        "company_name": obj.company_name,
-                        "contact_name": obj.contact_name,
-                        "email": obj.email,
-                        "phone": obj.phone,
-                        "company_size": obj.company_size,
-                        "industry": obj.industry,
-                        "employee_range": obj.employee_range,
-                        "operating_states": obj.operating_states,
-                        "business_age": obj.business_age,
-                        "consent": obj.consent.lower() == "true" if obj.consent else False,
-                        "status": obj.status,
-                        "ip_hash": obj.ip_hash,
-                        "user_agent": obj.user_agent,
-                        "submission_date": obj.submission_date.isoformat(),
-                        "overall_score": obj.overall_score,
-                        "overall_risk_level": obj.overall_risk_level,
-                        "high_risk_categories": obj.high_risk_categories,
-                    }
-                    out.append(Lead.model_validate(data))
-                return out
+                return [_lead_from_row(obj) for obj in rows]
 
-        def save_audit_log(self, audit_log: AuditLog) -> AuditLog:
+        def query_trials(self, filters: Optional[TrialFilters] = None, limit: Optional[int] = None, offset: int = 0) -> List[TrialRecord]:
+            stmt = _trial_query(filters).order_by(*_trial_order(filters)).offset(offset)
+            if limit is not None:
+                stmt = stmt.limit(limit)
+            with SessionLocal() as session:
+                return [_trial_from_row(row) for row in session.execute(stmt)]
+
+        def count_trials(self, filters: Optional[TrialFilters] = None) -> int:
+            stmt = select(func.count()).select_from(LeadORM).where(*_trial_conditions(filters))
+            with SessionLocal() as session:
+                return session.execute(stmt).scalar_one()
+
+        def trial_facets(self, filters: Optional[TrialFilters] = None) -> TrialFacets:
+            """
+            Count filtered trials by status, rating, score band and state in a
+            single GROUPING SETS query. Leads are joined to their unnested
+            states, so counts are DISTINCT per lead.
+            """
+            state = func.jsonb_array_elements_text(LeadORM.operating_states).table_valued("value").lateral()
+            # LEAST() skips NULLs, so unscored leads need an explicit NULL band
+            band = case(
+                (LeadORM.overall_score.is_(None), None),
+                else_=func.least(LeadORM.overall_score // SCORE_BAND_WIDTH, 9),
+            )
+            stmt = (
+                select(
+                    LeadORM.status,
+                    LeadORM.overall_risk_level,
+                    band.label("band"),
+                    state.c.value.label("state"),
+                    func.grouping(LeadORM.status).label("by_status"),
+                    func.grouping(LeadORM.overall_risk_level).label("by_rating"),
+                    func.grouping(band).label("by_band"),
+                    func.grouping(state.c.value).label("by_state"),
+                    func.count(LeadORM.id.distinct()).label("count"),
+                )
+                .select_from(LeadORM)
+                .outerjoin(state, true())
+                .where(*_trial_conditions(filters))
+                .group_by(func.grouping_sets(
+                    LeadORM.status,
+                    LeadORM.overall_risk_level,
+                    band,
+                    state.c.value,
+                    tuple_(),
+                ))
+            )
+            facets = TrialFacets(total=0, status={}, rating={}, state={}, score_band={})
+            with SessionLocal() as session:
+                for row in session.execute(stmt):
+                    if not row.by_status:
+                        facets.status[row.status.value] = row.count
+                    elif not row.by_rating:
+                        facets.rating[row.overall_risk_level.value if row.overall_risk_level else UNRATED] = row.count
+                    elif not row.by_band:
+                        facets.score_band[score_band_label(row.band)] = row.count
+                    elif not row.by_state:
+                        if row.state is not None:
+                            facets.state[row.state] = row.count
+                    else:
+                        facets.total = row.count
+            return facets
+
+        def iter_trials(self, filters: Optional[TrialFilters] = None, batch_size: int = 500) -> Iterator[TrialRecord]:
+            """
+            Stream trials in query order through a server-side cursor, holding
+            at most `batch_size` rows in memory.
+            """
+            stmt = _trial_query(filters).order_by(*_trial_order(filters))
+            with SessionLocal() as session:
+                for row in session.execute(stmt.execution_options(yield_per=batch_size)):
+                    yield _trial_from_row(row)
+
+        def save_in_progress_assessment(self, assessment: InProgressAssessment) -> InProgressAssessment:
             with SessionLocal() as session:
-                obj = AuditLogORM(
-                    id=audit_log.id,
-                    assessment_id=audit_log.assessment_id,
-                    company_name=audit_log.company_name,
-                    email=str(audit_log.email),
-                    score=int(audit_log.score),
-                    email_status=str(audit_log.email_status),
-                    attempts=audit_log.attempts,
-                    error_message=audit_log.error_message,
-                    timestamp=audit_log.timestamp if isinstance(audit_log.timestamp, datetime) else datetime.fromisoformat(str(audit_log.timestamp)),
+                lead = session.get(LeadORM, uuid.UUID(assessment.lead_id), with_for_update=True)
+                previous = session.get(InProgressAssessmentORM, uuid.UUID(assessment.id), with_for_update=True)
+                before = _progress_question_ids(previous)
+                obj = session.merge(InProgressAssessmentORM(
+                    id=uuid.UUID(assessment.id),
+                    lead_id=uuid.UUID(assessment.lead_id),
+                    answers=[answer.model_dump() for answer in assessment.answers],
+                    created_at=assessment.created_at,
+                    updated_at=assessment.updated_at,
+                ))
+                after = _progress_question_ids(obj)
+                if before != after:
+                    status = lead.status if lead else None
+                    _apply_funnel_change(session, session_funnel(status, before), session_funnel(status, after))
+                session.commit()
+            return assessment
+
+        def get_in_progress_assessment(self, assessment_id: str) -> Optional[InProgressAssessment]:
+            key = parse_uuid(assessment_id)
+            if key is None:
+                return None
+            with SessionLocal() as session:
+                obj = session.get(InProgressAssessmentORM, key)
+                if not obj:
+                    return None
+                return InProgressAssessment(
+                    id=str(obj.id),
+                    lead_id=str(obj.lead_id),
+                    answers=obj.answers,
+                    created_at=obj.created_at,
+                    updated_at=obj.updated_at,
                 )
-                session.merge(obj)
+
+        def save_audit_log(self, audit_log: AuditLog) -> AuditLog:
+            with SessionLocal() as session:
+                session.merge(_audit_log_row(audit_log))
+                _record_change(session, ChangeEntity.AUDIT_LOG, audit_log.id, ChangeOp.UPSERT)
                 session.commit()
                 return audit_log
 
+        def enqueue_outbox(self, message: OutboxMessage, audit_log: Optional[AuditLog] = None) -> OutboxMessage:
+            with SessionLocal() as session:
+                _add_outbox(session, message, audit_log)
+                session.commit()
+            return message
+
+        def get_outbox_message(self, message_id: str) -> Optional[OutboxMessage]:
+            key = parse_uuid(message_id)
+            if key is None:
+                return None
+            with SessionLocal() as session:
+                obj = session.get(OutboxORM, key)
+                return _outbox_from_row(obj) if obj else None
+
+        def claim_outbox(self, limit: int, lease_seconds: float) -> List[OutboxMessage]:
+            """
+            Lease up to `limit` due messages to this dispatcher. SKIP LOCKED
+            lets dispatchers in other workers claim different rows instead
+            of queueing behind this transaction.
+            """
+            now = datetime.now()
+            stmt = (
+                select(OutboxORM)
+                .where(or_(
+                    and_(OutboxORM.status == OutboxStatus.PENDING, OutboxORM.next_attempt_at <= now),
+                    and_(OutboxORM.status == OutboxStatus.SENDING, OutboxORM.locked_until <= now),
+                ))
+                .order_by(OutboxORM.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            with SessionLocal() as session:
+                rows = session.scalars(stmt).all()
+                for obj in rows:
+                    obj.status = OutboxStatus.SENDING
+                    obj.locked_until = now + timedelta(seconds=lease_seconds)
+                    obj.attempts += 1
+                session.commit()
+                return [_outbox_from_row(obj) for obj in rows]
+
+        def finish_outbox(self, message_id: str, error: Optional[str] = None, retry_at: Optional[datetime] = None) -> Optional[OutboxMessage]:
+            with SessionLocal() as session:
+                obj = session.get(OutboxORM, uuid.UUID(message_id), with_for_update=True)
+                if obj is None:
+                    return None
+                _finish_outbox_message(obj, error, retry_at)
+                for audit_log in _outbox_audit_logs(session, obj):
+                    for name, value in _audit_log_outcome(obj).items():
+                        setattr(audit_log, name, value)
+                    _record_change(session, ChangeEntity.AUDIT_LOG, str(audit_log.id), ChangeOp.UPSERT)
+                session.commit()
+                return _outbox_from_row(obj)
+
+        def requeue_outbox(self, kind: Optional[OutboxKind], created_since: Optional[datetime], limit: int, expires_at: datetime) -> int:
+            """
+            Requeue up to `limit` failed messages, oldest first. Rows another
+            transaction holds are skipped rather than waited on.
+            """
+            stmt = select(OutboxORM).where(OutboxORM.status == OutboxStatus.FAILED)
+            if kind is not None:
+                stmt = stmt.where(OutboxORM.kind == kind)
+            if created_since is not None:
+                stmt = stmt.where(OutboxORM.created_at >= created_since)
+            stmt = stmt.order_by(OutboxORM.created_at).limit(limit).with_for_update(skip_locked=True)
+            with SessionLocal() as session:
+                rows = session.scalars(stmt).all()
+                for obj in rows:
+                    _requeue_outbox_message(obj, expires_at)
+                    for audit_log in _outbox_audit_logs(session, obj):
+                        audit_log.email_status = EmailStatus.PENDING
+                        _record_change(session, ChangeEntity.AUDIT_LOG, str(audit_log.id), ChangeOp.UPSERT)
+                session.commit()
+                return len(rows)
+
+        def coalesce_outbox(self, window_seconds: float, max_batch: int, build_batch: Callable[[List[AuditLog]], OutboxMessage]) -> Optional[OutboxMessage]:
+            """
+            Fold buffered notifications into one batch message when the
+            batch is full or its oldest member has waited for the window.
+            Buffered rows are locked with SKIP LOCKED, so dispatchers in
+            other workers build batches from different rows.
+            """
+            stmt = (
+                select(OutboxORM)
+                .where(OutboxORM.status == OutboxStatus.BUFFERED)
+                .order_by(OutboxORM.created_at)
+                .limit(max_batch)
+                .with_for_update(skip_locked=True)
+            )
+            with SessionLocal() as session:
+                buffered = session.scalars(stmt).all()
+                if not _batch_ready(buffered, max_batch, window_seconds, datetime.now()):
+                    return None
+                audit_log_ids = [obj.audit_log_id for obj in buffered if obj.audit_log_id is not None]
+                audit_logs = session.scalars(
+                    select(AuditLogORM).where(AuditLogORM.id.in_(audit_log_ids)).order_by(AuditLogORM.timestamp)
+                ).all()
+                batch = build_batch([_audit_log_from_row(obj) for obj in audit_logs])
+                _add_outbox(session, batch, None)
+                batch_key = uuid.UUID(batch.id)
+                for obj in buffered:
+                    obj.status = OutboxStatus.BATCHED
+                    obj.batch_id = batch_key
+                for obj in audit_logs:
+                    obj.batch_id = batch_key
+                    _record_change(session, ChangeEntity.AUDIT_LOG, str(obj.id), ChangeOp.UPSERT)
+                session.commit()
+                return batch
+
         def get_audit_log(self, audit_log_id: str) -> Optional[AuditLog]:
+            key = parse_uuid(audit_log_id)
+            if key is None:
+                return None
             with SessionLocal() as session:
-                obj = session.get(AuditLogORM, audit_log_id)
+                obj = session.get(AuditLogORM, key)
                 if not obj:
                     return None
-                data = {
-                    "id": obj.id,
-                    "assessment_id": obj.assessment_id,
-                    "company_name": obj.company_name,
-                    "email": obj.email,
-                    "score": float(obj.score),
-                    "email_status": obj.email_status,
-                    "attempts": obj.attempts,
-                    "error_message": obj.error_message,
-                    "timestamp": obj.timestamp.isoformat(),
-                }
-                return AuditLog.model_validate(data)
+                return _audit_log_from_row(obj)
 
         def get_all_audit_logs(self) -> List[AuditLog]:
             with SessionLocal() as session:
                 rows = session.query(AuditLogORM).all()
-                out: List[AuditLog] = []
-                for obj in rows:
-                    data = {
-                        "id": obj.id,
-                        "assessment_id": obj.assessment_id,
-                        "company_name": obj.company_name,
-                        "email": obj.email,
-                        "score": float(obj.score),
-                        "email_status": obj.email_status,
-                        "attempts": obj.attempts,
-                        "error_message": obj.error_message,
-                        "timestamp": obj.timestamp.isoformat(),
-                    }
-                    out.append(AuditLog.model_validate(data))
-                return out
+                return [_audit_log_from_row(obj) for obj in rows]
+        
+        def get_rollups(self, start_day: Optional[date] = None, end_day: Optional[date] = None) -> List[DailyRollup]:
+            stmt = select(DailyRollupORM)
+            if start_day is not None:
+                stmt = stmt.where(DailyRollupORM.day >= start_day)
+            if end_day is not None:
+                stmt = stmt.where(DailyRollupORM.day <= end_day)
+            with SessionLocal() as session:
+                return [
+                    DailyRollup(
+                        day=obj.day,
+                        state=obj.state,
+                        industry=obj.industry,
+                        risk_level=obj.risk_level,
+                        **{name: getattr(obj, name) for name in ROLLUP_MEASURES},
+                    )
+                    for obj in session.scalars(stmt)
+                ]
+
+        def get_hourly_totals(self, start_day: date, end_day: date) -> Dict[RollupKey, RollupValues]:
+            """
+            Rollup totals keyed by hour instead of day, computed from the
+            source rows for a bounded range of days. Only the columns the
+            rollups need are read; the range is widened by a day on each side
+            to cover the timezone shift and trimmed in Python.
+            """
+            since = datetime.combine(start_day - timedelta(days=1), time.min)
+            until = datetime.combine(end_day + timedelta(days=2), time.min)
+            totals: Dict[RollupKey, RollupValues] = {}
+            with SessionLocal() as session:
+                assessments = session.execute(
+                    select(
+                        AssessmentORM.submission_date, AssessmentORM.overall_percentage, AssessmentORM.overall_risk_level,
+                        LeadORM.operating_states, LeadORM.industry,
+                    )
+                    .outerjoin(LeadORM, LeadORM.id == AssessmentORM.id)
+                    .where(AssessmentORM.submission_date >= since, AssessmentORM.submission_date < until)
+                )
+                for row in assessments:
+                    if start_day <= rollup_day(row.submission_date) <= end_day:
+                        accumulate(totals, assessment_rollup(
+                            row.submission_date, row.overall_percentage, row.overall_risk_level, row.operating_states, row.industry, bucket=rollup_hour
+                        ))
+                leads = session.execute(
+                    select(LeadORM.submission_date, LeadORM.operating_states, LeadORM.industry, LeadORM.overall_risk_level)
+                    .where(LeadORM.submission_date >= since, LeadORM.submission_date < until)
+                )
+                for row in leads:
+                    if start_day <= rollup_day(row.submission_date) <= end_day:
+                        accumulate(totals, lead_rollup(row.submission_date, row.operating_states, row.industry, row.overall_risk_level, bucket=rollup_hour))
+            return totals
+
+        def aggregate_statistics(self, since: Optional[datetime] = None, top_states: int = 5) -> Tuple[int, float, List[Tuple[str, int]]]:
+            """
+            Assessment count/average and the top lead states in one round
+            trip: the one-row assessment aggregate is LEFT JOINed to the
+            grouped count over the unnested operating_states.
+            """
+            totals = select(
+                func.count().label("assessment_count"),
+                func.avg(AssessmentORM.overall_percentage).label("avg_score"),
+            )
+            if since is not None:
+                totals = totals.where(AssessmentORM.submission_date >= since)
+            totals = totals.subquery()
+
+            state = func.jsonb_array_elements_text(LeadORM.operating_states).table_valued("value").lateral()
+            states = (
+                select(state.c.value.label("state"), func.count(LeadORM.id.distinct()).label("lead_count"))
+                .select_from(LeadORM)
+                .join(state, true())
+                .group_by(state.c.value)
+                .order_by(func.count(LeadORM.id.distinct()).desc(), state.c.value)
+                .limit(top_states)
+            )
+            if since is not None:
+                states = states.where(LeadORM.submission_date >= since)
+            states = states.subquery()
+
+            stmt = (
+                select(totals.c.assessment_count, totals.c.avg_score, states.c.state, states.c.lead_count)
+                .select_from(totals.outerjoin(states, true()))
+                .order_by(states.c.lead_count.desc(), states.c.state)
+            )
+            with SessionLocal() as session:
+                rows = session.execute(stmt).all()
+            count = rows[0].assessment_count
+            avg_score = float(rows[0].avg_score) if rows[0].avg_score is not None else 0.0
+            return count, avg_score, [(row.state, row.lead_count) for row in rows if row.state is not None]
+
+        def rebuild_rollups(self) -> int:
+            with engine.begin() as conn:
+                return rebuild_daily_rollups(conn)
+
+        def get_score_sketches(self, start_day: Optional[date] = None, end_day: Optional[date] = None) -> Dict[str, TDigest]:
+            stmt = select(DailyScoreSketchORM.metric, DailyScoreSketchORM.digest)
+            if start_day is not None:
+                stmt = stmt.where(DailyScoreSketchORM.day >= start_day)
+            if end_day is not None:
+                stmt = stmt.where(DailyScoreSketchORM.day <= end_day)
+            with SessionLocal() as session:
+                return merge_sketches(session.execute(stmt))
+
+        def rebuild_sketches(self) -> int:
+            with engine.begin() as conn:
+                return rebuild_score_sketches(conn)
+
+        def record_answer_counts(self, catalog_version: str, chosen: List[Tuple[str, str]], segments: List[SegmentKey]) -> None:
+            rows = [
+                {"catalog_version": catalog_version, "question_id": question_id, "segment": segment,
+                 "segment_value": value, "option_id": option_id, "count": 1}
+                for question_id, option_id in chosen
+                for segment, value in segments
+            ]
+            if not rows:
+                return
+            # Rows are built in primary key order, so concurrent writers
+            # lock them in the same order.
+            rows.sort(key=lambda row: (row["question_id"], row["segment"], row["segment_value"], row["option_id"]))
+            stmt = pg_insert(AnswerCountORM).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["catalog_version", "question_id", "segment", "segment_value", "option_id"],
+                set_={"count": AnswerCountORM.count + stmt.excluded.count},
+            )
+            with SessionLocal() as session:
+                session.execute(stmt)
+                session.commit()
+
+        def get_answer_counts(self, catalog_version: str, question_ids: List[str], segment: SegmentKey) -> Dict[str, Dict[str, int]]:
+            counts: Dict[str, Dict[str, int]] = {question_id: {} for question_id in question_ids}
+            stmt = select(AnswerCountORM.question_id, AnswerCountORM.option_id, AnswerCountORM.count).where(
+                AnswerCountORM.catalog_version == catalog_version,
+                AnswerCountORM.segment == segment[0],
+                AnswerCountORM.segment_value == segment[1],
+                AnswerCountORM.question_id.in_(question_ids),
+            )
+            with SessionLocal() as session:
+                for row in session.execute(stmt):
+                    counts[row.question_id][row.option_id] = row.count
+            return counts
+
+        def get_funnel_counters(self) -> Dict[FunnelKey, int]:
+            with SessionLocal() as session:
+                rows = session.execute(select(FunnelCounterORM.step, FunnelCounterORM.key, FunnelCounterORM.count).where(FunnelCounterORM.count != 0))
+                return {(row.step, row.key): row.count for row in rows}
+
+        def get_completion_times(self) -> TDigest:
+            with SessionLocal() as session:
+                row = session.get(FunnelSketchORM, TIME_TO_COMPLETE)
+                return TDigest.from_dict(row.digest if row else None)
+
+        def rebuild_funnel(self) -> int:
+            with engine.begin() as conn:
+                return rebuild_funnel_counters(conn)
+
+        def get_changes(self, since: int = 0, limit: int = 500) -> List[ChangeRecord]:
+            stmt = select(ChangeLogORM).where(ChangeLogORM.seq > since).order_by(ChangeLogORM.seq).limit(limit)
+            with SessionLocal() as session:
+                return [
+                    ChangeRecord(
+                        seq=obj.seq,
+                        entity=obj.entity,
+                        entity_id=str(obj.entity_id),
+                        op=obj.op,
+                        changed_at=obj.changed_at,
+                    )
+                    for obj in session.scalars(stmt)
+                ]
+
+        def set_assessment_pdf_url(self, assessment_id: str, pdf_url: Optional[str]) -> bool:
+            """
+            Only touches an assessment that still exists, so a report
+            finishing after a deletion cannot bring the row back.
+            """
+            key = parse_uuid(assessment_id)
+            if key is None:
+                return False
+            with SessionLocal() as session:
+                obj = session.get(AssessmentORM, key, with_for_update=True)
+                if obj is None:
+                    return False
+                assessment = self._hydrate_assessment(obj).model_copy(update={"pdf_url": pdf_url})
+                obj.data = None
+                obj.result_json, obj.result_encoding = encode_result_json(assessment)
+                self._invalidate_assessment(session, assessment_id)
+                _record_change(session, ChangeEntity.ASSESSMENT, assessment_id, ChangeOp.UPSERT)
+                session.commit()
+            self._evict_assessment(assessment_id)
+            return True
         
         def delete_assessment(self, assessment_id: str) -> bool:
+            key = parse_uuid(assessment_id)
+            if key is None:
+                return False
+            deleted = past = False
             with SessionLocal() as session:
-                obj = session.get(AssessmentORM, assessment_id)
+                lead = session.get(LeadORM, key, with_for_update=True)
+                obj = session.get(AssessmentORM, key, with_for_update=True)
                 if obj:
+                    past = _apply_rollup_change(session, _assessment_row_rollup(obj, lead), {})
                     session.delete(obj)
+                    session.flush()
+                    rebuild_day_score_sketches(session.connection(), rollup_day(obj.submission_date))
+                    self._invalidate_assessment(session, assessment_id)
+                    _record_change(session, ChangeEntity.ASSESSMENT, assessment_id, ChangeOp.DELETE)
                     session.commit()
-                    return True
-                return False
+                    deleted = True
+            # Evicted only once the delete is committed: a read racing the
+            # delete could otherwise cache the row again, and this worker's
+            # own NOTIFY does not reach it.
+            self._evict_assessment(assessment_id)
+            if past:
+                cache_registry.invalidate_local(SERIES_CACHE, ALL_KEYS)
+            return deleted
         
         def delete_lead(self, lead_id: str) -> bool:
+            key = parse_uuid(lead_id)
+            if key is None:
+                return False
+            deleted = past = False
             with SessionLocal() as session:
-                obj = session.get(LeadORM, lead_id)
+                obj = session.get(LeadORM, key, with_for_update=True)
                 if obj:
+                    assessment = session.get(AssessmentORM, key)
+                    past = _apply_rollup_change(session, _respondent_row_rollup(assessment, obj), _assessment_row_rollup(assessment, None))
+                    progress = session.get(InProgressAssessmentORM, key, with_for_update=True)
+                    _apply_funnel_change(session, session_funnel(obj.status, _progress_question_ids(progress)), {})
+                    if progress is not None:
+                        session.delete(progress)
                     session.delete(obj)
+                    publish_invalidation(session, "leads", lead_id)
+                    _record_change(session, ChangeEntity.LEAD, lead_id, ChangeOp.DELETE)
                     session.commit()
-                    return True
-                return False
+                    deleted = True
+            self.lead_cache.invalidate(lead_id)
+            if past:
+                cache_registry.invalidate_local(SERIES_CACHE, ALL_KEYS)
+            return deleted
         
         def delete_audit_log(self, audit_log_id: str) -> bool:
+            key = parse_uuid(audit_log_id)
+            if key is None:
+                return False
             with SessionLocal() as session:
-                obj = session.get(AuditLogORM, audit_log_id)
+                obj = session.get(AuditLogORM, key)
                 if obj:
                     session.delete(obj)
+                    _record_change(session, ChangeEntity.AUDIT_LOG, audit_log_id, ChangeOp.DELETE)
                     session.commit()
                     return True
                 return False
 
+
+if DATABASE_URL and create_engine is not None:
+    if DATABASE_URL.startswith("postgresql://"):
+        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+    engine = create_engine(DATABASE_URL, future=True)
+    SessionLocal.configure(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    from app.migrations import run_migrations
+    run_migrations(engine)
+
+    configure_invalidation_channel(os.getenv("DATABASE_URL"))
+
     db = SQLDatabase()
 else:
     db = InMemoryDatabase()
@@ -1,26 +1,65 @@
 import os
-import time
+import smtplib
 import uuid
 from datetime import datetime
-from typing import Optional, Dict
+from email.message import EmailMessage
+from typing import Optional, Dict, List, Tuple
 import boto3
 from botocore.exceptions import ClientError
-from jinja2 import Environment, FileSystemLoader
-from app.models import AssessmentResult, AuditLog, EmailStatus
+from app.models import AssessmentResult, AuditLog, EmailStatus, OutboxKind, OutboxMessage, OutboxStatus
 from app.database import db
+from app.circuit_breaker import CircuitBreaker
+from app.smtp_pool import SMTPPool
+from app.email_templates import email_templates
+
+# "ses" or "smtp"; SMTP sends go through a pool of persistent sessions
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "ses")
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+# The breaker opens when at least EMAIL_BREAKER_MIN_CALLS of the last
+# EMAIL_BREAKER_WINDOW sends were made and EMAIL_BREAKER_FAILURE_RATE of
+# them failed on the provider side, then probes the provider again after
+# EMAIL_BREAKER_OPEN_SECONDS.
+EMAIL_BREAKER_WINDOW = int(os.getenv("EMAIL_BREAKER_WINDOW", "20"))
+EMAIL_BREAKER_MIN_CALLS = int(os.getenv("EMAIL_BREAKER_MIN_CALLS", "5"))
+EMAIL_BREAKER_FAILURE_RATE = float(os.getenv("EMAIL_BREAKER_FAILURE_RATE", "0.5"))
+EMAIL_BREAKER_OPEN_SECONDS = float(os.getenv("EMAIL_BREAKER_OPEN_SECONDS", "60"))
+
+# Coalescing mode: with a window set, notifications are buffered and sent
+# as one summary email once the oldest has waited that long or
+# NOTIFICATION_COALESCE_MAX have collected. 0 sends one email each.
+NOTIFICATION_COALESCE_SECONDS = float(os.getenv("NOTIFICATION_COALESCE_SECONDS", "0"))
+NOTIFICATION_COALESCE_MAX = int(os.getenv("NOTIFICATION_COALESCE_MAX", "100"))
+
+# SES errors that say the provider is unhealthy rather than that the
+# message was bad; only these count against the breaker.
+PROVIDER_ERROR_CODES = {"Throttling", "ThrottlingException", "ServiceUnavailable", "InternalFailure", "RequestTimeout"}
 
 
 class EmailService:
     def __init__(self):
         self.ses_client = None
         self.smtp_config = None
+        self.smtp_pool = None
+        self.transport = EMAIL_TRANSPORT
         self.recipient_email = os.getenv("NOTIFICATION_EMAIL", "service@offrd.co")
         self.sender_email = os.getenv("SENDER_EMAIL", "noreply@offrd.co")
+        self.smtp_sender = os.getenv("SMTP_FROM_EMAIL") or self.sender_email
         self.aws_region = os.getenv("AWS_REGION", "us-east-1")
-        self.max_retries = 3
+        self.coalesce_seconds = NOTIFICATION_COALESCE_SECONDS
+        self.coalesce_max = NOTIFICATION_COALESCE_MAX
+        self.breaker = CircuitBreaker(
+            self.transport,
+            window=EMAIL_BREAKER_WINDOW,
+            min_calls=EMAIL_BREAKER_MIN_CALLS,
+            failure_rate=EMAIL_BREAKER_FAILURE_RATE,
+            open_seconds=EMAIL_BREAKER_OPEN_SECONDS
+        )
         
-        templates_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
-        self.jinja_env = Environment(loader=FileSystemLoader(templates_dir))
+        self.templates = email_templates
         
         aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
         aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
@@ -32,44 +71,33 @@ class EmailService:
                 aws_access_key_id=aws_access_key,
                 aws_secret_access_key=aws_secret_key
             )
+        
+        smtp_host = os.getenv("SMTP_HOST")
+        if smtp_host:
+            self.smtp_config = {
+                "host": smtp_host,
+                "port": int(os.getenv("SMTP_PORT", "587")),
+                "username": os.getenv("SMTP_USER") or None,
+                "password": os.getenv("SMTP_PASSWORD") or None,
+                "starttls": os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+                "use_ssl": os.getenv("SMTP_SSL", "false").lower() == "true",
+            }
+        if self.transport == "smtp" and self.smtp_config:
+            self.smtp_pool = SMTPPool(
+                **self.smtp_config,
+                size=SMTP_POOL_SIZE,
+                timeout=SMTP_TIMEOUT_SECONDS,
+                idle_check_seconds=SMTP_IDLE_CHECK_SECONDS,
+                max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION
+            )
     
     def _format_email_subject(self, company_name: str, email: str, score: float) -> str:
         return f"New Compliance Check – {company_name} ({email}) – Score {score:.1f}%"
     
     def _format_email_body(self, assessment: AssessmentResult) -> str:
-        body = f"""
-New Compliance Health Check Completed
-
-Company Details:
-- Company Name: {assessment.company_name}
-- Contact Name: {assessment.contact_name}
-- Email: {assessment.email}
-- Company Size: {assessment.company_size if hasattr(assessment, 'company_size') else 'N/A'}
-- Industry: {assessment.industry if hasattr(assessment, 'industry') else 'N/A'}
-
-Assessment Results:
-- Overall Score: {assessment.overall_percentage:.1f}%
-- Risk Level: {assessment.overall_risk_level.value.upper()}
-- Submission Date: {assessment.submission_date.strftime('%Y-%m-%d %H:%M:%S')}
-
-Category Breakdown:
-"""
-        for cat_score in assessment.category_scores:
-            body += f"\n{cat_score.category.value}:\n"
-            body += f"  - Score: {cat_score.percentage:.1f}%\n"
-            body += f"  - Risk Level: {cat_score.risk_level.value.upper()}\n"
-            if cat_score.issues:
-                body += f"  - Issues: {len(cat_score.issues)}\n"
-        
-        body += "\n\nPriority Actions:\n"
-        for i, action in enumerate(assessment.priority_actions, 1):
-            body += f"{i}. {action}\n"
-        
-        body += f"\n\nAssessment ID: {assessment.id}\n"
-        
-        return body
+        return self.templates.render('notification.txt', assessment=assessment)
     
-    def _send_via_ses(self, subject: str, body: str) -> tuple[bool, Optional[str]]:
+    def _send_via_ses(self, subject: str, body: str, recipient: Optional[str] = None) -> tuple[bool, Optional[str]]:
         if not self.ses_client:
             return False, "SES client not configured"
         
@@ -77,7 +105,7 @@ Category Breakdown:
             response = self.ses_client.send_email(
                 Source=self.sender_email,
                 Destination={
-                    'ToAddresses': [self.recipient_email]
+                    'ToAddresses': [recipient or self.recipient_email]
                 },
                 Message={
                     'Subject': {
@@ -92,20 +120,70 @@ Category Breakdown:
                     }
                 }
             )
+            self.breaker.record(True)
             return True, None
         except ClientError as e:
+            self.breaker.record(e.response['Error'].get('Code') not in PROVIDER_ERROR_CODES)
             error_message = e.response['Error']['Message']
             return False, f"SES Error: {error_message}"
         except Exception as e:
+            self.breaker.record(False)
+            return False, f"Unexpected error: {str(e)}"
+    
+    def _send_via_smtp(self, subject: str, body: str, recipient: Optional[str] = None, html: bool = False) -> tuple[bool, Optional[str]]:
+        """
+        Send an email over a pooled SMTP session. 4xx replies and dropped
+        connections count against the circuit breaker; 5xx replies reject
+        only this message.
+        """
+        message = EmailMessage()
+        message["From"] = self.smtp_sender
+        message["To"] = recipient or self.recipient_email
+        message["Subject"] = subject
+        message.set_content(body, subtype="html" if html else "plain")
+        
+        try:
+            self.smtp_pool.send(message)
+            self.breaker.record(True)
+            return True, None
+        except smtplib.SMTPRecipientsRefused as e:
+            self.breaker.record(True)
+            return False, f"SMTP Error: recipients refused: {', '.join(e.recipients)}"
+        except smtplib.SMTPResponseException as e:
+            self.breaker.record(not 400 <= e.smtp_code < 500)
+            error_message = e.smtp_error.decode(errors="replace") if isinstance(e.smtp_error, bytes) else str(e.smtp_error)
+            return False, f"SMTP Error: {e.smtp_code} {error_message}"
+        except (smtplib.SMTPException, OSError) as e:
+            self.breaker.record(False)
+            return False, f"SMTP Error: {str(e)}"
+        except Exception as e:
+            self.breaker.record(False)
             return False, f"Unexpected error: {str(e)}"
     
-    def send_notification(self, assessment: AssessmentResult) -> AuditLog:
+    def close(self) -> None:
+        if self.smtp_pool:
+            self.smtp_pool.close()
+    
+    def stats(self) -> Dict:
+        return {
+            "transport": self.transport,
+            "circuit_breaker": self.breaker.stats(),
+            "smtp_pool": self.smtp_pool.stats() if self.smtp_pool else None,
+        }
+    
+    def build_notification(self, assessment: AssessmentResult) -> Tuple[AuditLog, OutboxMessage]:
+        """
+        Pending audit log and outbox message for a completed assessment, to
+        be stored with it and delivered by the outbox dispatcher. In
+        coalescing mode the message is buffered for the next batch.
+        """
         subject = self._format_email_subject(
             assessment.company_name,
             str(assessment.email),
             assessment.overall_percentage
         )
         body = self._format_email_body(assessment)
+        now = datetime.now()
         
         audit_log = AuditLog(
             id=str(uuid.uuid4()),
@@ -116,52 +194,102 @@ Category Breakdown:
             email_status=EmailStatus.PENDING,
             attempts=0,
             error_message=None,
-            timestamp=datetime.now()
+            timestamp=now
         )
-        
-        success = False
-        last_error = None
-        
-        for attempt in range(1, self.max_retries + 1):
-            audit_log.attempts = attempt
-            
-            success, error = self._send_via_ses(subject, body)
-            
-            if success:
-                audit_log.email_status = EmailStatus.SUCCESS
-                break
-            else:
-                last_error = error
-                if attempt < self.max_retries:
-                    time.sleep(2 ** attempt)
-        
-        if not success:
-            audit_log.email_status = EmailStatus.FAILED
-            audit_log.error_message = last_error
-        
-        db.save_audit_log(audit_log)
-        
-        return audit_log
+        message = OutboxMessage(
+            id=str(uuid.uuid4()),
+            kind=OutboxKind.NOTIFICATION,
+            audit_log_id=audit_log.id,
+            recipient=self.recipient_email,
+            subject=subject,
+            body=body,
+            status=OutboxStatus.BUFFERED if self.coalesce_seconds > 0 else OutboxStatus.PENDING,
+            created_at=now,
+            next_attempt_at=now
+        )
+        return audit_log, message
+    
+    def build_notification_batch(self, audit_logs: List[AuditLog]) -> OutboxMessage:
+        """
+        One summary email for a batch of buffered notifications.
+        """
+        average = sum(a.score for a in audit_logs) / len(audit_logs) if audit_logs else 0.0
+        noun = "Check" if len(audit_logs) == 1 else "Checks"
+        subject = f"{len(audit_logs)} New Compliance {noun} – Average Score {average:.1f}%"
+        html_body = self.templates.render(
+            'notification_batch.html',
+            assessments=[
+                {
+                    "company_name": a.company_name,
+                    "email": str(a.email),
+                    "score": f"{a.score:.1f}",
+                    "submitted": a.timestamp.strftime('%Y-%m-%d %H:%M'),
+                    "assessment_id": a.assessment_id,
+                }
+                for a in audit_logs
+            ],
+            total=len(audit_logs),
+            avg_score=f"{average:.1f}"
+        )
+        now = datetime.now()
+        return OutboxMessage(
+            id=str(uuid.uuid4()),
+            kind=OutboxKind.NOTIFICATION_BATCH,
+            recipient=self.recipient_email,
+            subject=subject,
+            body=html_body,
+            html=True,
+            created_at=now,
+            next_attempt_at=now
+        )
+    
+    def deliver(self, message: OutboxMessage) -> tuple[bool, Optional[str]]:
+        """
+        Make one delivery attempt for an outbox message over the configured
+        transport. While the circuit breaker is open the attempt fails
+        without calling the provider, and the message goes back to the
+        outbox for a later retry.
+        """
+        if self.transport == "smtp":
+            if not self.smtp_pool:
+                return False, "SMTP transport not configured"
+            if not self.breaker.allow():
+                return False, "Email provider circuit open"
+            return self._send_via_smtp(message.subject, message.body, message.recipient, html=message.html)
+        if not self.ses_client:
+            return False, "SES client not configured"
+        if not self.breaker.allow():
+            return False, "Email provider circuit open"
+        if message.html:
+            return self._send_html_via_ses(message.subject, message.body, message.recipient)
+        return self._send_via_ses(message.subject, message.body, message.recipient)
     
     def _render_digest_template(self, stats: Dict) -> str:
         """
         Render the digest email template with statistics data.
         """
-        template = self.jinja_env.get_template('digest.html')
         
         period_start = stats['period_start'].strftime('%Y-%m-%d')
         period_end = stats['period_end'].strftime('%Y-%m-%d')
         avg_score = f"{stats['avg_score']:.1f}"
+        score_quantiles = None
+        if stats.get('score_p50') is not None:
+            score_quantiles = [
+                (label, f"{stats[key]:.1f}")
+                for label, key in (('P10', 'score_p10'), ('Median', 'score_p50'), ('P90', 'score_p90'))
+            ]
         
-        return template.render(
+        return self.templates.render(
+            'digest.html',
             total_assessments=stats['total_assessments'],
             avg_score=avg_score,
+            score_quantiles=score_quantiles,
             top_5_states=stats['top_5_states'],
             period_start=period_start,
             period_end=period_end
         )
     
-    def _send_html_via_ses(self, subject: str, html_body: str) -> tuple[bool, Optional[str]]:
+    def _send_html_via_ses(self, subject: str, html_body: str, recipient: Optional[str] = None) -> tuple[bool, Optional[str]]:
         """
         Send HTML email via AWS SES.
         """
@@ -172,7 +300,7 @@ Category Breakdown:
             response = self.ses_client.send_email(
                 Source=self.sender_email,
                 Destination={
-                    'ToAddresses': [self.recipient_email]
+                    'ToAddresses': [recipient or self.recipient_email]
                 },
                 Message={
                     'Subject': {
@@ -187,23 +315,27 @@ Category Breakdown:
                     }
                 }
             )
+            self.breaker.record(True)
             return True, None
         except ClientError as e:
+            self.breaker.record(e.response['Error'].get('Code') not in PROVIDER_ERROR_CODES)
             error_message = e.response['Error']['Message']
             return False, f"SES Error: {error_message}"
         except Exception as e:
+            self.breaker.record(False)
             return False, f"Unexpected error: {str(e)}"
     
     def send_weekly_digest(self, stats: Dict) -> tuple[bool, Optional[str]]:
         """
-        Send the weekly digest email with statistics.
+        Queue the weekly digest email with statistics. Delivery and retries
+        happen in the outbox dispatcher.
         
         Args:
             stats: Dictionary containing total_assessments, avg_score, top_5_states,
                    period_start, and period_end
         
         Returns:
-            Tuple of (success: bool, error_message: Optional[str])
+            Tuple of (queued: bool, error_message: Optional[str])
         """
         subject = f"Weekly Compliance Digest - {stats['total_assessments']} Assessments"
         
@@ -212,20 +344,18 @@ Category Breakdown:
         except Exception as e:
             return False, f"Template rendering error: {str(e)}"
         
-        success = False
-        last_error = None
-        
-        for attempt in range(1, self.max_retries + 1):
-            success, error = self._send_html_via_ses(subject, html_body)
-            
-            if success:
-                break
-            else:
-                last_error = error
-                if attempt < self.max_retries:
-                    time.sleep(2 ** attempt)
-        
-        return success, last_error
+        now = datetime.now()
+        db.enqueue_outbox(OutboxMessage(
+            id=str(uuid.uuid4()),
+            kind=OutboxKind.DIGEST,
+            recipient=self.recipient_email,
+            subject=subject,
+            body=html_body,
+            html=True,
+            created_at=now,
+            next_attempt_at=now
+        ))
+        return True, None
 
 
 email_service = EmailService()
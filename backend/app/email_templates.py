@@ -0,0 +1,106 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined, Template, select_autoescape
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+# Compiled template bytecode, shared by workers and kept across restarts
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    "JINJA_BYTECODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "startup-health-check-jinja")
+)
+
+EMAIL_TEMPLATES = ("notification.txt", "notification_batch.html", "digest.html")
+
+
+class EmailTemplates:
+    """
+    Email templates compiled once at startup. HTML templates are
+    autoescaped; plain-text ones are not. Template files are not reloaded
+    when they change, so a deploy needs a restart.
+    """
+
+    def __init__(self, templates_dir: str = TEMPLATES_DIR, bytecode_cache_dir: Optional[str] = JINJA_BYTECODE_CACHE_DIR):
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+        self.env = Environment(
+            loader=FileSystemLoader(templates_dir),
+            autoescape=select_autoescape(["html"]),
+            bytecode_cache=bytecode_cache,
+            auto_reload=False,
+            undefined=StrictUndefined,
+            keep_trailing_newline=True,
+        )
+        self.templates: Dict[str, Template] = {name: self.env.get_template(name) for name in EMAIL_TEMPLATES}
+
+    def render(self, name: str, **context) -> str:
+        return self.templates[name].render(**context)
+
+
+email_templates = EmailTemplates()
+
+
+def benchmark(iterations: int) -> List[Dict]:
+    """
+    Average render time of each email template with sample data.
+    """
+    # Imported here: the sample data comes from the scoring code.
+    from datetime import datetime
+    from app.assessment_service import calculate_assessment_result
+    from app.models import AssessmentSubmission
+    from app.questions_data import get_all_questions
+
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    assessment = calculate_assessment_result(AssessmentSubmission(
+        company_name="Benchmark Co", contact_name="Jo", email="jo@example.com", company_size="10-50", answers=answers
+    ))
+    now = datetime.now()
+    contexts = {
+        "notification.txt": {"assessment": assessment},
+        "notification_batch.html": {
+            "assessments": [
+                {"company_name": f"Company {i}", "email": "jo@example.com", "score": "72.5",
+                 "submitted": now.strftime('%Y-%m-%d %H:%M'), "assessment_id": assessment.id}
+                for i in range(100)
+            ],
+            "total": 100,
+            "avg_score": "72.5",
+        },
+        "digest.html": {
+            "total_assessments": 1000, "avg_score": "72.5", "score_quantiles": [("P10", "40.0"), ("Median", "72.5"), ("P90", "95.0")],
+            "top_5_states": [("NSW", 400), ("VIC", 300), ("QLD", 150), ("WA", 100), ("SA", 50)],
+            "period_start": "2026-01-01", "period_end": "2026-01-07",
+        },
+    }
+    results = []
+    for name, context in contexts.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            email_templates.render(name, **context)
+        elapsed = time.perf_counter() - started
+        results.append({"template": name, "iterations": iterations, "microseconds": elapsed / iterations * 1e6})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Email template tools")
+    parser.add_argument("command", choices=["benchmark"], help="benchmark: time rendering each email template")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    for result in benchmark(args.iterations):
+        logger.info(f"{result['template']}: {result['microseconds']:.0f} µs per render over {result['iterations']} renders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except Exception:
+    pa = None
+    pq = None
+    PARQUET_AVAILABLE = False
+
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from app.admin_models import ExportFormat, ExportJob, ExportJobStatus, TrialFilters, TrialRecord
+from app.admin_service import CSV_HEADER, trial_csv_row
+from app.database import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/tmp/trial_exports")
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+EXPORT_REUSE_SECONDS = int(os.getenv("EXPORT_REUSE_SECONDS", "300"))
+EXPORT_MAX_WORKERS = int(os.getenv("EXPORT_MAX_WORKERS", "2"))
+EXPORT_LEASE_SECONDS = int(os.getenv("EXPORT_LEASE_SECONDS", "120"))
+
+PROGRESS_EVERY_ROWS = 1000
+PARQUET_BATCH_ROWS = 5000
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+MEDIA_TYPES = {
+    ExportFormat.CSV_GZIP: "application/gzip",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+class ExportFormatUnavailable(Exception):
+    pass
+
+
+class ExportJobManager:
+    """
+    Runs trial exports in a background thread pool and writes the artifact
+    to local storage.
+
+    Job state lives in a JSON manifest next to the artifact rather than in
+    process memory, so any uvicorn worker can report progress for a job
+    started by another one and reuse its artifact for identical filters.
+    A running job refreshes `heartbeat_at` whenever it saves progress; one
+    that has not done so within the lease is treated as abandoned.
+    """
+
+    def __init__(
+        self,
+        export_dir: str = EXPORT_DIR,
+        ttl_seconds: int = EXPORT_TTL_SECONDS,
+        reuse_seconds: int = EXPORT_REUSE_SECONDS,
+        max_workers: int = EXPORT_MAX_WORKERS,
+        lease_seconds: int = EXPORT_LEASE_SECONDS,
+    ):
+        self.export_dir = export_dir
+        self.ttl_seconds = ttl_seconds
+        self.reuse_seconds = reuse_seconds
+        self.lease_seconds = lease_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trial-export")
+
+    @staticmethod
+    def job_key(filters: Optional[TrialFilters], fmt: ExportFormat) -> str:
+        payload = {
+            "filters": filters.model_dump(mode="json") if filters else None,
+            "format": fmt.value,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def artifact_path(self, job: ExportJob) -> str:
+        return os.path.join(self.export_dir, f"{job.id}.{job.format.value}")
+
+    def _manifest_path(self, job_id: str) -> str:
+        return os.path.join(self.export_dir, f"{job_id}.json")
+
+    def _save(self, job: ExportJob) -> None:
+        job.heartbeat_at = datetime.now()
+        path = self._manifest_path(job.id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(job.model_dump_json())
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id: str) -> Optional[ExportJob]:
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._manifest_path(job_id)) as f:
+                return ExportJob.model_validate_json(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _jobs(self) -> List[ExportJob]:
+        jobs = []
+        for path in glob.glob(os.path.join(self.export_dir, "*.json")):
+            job = self._load(os.path.basename(path)[:-len(".json")])
+            if job:
+                jobs.append(job)
+        return jobs
+
+    def create_job(self, filters: Optional[TrialFilters], fmt: ExportFormat = ExportFormat.CSV_GZIP) -> ExportJob:
+        """
+        Start an export, or return a recent job for the same filters and
+        format if one is still pending, running or downloadable.
+        """
+        if fmt == ExportFormat.PARQUET and not PARQUET_AVAILABLE:
+            raise ExportFormatUnavailable("Parquet export is not available - pyarrow is not installed")
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.cleanup_expired()
+
+        key = self.job_key(filters, fmt)
+        now = datetime.now()
+        reusable = [
+            job for job in self._jobs()
+            if job.key == key
+            and job.status in (ExportJobStatus.PENDING, ExportJobStatus.RUNNING, ExportJobStatus.COMPLETED)
+            and (now - job.created_at).total_seconds() <= self.reuse_seconds
+        ]
+        if reusable:
+            return max(reusable, key=lambda job: job.created_at)
+
+        job = ExportJob(id=uuid.uuid4().hex, key=key, format=fmt, filters=filters, created_at=now)
+        self._save(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        job = self._load(job_id)
+        if job and self._is_expired(job):
+            self._expire(job)
+        return job
+
+    def _is_expired(self, job: ExportJob) -> bool:
+        return (
+            job.status == ExportJobStatus.COMPLETED
+            and job.expires_at is not None
+            and job.expires_at <= datetime.now()
+        )
+
+    def _is_abandoned(self, job: ExportJob) -> bool:
+        heartbeat = job.heartbeat_at or job.created_at
+        return (
+            job.status == ExportJobStatus.RUNNING
+            and (datetime.now() - heartbeat).total_seconds() > self.lease_seconds
+        )
+
+    def _expire(self, job: ExportJob) -> None:
+        try:
+            os.remove(self.artifact_path(job))
+        except FileNotFoundError:
+            pass
+        job.status = ExportJobStatus.EXPIRED
+        self._save(job)
+
+    def cleanup_expired(self) -> None:
+        """
+        Delete expired artifacts, fail running jobs whose worker has missed
+        its lease (e.g. it was restarted mid-export) so they are not reused,
+        and forget unfinished jobs after the TTL.
+        """
+        cutoff = datetime.now() - timedelta(seconds=self.ttl_seconds)
+        for job in self._jobs():
+            if self._is_expired(job):
+                self._expire(job)
+            elif self._is_abandoned(job):
+                job.status = ExportJobStatus.FAILED
+                job.error = "Export worker stopped before finishing"
+                self._save(job)
+            elif job.status != ExportJobStatus.COMPLETED and job.created_at < cutoff:
+                for path in (self.artifact_path(job), f"{self.artifact_path(job)}.part", self._manifest_path(job.id)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def _run(self, job: ExportJob) -> None:
+        path = self.artifact_path(job)
+        part_path = f"{path}.part"
+        try:
+            job.status = ExportJobStatus.RUNNING
+            job.total_rows = db.count_trials(job.filters)
+            self._save(job)
+
+            trials = db.iter_trials(job.filters)
+            if job.format == ExportFormat.PARQUET:
+                self._write_parquet(job, trials, part_path)
+            else:
+                self._write_csv_gzip(job, trials, part_path)
+            os.replace(part_path, path)
+
+            job.status = ExportJobStatus.COMPLETED
+            job.completed_at = datetime.now()
+            job.expires_at = job.completed_at + timedelta(seconds=self.ttl_seconds)
+            job.file_size = os.path.getsize(path)
+        except Exception as e:
+            logger.error(f"Trial export {job.id} failed: {str(e)}", exc_info=True)
+            job.status = ExportJobStatus.FAILED
+            job.error = str(e)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        self._save(job)
+
+    def _progress(self, job: ExportJob, rows_written: int) -> None:
+        job.rows_written = rows_written
+        if rows_written % PROGRESS_EVERY_ROWS == 0:
+            self._save(job)
+
+    def _write_csv_gzip(self, job: ExportJob, trials: Iterable[TrialRecord], path: str) -> None:
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for rows_written, trial in enumerate(trials, 1):
+                writer.writerow(trial_csv_row(trial))
+                self._progress(job, rows_written)
+
+    def _write_parquet(self, job: ExportJob, trials: Iterable[TrialRecord], path: str) -> None:
+        schema = pa.schema([
+            ("email", pa.string()),
+            ("company", pa.string()),
+            ("states", pa.list_(pa.string())),
+            ("score", pa.float64()),
+            ("rating", pa.string()),
+            ("started", pa.timestamp("us")),
+            ("completed", pa.timestamp("us")),
+            ("status", pa.string()),
+        ])
+        columns = {name: [] for name in schema.names}
+
+        def flush(writer) -> None:
+            writer.write_batch(pa.record_batch([columns[name] for name in schema.names], schema=schema))
+            for values in columns.values():
+                values.clear()
+
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            rows_written = 0
+            for trial in trials:
+                columns["email"].append(str(trial.email))
+                columns["company"].append(trial.company)
+                columns["states"].append(trial.states)
+                columns["score"].append(trial.score)
+                columns["rating"].append(trial.rating.value if trial.rating else None)
+                columns["started"].append(trial.started)
+                columns["completed"].append(trial.completed)
+                columns["status"].append(trial.status.value)
+                rows_written += 1
+                self._progress(job, rows_written)
+                if len(columns["email"]) >= PARQUET_BATCH_ROWS:
+                    flush(writer)
+            if columns["email"]:
+                flush(writer)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+export_job_manager = ExportJobManager()
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from sqlalchemy import text
+except Exception:  # noqa: F401
+    text = None  # type: ignore
+
+from app.admin_models import FunnelSummary
+from app.models import LeadStatus
+from app.sketches import TDigest
+
+# Counter rows are (step, key): ("started", ""), ("answered", "<n>") for
+# sessions that answered at least n questions, ("completed", "") and
+# ("drop_off", "<question id>") for unfinished sessions by last answer.
+FunnelKey = Tuple[str, str]
+
+STARTED = "started"
+ANSWERED = "answered"
+COMPLETED = "completed"
+DROP_OFF = "drop_off"
+
+TIME_TO_COMPLETE = "time_to_complete"
+
+
+def session_funnel(status: Optional[LeadStatus], question_ids: List[str]) -> Dict[FunnelKey, int]:
+    """
+    Contribution of one assessment session (a lead and its in-progress
+    answers, in answer order) to the funnel counters. A session without a
+    lead contributes nothing.
+    """
+    if status is None:
+        return {}
+    counts = {(STARTED, ""): 1}
+    for answered in range(1, len(question_ids) + 1):
+        counts[(ANSWERED, str(answered))] = 1
+    if status == LeadStatus.COMPLETED:
+        counts[(COMPLETED, "")] = 1
+    elif question_ids:
+        counts[(DROP_OFF, question_ids[-1])] = 1
+    return counts
+
+
+def funnel_delta(before: Dict[FunnelKey, int], after: Dict[FunnelKey, int]) -> Dict[FunnelKey, int]:
+    """
+    What to add to the counters when a session changes from `before` to
+    `after`. Answering one more question touches two or three keys.
+    """
+    delta = dict(after)
+    for key, count in before.items():
+        delta[key] = delta.get(key, 0) - count
+    return {key: count for key, count in delta.items() if count}
+
+
+def seconds_since(started_at: datetime) -> float:
+    return (datetime.now(started_at.tzinfo) - started_at).total_seconds()
+
+
+def summarize_funnel(counters: Dict[FunnelKey, int], completion_times: TDigest) -> FunnelSummary:
+    started = counters.get((STARTED, ""), 0)
+    completed = counters.get((COMPLETED, ""), 0)
+    answered = {int(key): count for (step, key), count in counters.items() if step == ANSWERED and count}
+    drop_off = {key: count for (step, key), count in counters.items() if step == DROP_OFF and count}
+    return FunnelSummary(
+        started=started,
+        answered_at_least=dict(sorted(answered.items())),
+        completed=completed,
+        completion_rate=completed / started if started else 0.0,
+        drop_off=dict(sorted(drop_off.items(), key=lambda item: (-item[1], item[0]))),
+        median_seconds_to_complete=completion_times.quantile(0.5),
+        p90_seconds_to_complete=completion_times.quantile(0.9),
+    )
+
+
+def rebuild_funnel_counters(conn) -> int:
+    """
+    Recompute the Postgres funnel tables from the leads, in-progress
+    answers and assessments. Completion times are taken from assessments
+    submitted after their lead started, i.e. sessions that went through
+    the question-by-question flow.
+    """
+    conn.execute(text("LOCK TABLE funnel_counters, funnel_sketches IN EXCLUSIVE MODE"))
+    counters: Dict[FunnelKey, int] = {}
+    completion_times = TDigest()
+    rows = conn.execute(text(
+        "SELECT l.status, p.answers, l.submission_date AS started_at, a.submission_date AS completed_at "
+        "FROM leads l "
+        "LEFT JOIN in_progress_assessments p ON p.id = l.id "
+        "LEFT JOIN assessments a ON a.id = l.id"
+    ).execution_options(yield_per=1000))
+    for row in rows:
+        status = LeadStatus(row.status)
+        question_ids = [answer["question_id"] for answer in row.answers or []]
+        for key, count in session_funnel(status, question_ids).items():
+            counters[key] = counters.get(key, 0) + count
+        if status == LeadStatus.COMPLETED and row.completed_at is not None and row.completed_at > row.started_at:
+            completion_times.add((row.completed_at - row.started_at).total_seconds())
+
+    conn.execute(text("DELETE FROM funnel_counters"))
+    conn.execute(text("DELETE FROM funnel_sketches"))
+    if counters:
+        conn.execute(
+            text("INSERT INTO funnel_counters (step, key, count) VALUES (:step, :key, :count)"),
+            [{"step": step, "key": key, "count": count} for (step, key), count in sorted(counters.items())],
+        )
+    if completion_times.count:
+        conn.execute(
+            text("INSERT INTO funnel_sketches (metric, digest) VALUES (:metric, CAST(:digest AS jsonb))"),
+            {"metric": TIME_TO_COMPLETE, "digest": json.dumps(completion_times.to_dict())},
+        )
+    return len(counters)
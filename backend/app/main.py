@@ -1,30 +1,33 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
+import gzip
 import hashlib
 import uuid
 from contextlib import asynccontextmanager
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from app.models import Question, AssessmentSubmission, AssessmentResult, Lead, StartAssessmentRequest, LeadStatus, AnswerRequest, InProgressAssessment, Answer, AuditLog
-from app.questions_data import get_all_questions, get_question_by_id
+from app.models import Question, AssessmentSubmission, AssessmentResult, Lead, StartAssessmentRequest, LeadStatus, AnswerRequest, InProgressAssessment, Answer, AuditLog, ChangePage, OutboxKind
+from app.questions_data import CATALOG_VERSION, get_all_questions, get_question_by_id
 from app.assessment_service import calculate_assessment_result, create_lead_from_submission
+from app.answer_counts import answer_segments, chosen_options
 from app.database import db
-try:
-    from app.pdf_service import generate_pdf_report
-    PDF_SERVICE_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: PDF service not available: {e}")
-    PDF_SERVICE_AVAILABLE = False
-    generate_pdf_report = None
+from app.cache import cache_registry
+from app.change_feed import get_change_page, MAX_PAGE_SIZE as CHANGES_MAX_PAGE_SIZE
+from app.pdf_pool import pdf_render_pool, PDFPoolBusy, PDFRenderTimeout
+from app.report_cache import report_cache
 from app.email_service import email_service
-from app.admin_models import TrialRecord, TrialFilters
-from app.admin_service import get_trials, export_trials_csv
+from app.admin_models import TrialRecord, TrialFilters, TrialFacets, FunnelSummary, AnswerDistribution, AnswerSegment, ExportFormat, ExportJob, ExportJobStatus, SeriesBucket, SeriesGroupBy, StatisticsSeries
+from app.admin_service import get_trials, get_trial_facets, stream_trials_csv, gzip_chunks
+from app.export_jobs import export_job_manager, ExportFormatUnavailable, MEDIA_TYPES as EXPORT_MEDIA_TYPES
 from app.auth import get_current_user
 from app.scheduler import digest_scheduler
+from app.outbox import outbox_dispatcher
+from app.statistics_service import statistics_service
+from app.sketches import ScoreDistribution
 from app.middleware import SecurityHeadersMiddleware
 from app.security import sanitize_dict, verify_turnstile_token, verify_recaptcha_token
 from pydantic import BaseModel
@@ -33,7 +36,16 @@ from pydantic import BaseModel
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     digest_scheduler.start()
+    outbox_dispatcher.start()
+    if cache_registry.channel:
+        cache_registry.channel.start()
     yield
+    if cache_registry.channel:
+        cache_registry.channel.stop()
+    export_job_manager.shutdown()
+    outbox_dispatcher.shutdown()
+    email_service.close()
+    pdf_render_pool.shutdown()
     digest_scheduler.shutdown()
 
 
@@ -172,35 +184,58 @@ async def submit_answer(answer_request: AnswerRequest):
         raise HTTPException(status_code=500, detail=f"Error saving answer: {str(e)}")
 
 
+def finalize_submission(submission: AssessmentSubmission, notify: bool = False) -> AssessmentResult:
+    """
+    Score a submission and store its assessment and lead. A `lead_id`
+    must name a session that was started with the submission's email and
+    is not completed yet. With `notify`, the notification email is queued
+    in the assessment's transaction and delivered by the outbox dispatcher.
+    """
+    started = None
+    if submission.lead_id:
+        started = db.get_lead(submission.lead_id)
+        if not started:
+            raise HTTPException(status_code=404, detail="Lead not found")
+        if started.status == LeadStatus.COMPLETED:
+            raise HTTPException(status_code=409, detail="Assessment already submitted")
+        if started.email.lower() != submission.email.lower():
+            raise HTTPException(status_code=409, detail="Email does not match the started assessment")
+    
+    result = calculate_assessment_result(submission, started.id if started else None)
+    notification = email_service.build_notification(result) if notify else None
+    db.save_assessment(result, notification)
+    
+    lead = create_lead_from_submission(submission, result, started)
+    db.save_lead(lead)
+    
+    db.record_answer_counts(
+        CATALOG_VERSION,
+        chosen_options(submission.answers),
+        answer_segments(lead.operating_states, lead.industry),
+    )
+    if notification is not None:
+        outbox_dispatcher.wake()
+    return result
+
+
 @app.post("/api/v1/assessments", response_model=AssessmentResult)
-async def submit_assessment(submission: AssessmentSubmission):
+async def submit_assessment(submission: AssessmentSubmission, background_tasks: BackgroundTasks):
     try:
-        result = calculate_assessment_result(submission)
-        
-        db.save_assessment(result)
-        
-        lead = create_lead_from_submission(submission, result)
-        db.save_lead(lead)
-        
+        result = finalize_submission(submission)
+        # Most users download the report right after seeing their result
+        background_tasks.add_task(report_cache.prerender, result)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing assessment: {str(e)}")
 
 
 @app.post("/api/v1/assessments/compute")
-async def compute_assessment(submission: AssessmentSubmission):
+async def compute_assessment(submission: AssessmentSubmission, background_tasks: BackgroundTasks):
     try:
-        result = calculate_assessment_result(submission)
-        
-        db.save_assessment(result)
-        
-        lead = create_lead_from_submission(submission, result)
-        db.save_lead(lead)
-        
-        try:
-            email_service.send_notification(result)
-        except Exception as email_error:
-            print(f"Failed to send email notification: {email_error}")
+        result = finalize_submission(submission, notify=True)
+        background_tasks.add_task(report_cache.prerender, result)
         
         gaps = []
         for cat_score in result.category_scores:
@@ -220,16 +255,48 @@ async def compute_assessment(submission: AssessmentSubmission):
             "gaps": gaps,
             "actions": actions
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error computing assessment: {str(e)}")
 
 
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip: listed, or covered by
+    "*", with a non-zero q-value. An explicit gzip entry overrides "*".
+    """
+    qualities = {}
+    for entry in accept_encoding.lower().split(","):
+        coding, _, params = entry.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip()] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+
 @app.get("/api/v1/assessments/{assessment_id}", response_model=AssessmentResult)
-async def get_assessment(assessment_id: str):
-    assessment = db.get_assessment(assessment_id)
-    if not assessment:
+async def get_assessment(request: Request, assessment_id: str):
+    stored = db.get_assessment_json(assessment_id)
+    if not stored:
         raise HTTPException(status_code=404, detail="Assessment not found")
-    return assessment
+    
+    body, encoding = stored
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding == "gzip":
+        if accepts_gzip(request.headers.get("accept-encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = gzip.decompress(body)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/v1/assessments", response_model=List[AssessmentResult])
@@ -250,11 +317,23 @@ async def get_lead(lead_id: str):
     return lead
 
 
+@app.get("/api/v1/changes", response_model=ChangePage)
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return get_change_page(since, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching changes: {str(e)}")
+
+
 @app.post("/api/v1/reports/generate")
 @limiter.limit("60/minute")
 async def generate_report(request: Request, assessment_id: str):
     try:
-        if not PDF_SERVICE_AVAILABLE:
+        if not pdf_render_pool.available:
             raise HTTPException(status_code=503, detail="PDF generation service is not available")
         
         captcha_token = request.headers.get("X-Captcha-Token")
@@ -270,7 +349,7 @@ async def generate_report(request: Request, assessment_id: str):
         if not assessment:
             raise HTTPException(status_code=404, detail="Assessment not found")
         
-        pdf_path = generate_pdf_report(assessment)
+        pdf_path = await report_cache.get_or_render(assessment)
         
         return FileResponse(
             path=pdf_path,
@@ -279,6 +358,10 @@ async def generate_report(request: Request, assessment_id: str):
         )
     except HTTPException:
         raise
+    except PDFPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except PDFRenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
@@ -296,70 +379,122 @@ async def get_audit_log(audit_log_id: str):
     return audit_log
 
 
-@app.get("/api/v1/admin/trials", response_model=List[TrialRecord])
-async def get_admin_trials(
+def get_trial_filters(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     states: Optional[str] = None,
     score_min: Optional[float] = None,
     score_max: Optional[float] = None,
     status: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100),
+) -> Optional[TrialFilters]:
+    q = q.strip() if q else None
+    if not any([start_date, end_date, states, score_min, score_max, status, q]):
+        return None
+    try:
+        return TrialFilters(
+            start_date=datetime.fromisoformat(start_date) if start_date else None,
+            end_date=datetime.fromisoformat(end_date) if end_date else None,
+            states=states.split(",") if states else None,
+            score_min=score_min,
+            score_max=score_max,
+            status=LeadStatus(status) if status else None,
+            search=q
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid trial filter: {str(e)}")
+
+
+@app.get("/api/v1/admin/trials", response_model=List[TrialRecord])
+async def get_admin_trials(
+    filters: Optional[TrialFilters] = Depends(get_trial_filters),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        filters = None
-        if any([start_date, end_date, states, score_min, score_max, status]):
-            filters = TrialFilters(
-                start_date=datetime.fromisoformat(start_date) if start_date else None,
-                end_date=datetime.fromisoformat(end_date) if end_date else None,
-                states=states.split(",") if states else None,
-                score_min=score_min,
-                score_max=score_max,
-                status=LeadStatus(status) if status else None
-            )
-        
-        trials = get_trials(filters)
+        trials = get_trials(filters, limit=limit, offset=offset)
         return trials
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching trials: {str(e)}")
 
 
+@app.get("/api/v1/admin/trials/facets", response_model=TrialFacets)
+async def get_admin_trial_facets(
+    filters: Optional[TrialFilters] = Depends(get_trial_filters),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return get_trial_facets(filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching trial facets: {str(e)}")
+
+
 @app.get("/api/v1/admin/trials/export")
 async def export_admin_trials(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    states: Optional[str] = None,
-    score_min: Optional[float] = None,
-    score_max: Optional[float] = None,
-    status: Optional[str] = None,
+    filters: Optional[TrialFilters] = Depends(get_trial_filters),
+    compress: Optional[str] = Query(None, pattern="^gzip$"),
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        filters = None
-        if any([start_date, end_date, states, score_min, score_max, status]):
-            filters = TrialFilters(
-                start_date=datetime.fromisoformat(start_date) if start_date else None,
-                end_date=datetime.fromisoformat(end_date) if end_date else None,
-                states=states.split(",") if states else None,
-                score_min=score_min,
-                score_max=score_max,
-                status=LeadStatus(status) if status else None
-            )
-        
-        trials = get_trials(filters)
-        csv_content = export_trials_csv(trials)
-        
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
+        filename = f"trials_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        body = stream_trials_csv(filters)
+        media_type = "text/csv"
+        if compress == "gzip":
+            body = gzip_chunks(body)
+            media_type = "application/gzip"
+            filename += ".gz"
+        
+        return StreamingResponse(
+            body,
+            media_type=media_type,
             headers={
-                "Content-Disposition": f"attachment; filename=trials_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                "Content-Disposition": f"attachment; filename={filename}"
             }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting trials: {str(e)}")
 
 
+@app.post("/api/v1/admin/trials/export/jobs", response_model=ExportJob, status_code=202)
+async def create_export_job(
+    filters: Optional[TrialFilters] = Depends(get_trial_filters),
+    format: ExportFormat = ExportFormat.CSV_GZIP,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return export_job_manager.create_job(filters, format)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating export job: {str(e)}")
+
+
+@app.get("/api/v1/admin/trials/export/jobs/{job_id}", response_model=ExportJob)
+async def get_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = export_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@app.get("/api/v1/admin/trials/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = export_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status == ExportJobStatus.EXPIRED:
+        raise HTTPException(status_code=410, detail="Export has expired")
+    if job.status != ExportJobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Export is {job.status.value}")
+    
+    return FileResponse(
+        path=export_job_manager.artifact_path(job),
+        media_type=EXPORT_MEDIA_TYPES[job.format],
+        filename=f"trials_export_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{job.format.value}"
+    )
+
+
 @app.post("/api/v1/admin/digest/trigger")
 async def trigger_digest(current_user: dict = Depends(get_current_user)):
     """
@@ -373,6 +508,84 @@ async def trigger_digest(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Error triggering digest: {str(e)}")
 
 
+@app.post("/api/v1/admin/outbox/requeue")
+async def requeue_outbox(
+    kind: Optional[OutboxKind] = None,
+    created_since: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Give failed emails a fresh retry window, e.g. after an SES outage.
+    """
+    try:
+        return {"requeued": outbox_dispatcher.requeue_failed(kind, created_since, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error requeueing emails: {str(e)}")
+
+
+@app.get("/api/v1/admin/email/stats")
+async def get_email_stats(current_user: dict = Depends(get_current_user)):
+    return email_service.stats()
+
+
+@app.get("/api/v1/admin/reports/stats")
+async def get_report_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "pdf_render_pool": pdf_render_pool.stats(),
+        "report_cache": report_cache.stats(),
+    }
+
+
+@app.get("/api/v1/admin/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "invalidation_channel": cache_registry.channel is not None,
+        "caches": cache_registry.stats(),
+    }
+
+
+@app.get("/api/v1/admin/statistics/funnel", response_model=FunnelSummary)
+async def get_statistics_funnel(current_user: dict = Depends(get_current_user)):
+    try:
+        return statistics_service.get_funnel()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
+
+
+@app.get("/api/v1/admin/statistics/answers", response_model=List[AnswerDistribution])
+async def get_answer_distributions(
+    question_id: Optional[str] = None,
+    segment: Optional[AnswerSegment] = None,
+    segment_value: Optional[str] = Query(None, max_length=100),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return statistics_service.get_answer_distributions(question_id, segment, segment_value)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Question not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid answer segment: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
+
+
+@app.get("/api/v1/admin/statistics/series", response_model=StatisticsSeries)
+async def get_statistics_series(
+    start: date,
+    end: date,
+    bucket: SeriesBucket = SeriesBucket.DAY,
+    group_by: Optional[SeriesGroupBy] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return statistics_service.get_series(start, end, bucket, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid statistics range: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
+
+
 class DeleteDataRequest(BaseModel):
     email: str
 
@@ -396,6 +609,7 @@ async def delete_my_data(request: Request, data: DeleteDataRequest):
             if assessment.email.lower() == email:
                 deleted_assessments.append(assessment.id)
                 db.delete_assessment(assessment.id)
+                report_cache.invalidate(assessment.id)
         
         for audit_log in db.get_all_audit_logs():
             if audit_log.email.lower() == email:
@@ -413,3 +627,17 @@ async def delete_my_data(request: Request, data: DeleteDataRequest):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting data: {str(e)}")
+
+
+@app.get("/api/v1/admin/statistics/distribution", response_model=ScoreDistribution)
+async def get_statistics_distribution(
+    start: date,
+    end: date,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return statistics_service.get_distribution(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid statistics range: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching statistics: {str(e)}")
@@ -0,0 +1,169 @@
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+
+from app.rollups import rebuild_daily_rollups
+from app.sketches import rebuild_score_sketches
+from app.funnel import rebuild_funnel_counters
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so that only one worker applies
+# migrations while the others wait for it to finish.
+MIGRATION_LOCK_KEY = 7318420
+
+Step = Union[str, Callable]
+
+
+def _backfill_assessment_scores(conn) -> None:
+    rows = conn.execute(text(
+        "SELECT id, data, result_json, result_encoding FROM assessments WHERE overall_percentage IS NULL"
+    ).execution_options(yield_per=500))
+    for row in rows:
+        if row.result_json is not None:
+            body = bytes(row.result_json)
+            if row.result_encoding == "gzip":
+                body = gzip.decompress(body)
+            result = json.loads(body)
+        else:
+            result = row.data
+        conn.execute(
+            text("UPDATE assessments SET overall_percentage = :pct, overall_risk_level = CAST(:risk AS risk_level) WHERE id = :id"),
+            {"id": row.id, "pct": result["overall_percentage"], "risk": result["overall_risk_level"]},
+        )
+
+
+# Ordered, append-only list of (migration id, steps). A step is either a SQL
+# statement or a callable taking the SQLAlchemy connection. Every step must
+# be safe to run against a database freshly created by `create_all`, which
+# already has the final schema.
+MIGRATIONS: List[Tuple[str, List[Step]]] = [
+    ("0001_assessment_result_json", [
+        "ALTER TABLE assessments ADD COLUMN IF NOT EXISTS result_json BYTEA",
+        "ALTER TABLE assessments ADD COLUMN IF NOT EXISTS result_encoding VARCHAR",
+        "ALTER TABLE assessments ALTER COLUMN data DROP NOT NULL",
+    ]),
+    ("0002_native_types", [
+        # Enum types. Older code stored str(Enum), e.g. "LeadStatus.STARTED",
+        # so strip the class prefix and lowercase before casting.
+        """DO $$ BEGIN
+            CREATE TYPE lead_status AS ENUM ('started', 'in_progress', 'completed');
+        EXCEPTION WHEN duplicate_object THEN NULL; END $$""",
+        """DO $$ BEGIN
+            CREATE TYPE risk_level AS ENUM ('healthy', 'moderate', 'high_risk');
+        EXCEPTION WHEN duplicate_object THEN NULL; END $$""",
+        """DO $$ BEGIN
+            CREATE TYPE email_status AS ENUM ('success', 'failed', 'pending');
+        EXCEPTION WHEN duplicate_object THEN NULL; END $$""",
+
+        # Primary keys already have a unique index; the extra ix_*_id
+        # indexes created by index=True only duplicated them.
+        "DROP INDEX IF EXISTS ix_assessments_id",
+        "DROP INDEX IF EXISTS ix_leads_id",
+        "DROP INDEX IF EXISTS ix_audit_logs_id",
+
+        "ALTER TABLE assessments ALTER COLUMN id TYPE uuid USING id::text::uuid",
+
+        "ALTER TABLE leads ALTER COLUMN id TYPE uuid USING id::text::uuid",
+        "ALTER TABLE leads ALTER COLUMN consent DROP DEFAULT",
+        "ALTER TABLE leads ALTER COLUMN consent TYPE boolean USING lower(consent::text) IN ('true', 't')",
+        "ALTER TABLE leads ALTER COLUMN status DROP DEFAULT",
+        """ALTER TABLE leads ALTER COLUMN status TYPE lead_status
+            USING lower(regexp_replace(status::text, '^LeadStatus\\.', ''))::lead_status""",
+        """ALTER TABLE leads ALTER COLUMN overall_risk_level TYPE risk_level
+            USING lower(regexp_replace(overall_risk_level::text, '^RiskLevel\\.', ''))::risk_level""",
+        "ALTER TABLE leads ALTER COLUMN overall_score TYPE smallint",
+
+        "ALTER TABLE audit_logs ALTER COLUMN id TYPE uuid USING id::text::uuid",
+        "ALTER TABLE audit_logs ALTER COLUMN assessment_id TYPE uuid USING assessment_id::text::uuid",
+        """ALTER TABLE audit_logs ALTER COLUMN email_status TYPE email_status
+            USING lower(regexp_replace(email_status::text, '^EmailStatus\\.', ''))::email_status""",
+        "ALTER TABLE audit_logs ALTER COLUMN score TYPE smallint",
+        "ALTER TABLE audit_logs ALTER COLUMN attempts TYPE smallint",
+    ]),
+    ("0003_trial_filter_indexes", [
+        "ALTER TABLE leads ALTER COLUMN operating_states TYPE jsonb USING operating_states::jsonb",
+        "UPDATE leads SET operating_states = NULL WHERE operating_states = 'null'::jsonb",
+        "CREATE INDEX IF NOT EXISTS ix_leads_submission_date ON leads (submission_date)",
+        "CREATE INDEX IF NOT EXISTS ix_leads_status_submission_date ON leads (status, submission_date)",
+        "CREATE INDEX IF NOT EXISTS ix_leads_overall_score ON leads (overall_score)",
+        "CREATE INDEX IF NOT EXISTS ix_leads_operating_states ON leads USING gin (operating_states)",
+    ]),
+    ("0004_trial_search", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_leads_company_name_trgm ON leads USING gin (company_name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_leads_email_trgm ON leads USING gin (email gin_trgm_ops)",
+    ]),
+    ("0005_daily_rollups", [
+        "ALTER TABLE assessments ADD COLUMN IF NOT EXISTS overall_percentage double precision",
+        "ALTER TABLE assessments ADD COLUMN IF NOT EXISTS overall_risk_level risk_level",
+        _backfill_assessment_scores,
+        rebuild_daily_rollups,
+    ]),
+    ("0006_assessment_date_index", [
+        "CREATE INDEX IF NOT EXISTS ix_assessments_submission_date ON assessments (submission_date) INCLUDE (overall_percentage)",
+    ]),
+    ("0007_score_sketches", [
+        rebuild_score_sketches,
+    ]),
+    ("0008_funnel_counters", [
+        rebuild_funnel_counters,
+    ]),
+    ("0009_outbox_expiry", [
+        "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP",
+    ]),
+    ("0010_notification_batches", [
+        "ALTER TYPE outbox_kind ADD VALUE IF NOT EXISTS 'notification_batch'",
+        "ALTER TYPE outbox_status ADD VALUE IF NOT EXISTS 'buffered'",
+        "ALTER TYPE outbox_status ADD VALUE IF NOT EXISTS 'batched'",
+        "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS batch_id UUID",
+        "ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS batch_id UUID",
+        "CREATE INDEX IF NOT EXISTS ix_audit_logs_batch_id ON audit_logs (batch_id)",
+    ]),
+    ("0011_completed_submission_leads", [
+        # Leads created by a direct submission used to keep the default
+        # 'started' status; they share their assessment's id.
+        """UPDATE leads SET status = 'completed'
+            WHERE status = 'started' AND EXISTS (SELECT 1 FROM assessments a WHERE a.id = leads.id)""",
+        rebuild_funnel_counters,
+    ]),
+    ("0012_rollup_scores_by_state", [
+        # Scores now roll up under their lead's states and industry
+        rebuild_daily_rollups,
+    ]),
+]
+
+
+def run_migrations(engine) -> None:
+    """
+    Apply pending migrations. Migrations are written for Postgres; other
+    dialects only get what `create_all` creates.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "id VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT id FROM schema_migrations"))}
+
+        for migration_id, steps in MIGRATIONS:
+            if migration_id in applied:
+                continue
+            logger.info(f"Applying migration {migration_id}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (id, applied_at) VALUES (:id, :applied_at)"),
+                {"id": migration_id, "applied_at": datetime.now()},
+            )
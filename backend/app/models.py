@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 from enum import Enum
 from .email_validator import validate_business_email
@@ -56,6 +56,18 @@ class GovernmentSource(BaseModel):
     description: Optional[str] = None
 
 
+class ComplianceReference(BaseModel):
+    title: str
+    description: str
+    source: Optional[GovernmentSource] = None
+
+
+class StateComplianceReferences(BaseModel):
+    code: str
+    name: str
+    references: List[ComplianceReference]
+
+
 class ConditionalRule(BaseModel):
     depends_on_question: str
     depends_on_answer: str
@@ -102,6 +114,8 @@ class AssessmentSubmission(BaseModel):
     company_size: str
     industry: Optional[str] = None
     answers: List[Answer]
+    # Lead returned by /assessments/start, when the session began there
+    lead_id: Optional[str] = None
     
     @field_validator('email')
     @classmethod
@@ -192,3 +206,69 @@ class AuditLog(BaseModel):
     attempts: int
     error_message: Optional[str] = None
     timestamp: datetime
+    # Outbox message of the coalesced summary email this notification went out in
+    batch_id: Optional[str] = None
+
+
+class OutboxKind(str, Enum):
+    NOTIFICATION = "notification"
+    NOTIFICATION_BATCH = "notification_batch"
+    DIGEST = "digest"
+
+
+class OutboxStatus(str, Enum):
+    # Notification waiting to be coalesced into a batch
+    BUFFERED = "buffered"
+    # Notification folded into the batch message named by batch_id
+    BATCHED = "batched"
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxMessage(BaseModel):
+    id: str
+    kind: OutboxKind
+    audit_log_id: Optional[str] = None
+    recipient: str
+    subject: str
+    body: str
+    html: bool = False
+    status: OutboxStatus = OutboxStatus.PENDING
+    attempts: int = 0
+    last_error: Optional[str] = None
+    created_at: datetime
+    next_attempt_at: datetime
+    # Retries stop after this; None means created_at plus the outbox max age
+    expires_at: Optional[datetime] = None
+    # Lease held by the dispatcher that claimed the message
+    locked_until: Optional[datetime] = None
+    sent_at: Optional[datetime] = None
+    batch_id: Optional[str] = None
+
+
+class ChangeEntity(str, Enum):
+    LEAD = "lead"
+    ASSESSMENT = "assessment"
+    AUDIT_LOG = "audit_log"
+
+
+class ChangeOp(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class ChangeRecord(BaseModel):
+    seq: int
+    entity: ChangeEntity
+    entity_id: str
+    op: ChangeOp
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None
+
+
+class ChangePage(BaseModel):
+    changes: List[ChangeRecord]
+    next_cursor: int
+    has_more: bool
@@ -0,0 +1,159 @@
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from app.database import db
+from app.email_service import email_service
+from app.models import OutboxKind, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+# A claimed message is handed to another dispatcher if no result is
+# recorded within the lease, so it must exceed the slowest send.
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+# Failed sends are retried with exponential backoff and jitter, starting
+# at the base delay and capped at the max, until the message is older than
+# the max age (or that long after an admin requeue).
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_MAX_AGE_SECONDS = float(os.getenv("OUTBOX_MAX_AGE_SECONDS", "86400"))
+
+
+class OutboxDispatcher:
+    """
+    Delivers queued emails from the outbox in a background thread, at most
+    `concurrency` sends at a time.
+
+    Every worker may run a dispatcher: messages are leased when claimed,
+    so each is sent by one worker, and a lease left by a crashed worker
+    expires and is retried. Delivery is at least once.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+        lease_seconds: float = OUTBOX_LEASE_SECONDS,
+        retry_base_seconds: float = OUTBOX_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = OUTBOX_RETRY_MAX_SECONDS,
+        max_age_seconds: float = OUTBOX_MAX_AGE_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.max_age_seconds = max_age_seconds
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def retry_at(self, message: OutboxMessage) -> Optional[datetime]:
+        """
+        When to try a failed message again, or None to give up. The delay
+        doubles per attempt and is drawn from its upper half, so messages
+        that failed together during an outage do not retry in lockstep.
+        """
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (message.attempts - 1))
+        retry_at = datetime.now() + timedelta(seconds=random.uniform(delay / 2, delay))
+        expires_at = message.expires_at or message.created_at + timedelta(seconds=self.max_age_seconds)
+        if retry_at > expires_at:
+            return None
+        return retry_at
+
+    def _deliver(self, message: OutboxMessage) -> None:
+        try:
+            success, error = email_service.deliver(message)
+        except Exception as e:
+            success, error = False, f"Unexpected error: {str(e)}"
+        if success:
+            db.finish_outbox(message.id)
+            return
+        retry_at = self.retry_at(message)
+        db.finish_outbox(message.id, error=error or "Unknown error", retry_at=retry_at)
+        if retry_at is None:
+            logger.error(f"Giving up on {message.kind.value} email {message.id} after {message.attempts} attempts: {error}")
+        else:
+            logger.warning(f"Retrying {message.kind.value} email {message.id} at {retry_at.isoformat()}: {error}")
+
+    def coalesce(self) -> int:
+        """
+        Turn ready buffered notifications into batch messages. Returns how
+        many batches were created.
+        """
+        batches = 0
+        # Runs even with coalescing switched off, to flush what is left.
+        while db.coalesce_outbox(email_service.coalesce_seconds, email_service.coalesce_max, email_service.build_notification_batch):
+            batches += 1
+        return batches
+
+    def dispatch_once(self) -> int:
+        """
+        Claim and deliver one batch of due messages. Returns how many were
+        claimed. While the email circuit breaker is open nothing is
+        claimed, so messages wait in the outbox without using up attempts;
+        when it is half open a single message is claimed as the probe.
+        """
+        self.coalesce()
+        limit = email_service.breaker.capacity(self.concurrency)
+        if limit == 0:
+            return 0
+        messages = db.claim_outbox(limit, self.lease_seconds)
+        list(self.executor.map(self._deliver, messages))
+        return len(messages)
+
+    def requeue_failed(self, kind: Optional[OutboxKind] = None, created_since: Optional[datetime] = None, limit: int = 500) -> int:
+        """
+        Make failed messages due now with a fresh max age. Requeued
+        messages go through the normal dispatch, so delivery stays within
+        the concurrency limit.
+        """
+        now = datetime.now()
+        requeued = db.requeue_outbox(kind, created_since, limit, expires_at=now + timedelta(seconds=self.max_age_seconds))
+        if requeued:
+            self.wake()
+        return requeued
+
+    def wake(self) -> None:
+        """
+        Check the outbox now instead of at the next poll.
+        """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}", exc_info=True)
+                claimed = 0
+            # A full batch means more may be due; otherwise sleep.
+            if claimed < self.concurrency:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Outbox dispatcher started with {self.concurrency} concurrent sends")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
+            self._thread = None
+        self.executor.shutdown(wait=True)
+        logger.info("Outbox dispatcher shut down")
+
+
+outbox_dispatcher = OutboxDispatcher()
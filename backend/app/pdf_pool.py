@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+from app.models import AssessmentResult
+from app.pdf_service import WEASYPRINT_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+PDF_POOL_PROCESSES = int(os.getenv("PDF_POOL_PROCESSES", "2"))
+# Jobs allowed to wait for a free process before new ones are turned away
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "8"))
+# Covers queueing and rendering; a render still running at the deadline
+# has its process pool killed and replaced
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "60"))
+# Render processes are replaced after this many jobs to bound memory growth
+PDF_MAX_TASKS_PER_PROCESS = int(os.getenv("PDF_MAX_TASKS_PER_PROCESS", "100"))
+
+
+class PDFPoolBusy(Exception):
+    pass
+
+
+class PDFRenderTimeout(Exception):
+    pass
+
+
+def render_report(assessment_json: str, output_path: Optional[str], operating_states: Optional[List[str]] = None) -> str:
+    """
+    Runs in a pool process: the only place WeasyPrint gets imported.
+    """
+    from app.pdf_service import generate_pdf_report
+    return generate_pdf_report(AssessmentResult.model_validate_json(assessment_json), output_path, operating_states)
+
+
+class PDFRenderPool:
+    """
+    Renders PDF reports in a pool of spawned processes, so WeasyPrint's
+    layout work never runs on a web worker's event loop.
+
+    At most `processes` renders run at once and up to `queue_size` more
+    wait; beyond that `render` raises PDFPoolBusy. The pool starts on the
+    first render.
+    """
+
+    def __init__(
+        self,
+        processes: int = PDF_POOL_PROCESSES,
+        queue_size: int = PDF_QUEUE_SIZE,
+        timeout_seconds: float = PDF_RENDER_TIMEOUT_SECONDS,
+        max_tasks_per_process: int = PDF_MAX_TASKS_PER_PROCESS,
+        render_fn: Callable[[str, Optional[str], Optional[List[str]]], str] = render_report,
+    ):
+        self.processes = processes
+        self.queue_size = queue_size
+        self.timeout_seconds = timeout_seconds
+        self.max_tasks_per_process = max_tasks_per_process
+        self.render_fn = render_fn
+        self.available = WEASYPRINT_AVAILABLE
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_process,
+            )
+        return self._executor
+
+    def _kill(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Replace a pool whose process is stuck in a render. Other renders
+        running in it fail and are reported to their callers.
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        # ProcessPoolExecutor has no way to stop a single running task.
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def render(
+        self, assessment: AssessmentResult, output_path: Optional[str] = None, operating_states: Optional[List[str]] = None
+    ) -> str:
+        """
+        Render the report for an assessment and return the PDF path.
+        Cancelling the caller drops a queued job; a job that is already
+        rendering runs to completion.
+        """
+        with self._lock:
+            if self._jobs >= self.processes + self.queue_size:
+                self.rejected += 1
+                raise PDFPoolBusy("Too many PDF reports are being generated")
+            self._jobs += 1
+            executor = self._get_executor()
+        try:
+            future = executor.submit(self.render_fn, assessment.model_dump_json(), output_path, operating_states)
+            try:
+                path = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                if future.running():
+                    logger.error(f"PDF render for {assessment.id} exceeded {self.timeout_seconds}s, restarting the render pool")
+                    self._kill(executor)
+                raise PDFRenderTimeout(f"PDF generation took longer than {self.timeout_seconds:.0f} seconds")
+            except asyncio.CancelledError:
+                future.cancel()
+                self._count("cancelled")
+                raise
+            except Exception:
+                self._count("failed")
+                raise
+            self._count("completed")
+            return path
+        finally:
+            with self._lock:
+                self._jobs -= 1
+
+    def idle(self) -> bool:
+        """
+        Whether a process is free, so optional work can run without making
+        a requested render wait.
+        """
+        with self._lock:
+            return self._jobs < self.processes
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "available": self.available,
+                "processes": self.processes,
+                "queue_size": self.queue_size,
+                "started": self._executor is not None,
+                "jobs": self._jobs,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("PDF render pool shut down")
+
+
+pdf_render_pool = PDFRenderPool()
@@ -1,17 +1,50 @@
-try:
-    from weasyprint import HTML, CSS
-    WEASYPRINT_AVAILABLE = True
-except Exception as e:
-    print(f"Warning: WeasyPrint not available: {e}")
-    WEASYPRINT_AVAILABLE = False
-    HTML = None
-    CSS = None
-
-from typing import Optional
+import functools
+import hashlib
+import importlib.util
+from typing import List, Optional
 import os
 import base64
-from datetime import datetime
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined, Template, select_autoescape
+from markupsafe import Markup
+from app import state_compliance
+from app.email_templates import JINJA_BYTECODE_CACHE_DIR, TEMPLATES_DIR
 from app.models import AssessmentResult, RiskLevel, ComplianceCategory
+from app.state_compliance import CENTRAL_COMPLIANCE, get_state_compliance
+
+# WeasyPrint is imported only where a PDF is written, which is inside the
+# PDF render pool processes; web workers never load it.
+WEASYPRINT_AVAILABLE = importlib.util.find_spec("weasyprint") is not None
+if not WEASYPRINT_AVAILABLE:
+    print("Warning: WeasyPrint not available")
+
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "static", "offrd-logo.png")
+REPORT_TEMPLATE = "report.html"
+REPORT_STYLESHEET = os.path.join(TEMPLATES_DIR, "report.css")
+
+# Everything a rendered report is built from: its template, stylesheet and
+# logo, the reference data, and the code filling them in. Cached PDFs are
+# keyed by this hash, so changing any of it stops serving old renders.
+REPORT_SOURCES = (
+    os.path.join(TEMPLATES_DIR, REPORT_TEMPLATE),
+    REPORT_STYLESHEET,
+    LOGO_PATH,
+    state_compliance.__file__,
+    __file__,
+)
+
+
+def _report_template_version() -> str:
+    digest = hashlib.sha256()
+    for path in REPORT_SOURCES:
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b"missing")
+    return digest.hexdigest()[:16]
+
+
+REPORT_TEMPLATE_VERSION = _report_template_version()
 
 
 CATEGORY_DISPLAY_NAMES = {
@@ -38,537 +71,67 @@ RISK_LEVEL_DISPLAY = {
 }
 
 
-STATE_ANNEXURE = """
-<div class="annexure-section">
-    <h2>State-Specific Compliance References</h2>
-    
-    <h3>All States - Central Government Compliance</h3>
-    <ul>
-        <li><strong>Employees' Provident Fund (EPF)</strong>: Applicable to establishments with 20+ employees. 
-            <a href="https://www.epfindia.gov.in/">EPFO Official Website</a></li>
-        <li><strong>Employees' State Insurance (ESI)</strong>: Applicable to establishments with 10+ employees earning up to ₹21,000/month. 
-            <a href="https://www.esic.gov.in/">ESIC Official Website</a></li>
-        <li><strong>Income Tax (TDS)</strong>: Mandatory for all employers. 
-            <a href="https://www.incometax.gov.in/">Income Tax Department</a></li>
-        <li><strong>Goods and Services Tax (GST)</strong>: Registration required if turnover exceeds ₹40 lakhs (₹20 lakhs for special category states). 
-            <a href="https://www.gst.gov.in/">GST Portal</a></li>
-        <li><strong>Prevention of Sexual Harassment (POSH)</strong>: Mandatory for all organizations with 10+ employees. 
-            <a href="https://wcd.gov.in/">Ministry of Women and Child Development</a></li>
-    </ul>
-    
-    <h3>State-Specific Compliance</h3>
-    
-    <h4>Karnataka</h4>
-    <ul>
-        <li><strong>Karnataka Shops and Commercial Establishments Act</strong>: Registration required within 30 days of commencement. 
-            <a href="https://labour.karnataka.gov.in/">Karnataka Labour Department</a></li>
-        <li><strong>Professional Tax</strong>: Applicable to all employees and employers. Maximum ₹2,500/year. 
-            <a href="https://karnatakaone.gov.in/">Karnataka One Portal</a></li>
-    </ul>
-    
-    <h4>Maharashtra</h4>
-    <ul>
-        <li><strong>Maharashtra Shops and Establishments Act</strong>: Registration required within 30 days. 
-            <a href="https://mahakamgar.maharashtra.gov.in/">Maharashtra Labour Department</a></li>
-        <li><strong>Professional Tax</strong>: Applicable to all employees and employers. Maximum ₹2,500/year. 
-            <a href="https://mahavat.gov.in/">MahaVAT Portal</a></li>
-    </ul>
-    
-    <h4>Tamil Nadu</h4>
-    <ul>
-        <li><strong>Tamil Nadu Shops and Establishments Act</strong>: Registration required within 30 days. 
-            <a href="https://www.tn.gov.in/labour">Tamil Nadu Labour Department</a></li>
-        <li><strong>Professional Tax</strong>: Applicable to all employees and employers. Maximum ₹2,500/year. 
-            <a href="https://www.tnprofessionaltax.com/">TN Professional Tax</a></li>
-    </ul>
-    
-    <h4>Delhi</h4>
-    <ul>
-        <li><strong>Delhi Shops and Establishments Act</strong>: Registration required within 30 days. 
-            <a href="https://labour.delhi.gov.in/">Delhi Labour Department</a></li>
-        <li><strong>No Professional Tax</strong>: Delhi does not levy professional tax.</li>
-    </ul>
-    
-    <h4>Gujarat</h4>
-    <ul>
-        <li><strong>Gujarat Shops and Establishments Act</strong>: Registration required within 30 days. 
-            <a href="https://labour.gujarat.gov.in/">Gujarat Labour Department</a></li>
-        <li><strong>Professional Tax</strong>: Applicable to all employees and employers. Maximum ₹2,500/year. 
-            <a href="https://www.ptax.gujarat.gov.in/">Gujarat Professional Tax</a></li>
-    </ul>
-    
-    <h4>West Bengal</h4>
-    <ul>
-        <li><strong>West Bengal Shops and Establishments Act</strong>: Registration required within 60 days. 
-            <a href="https://wblabour.gov.in/">West Bengal Labour Department</a></li>
-        <li><strong>Professional Tax</strong>: Applicable to all employees and employers. Maximum ₹2,500/year. 
-            <a href="https://wbcomtax.gov.in/">WB Commercial Tax</a></li>
-    </ul>
-</div>
-"""
-
-
-DISCLAIMER = """
-<div class="disclaimer-section">
-    <h2>Important Disclaimer</h2>
-    <p><strong>This compliance health check report is provided for informational purposes only and does not constitute legal advice.</strong></p>
-    
-    <p>The assessment and recommendations contained in this report are based on the information you provided and general compliance requirements 
-    applicable to startups in India. Compliance requirements may vary based on:</p>
-    <ul>
-        <li>Your specific business structure and operations</li>
-        <li>The states in which you operate</li>
-        <li>Your industry sector</li>
-        <li>The number and classification of your employees</li>
-        <li>Your annual turnover and revenue</li>
-        <li>Recent changes in legislation</li>
-    </ul>
-    
-    <p><strong>We strongly recommend that you:</strong></p>
-    <ul>
-        <li>Consult with qualified legal and compliance professionals to understand your specific obligations</li>
-        <li>Verify all compliance requirements with the relevant government authorities</li>
-        <li>Conduct regular compliance audits to ensure ongoing adherence to all applicable laws</li>
-        <li>Stay updated on changes to labor laws, tax regulations, and other compliance requirements</li>
-    </ul>
-    
-    <p>This report is generated as of <strong>{report_date}</strong> and may not reflect recent legislative changes or updates to compliance requirements.</p>
-    
-    <p><strong>Limitation of Liability:</strong> The creators and providers of this compliance health check tool shall not be held liable for any 
-    actions taken or not taken based on the information provided in this report. Users are solely responsible for ensuring their compliance with 
-    all applicable laws and regulations.</p>
-    
-    <p>For personalized compliance guidance and support, please contact our team of experts.</p>
-</div>
-"""
-
-
+@functools.lru_cache(maxsize=None)
 def get_logo_base64() -> str:
-    """Get the offrd logo as base64 encoded string."""
-    logo_path = os.path.join(os.path.dirname(__file__), "static", "offrd-logo.png")
+    """
+    Get the offrd logo as a base64 data URI, read once per process. It is
+    marked safe so the template does not escape it on every render.
+    """
     try:
-        with open(logo_path, "rb") as f:
+        with open(LOGO_PATH, "rb") as f:
             logo_data = base64.b64encode(f.read()).decode()
-            return f"data:image/png;base64,{logo_data}"
+            return Markup(f"data:image/png;base64,{logo_data}")
     except Exception as e:
         print(f"Warning: Could not load logo: {e}")
         return ""
 
 
-def generate_html_report(result: AssessmentResult) -> str:
-    risk_color = RISK_LEVEL_COLORS.get(result.overall_risk_level, "#6b7280")
-    risk_display = RISK_LEVEL_DISPLAY.get(result.overall_risk_level, result.overall_risk_level.value)
-    logo_base64 = get_logo_base64()
-    
-    category_rows = ""
-    for cat_score in result.category_scores:
-        cat_name = CATEGORY_DISPLAY_NAMES.get(cat_score.category, cat_score.category.value)
-        cat_risk_color = RISK_LEVEL_COLORS.get(cat_score.risk_level, "#6b7280")
-        cat_risk_display = RISK_LEVEL_DISPLAY.get(cat_score.risk_level, cat_score.risk_level.value)
-        
-        issues_html = ""
-        if cat_score.issues:
-            issues_html = "<ul class='issues-list'>"
-            for issue in cat_score.issues:
-                issues_html += f"<li>{issue}</li>"
-            issues_html += "</ul>"
-        else:
-            issues_html = "<p class='no-issues'>No significant issues identified</p>"
-        
-        recommendations_html = ""
-        if cat_score.recommendations:
-            recommendations_html = "<ul class='recommendations-list'>"
-            for rec in cat_score.recommendations:
-                recommendations_html += f"<li>{rec}</li>"
-            recommendations_html += "</ul>"
-        
-        category_rows += f"""
-        <div class="category-section">
-            <div class="category-header">
-                <h3>{cat_name}</h3>
-                <div class="category-score">
-                    <span class="score-value">{cat_score.percentage:.1f}%</span>
-                    <span class="risk-badge" style="background-color: {cat_risk_color};">{cat_risk_display}</span>
-                </div>
-            </div>
-            <div class="category-details">
-                <div class="score-breakdown">
-                    <span>Score: {cat_score.score} / {cat_score.max_score}</span>
-                </div>
-                {f'<div class="issues"><h4>Issues Identified:</h4>{issues_html}</div>' if cat_score.issues else ''}
-                {f'<div class="recommendations"><h4>Recommendations:</h4>{recommendations_html}</div>' if cat_score.recommendations else ''}
-            </div>
-        </div>
-        """
-    
-    priority_actions_html = ""
-    has_priority_actions = result.priority_actions and len(result.priority_actions) > 0
-    if has_priority_actions:
-        priority_actions_html = "<ol class='priority-actions-list'>"
-        for action in result.priority_actions:
-            priority_actions_html += f"<li>{action}</li>"
-        priority_actions_html += "</ol>"
-    else:
-        priority_actions_html = "<p class='no-priority-actions'>No priority actions required - your compliance is in good shape!</p>"
-    
-    disclaimer_with_date = DISCLAIMER.format(report_date=datetime.now().strftime("%B %d, %Y"))
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Compliance Health Check Report - {result.company_name}</title>
-        <style>
-            @page {{
-                size: A4;
-                margin: 2cm;
-            }}
-            
-            body {{
-                font-family: 'Helvetica', 'Arial', sans-serif;
-                line-height: 1.6;
-                color: #1f2937;
-                font-size: 11pt;
-            }}
-            
-            .header {{
-                text-align: center;
-                margin-bottom: 30px;
-                padding-bottom: 20px;
-                border-bottom: 3px solid #3b82f6;
-            }}
-            
-            .header .logo {{
-                max-width: 200px;
-                height: auto;
-                margin-bottom: 15px;
-            }}
-            
-            .header h1 {{
-                color: #1e40af;
-                margin: 0;
-                font-size: 24pt;
-            }}
-            
-            .header .subtitle {{
-                color: #6b7280;
-                font-size: 12pt;
-                margin-top: 5px;
-            }}
-            
-            .company-info {{
-                background-color: #f3f4f6;
-                padding: 15px;
-                border-radius: 8px;
-                margin-bottom: 30px;
-            }}
-            
-            .company-info h2 {{
-                margin-top: 0;
-                color: #1e40af;
-                font-size: 14pt;
-            }}
-            
-            .info-grid {{
-                display: grid;
-                grid-template-columns: 1fr 1fr;
-                gap: 10px;
-            }}
-            
-            .info-item {{
-                margin: 5px 0;
-            }}
-            
-            .info-label {{
-                font-weight: bold;
-                color: #4b5563;
-            }}
-            
-            .overall-score {{
-                background: linear-gradient(135deg, #3b82f6 0%, #1e40af 100%);
-                color: white;
-                padding: 25px;
-                border-radius: 8px;
-                text-align: center;
-                margin-bottom: 30px;
-            }}
-            
-            .overall-score h2 {{
-                margin: 0 0 15px 0;
-                font-size: 16pt;
-            }}
-            
-            .score-display {{
-                font-size: 48pt;
-                font-weight: bold;
-                margin: 10px 0;
-            }}
-            
-            .risk-badge {{
-                display: inline-block;
-                padding: 8px 16px;
-                border-radius: 20px;
-                color: white;
-                font-weight: bold;
-                font-size: 12pt;
-                margin-top: 10px;
-            }}
-            
-            .category-section {{
-                margin-bottom: 25px;
-                border: 1px solid #e5e7eb;
-                border-radius: 8px;
-                overflow: hidden;
-                page-break-inside: avoid;
-            }}
-            
-            .category-header {{
-                background-color: #f9fafb;
-                padding: 15px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                border-bottom: 1px solid #e5e7eb;
-            }}
-            
-            .category-header h3 {{
-                margin: 0;
-                color: #1f2937;
-                font-size: 13pt;
-            }}
-            
-            .category-score {{
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }}
-            
-            .score-value {{
-                font-size: 18pt;
-                font-weight: bold;
-                color: #1f2937;
-            }}
-            
-            .category-details {{
-                padding: 15px;
-            }}
-            
-            .score-breakdown {{
-                color: #6b7280;
-                font-size: 10pt;
-                margin-bottom: 10px;
-            }}
-            
-            .issues, .recommendations {{
-                margin-top: 15px;
-            }}
-            
-            .issues h4, .recommendations h4 {{
-                color: #1e40af;
-                margin: 0 0 10px 0;
-                font-size: 11pt;
-            }}
-            
-            .issues-list, .recommendations-list {{
-                margin: 0;
-                padding-left: 20px;
-            }}
-            
-            .issues-list li {{
-                color: #dc2626;
-                margin-bottom: 5px;
-            }}
-            
-            .recommendations-list li {{
-                color: #059669;
-                margin-bottom: 5px;
-            }}
-            
-            .no-issues {{
-                color: #10b981;
-                font-style: italic;
-                margin: 0;
-            }}
-            
-            .priority-actions {{
-                padding: 20px;
-                margin: 30px 0;
-                page-break-inside: avoid;
-            }}
-            
-            .priority-actions.has-actions {{
-                background-color: #fef3c7;
-                border-left: 4px solid #f59e0b;
-            }}
-            
-            .priority-actions.no-actions {{
-                background-color: #d1fae5;
-                border-left: 4px solid #10b981;
-            }}
-            
-            .priority-actions h2 {{
-                margin-top: 0;
-                font-size: 14pt;
-            }}
-            
-            .priority-actions.has-actions h2 {{
-                color: #92400e;
-            }}
-            
-            .priority-actions.no-actions h2 {{
-                color: #065f46;
-            }}
-            
-            .priority-actions-list {{
-                margin: 10px 0;
-                padding-left: 25px;
-            }}
-            
-            .priority-actions-list li {{
-                margin-bottom: 10px;
-                color: #78350f;
-            }}
-            
-            .no-priority-actions {{
-                color: #065f46;
-                font-weight: bold;
-                margin: 10px 0;
-                font-size: 12pt;
-            }}
-            
-            .annexure-section {{
-                margin-top: 40px;
-                page-break-before: always;
-            }}
-            
-            .annexure-section h2 {{
-                color: #1e40af;
-                border-bottom: 2px solid #3b82f6;
-                padding-bottom: 10px;
-                font-size: 16pt;
-            }}
-            
-            .annexure-section h3 {{
-                color: #1f2937;
-                margin-top: 25px;
-                font-size: 13pt;
-            }}
-            
-            .annexure-section h4 {{
-                color: #4b5563;
-                margin-top: 20px;
-                font-size: 12pt;
-            }}
-            
-            .annexure-section ul {{
-                line-height: 1.8;
-            }}
-            
-            .annexure-section li {{
-                margin-bottom: 10px;
-            }}
-            
-            .annexure-section a {{
-                color: #2563eb;
-                text-decoration: none;
-            }}
-            
-            .disclaimer-section {{
-                margin-top: 40px;
-                padding: 20px;
-                background-color: #fef2f2;
-                border: 2px solid #ef4444;
-                border-radius: 8px;
-                page-break-before: always;
-            }}
-            
-            .disclaimer-section h2 {{
-                color: #991b1b;
-                margin-top: 0;
-                font-size: 14pt;
-            }}
-            
-            .disclaimer-section p {{
-                margin: 10px 0;
-                color: #7f1d1d;
-            }}
-            
-            .disclaimer-section ul {{
-                color: #7f1d1d;
-                line-height: 1.8;
-            }}
-            
-            .disclaimer-section strong {{
-                color: #991b1b;
-            }}
-            
-            .footer {{
-                margin-top: 30px;
-                text-align: center;
-                color: #6b7280;
-                font-size: 9pt;
-                padding-top: 20px;
-                border-top: 1px solid #e5e7eb;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            {f'<img src="{logo_base64}" class="logo" alt="offrd Logo" />' if logo_base64 else ''}
-            <h1>Compliance Health Check Report</h1>
-            <div class="subtitle">Indian Startup HR & Labour Compliance Assessment</div>
-        </div>
-        
-        <div class="company-info">
-            <h2>Company Information</h2>
-            <div class="info-grid">
-                <div class="info-item">
-                    <span class="info-label">Company Name:</span> {result.company_name}
-                </div>
-                <div class="info-item">
-                    <span class="info-label">Contact Person:</span> {result.contact_name}
-                </div>
-                <div class="info-item">
-                    <span class="info-label">Email:</span> {result.email}
-                </div>
-                <div class="info-item">
-                    <span class="info-label">Assessment Date:</span> {result.submission_date.strftime("%B %d, %Y")}
-                </div>
-            </div>
-        </div>
-        
-        <div class="overall-score">
-            <h2>Overall Compliance Score</h2>
-            <div class="score-display">{result.overall_percentage:.1f}%</div>
-            <div>Score: {result.overall_score} / {result.max_score}</div>
-            <span class="risk-badge" style="background-color: {risk_color};">{risk_display}</span>
-        </div>
-        
-        <div class="priority-actions {'has-actions' if has_priority_actions else 'no-actions'}">
-            <h2>Priority Actions</h2>
-            {priority_actions_html}
-        </div>
-        
-        <h2 style="color: #1e40af; margin-top: 30px; font-size: 16pt;">Category Breakdown</h2>
-        {category_rows}
-        
-        {STATE_ANNEXURE}
-        
-        {disclaimer_with_date}
-        
-        <div class="footer">
-            <p><strong>www.offrd.co</strong> - Transforming HR from Chore to Charm</p>
-            <p>Report ID: {result.id}</p>
-        </div>
-    </body>
-    </html>
+@functools.lru_cache(maxsize=None)
+def get_report_template() -> Template:
+    """The report template, compiled on first use and kept for the process."""
+    bytecode_cache = None
+    if JINJA_BYTECODE_CACHE_DIR:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html"]),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+        undefined=StrictUndefined,
+    )
+    return env.get_template(REPORT_TEMPLATE)
+
+
+@functools.lru_cache(maxsize=None)
+def get_report_stylesheet():
     """
-    
-    return html_content
+    The report stylesheet parsed by WeasyPrint once per render process,
+    instead of from an inline style block on every render.
+    """
+    from weasyprint import CSS
+    return CSS(filename=REPORT_STYLESHEET)
 
 
-def generate_pdf_report(result: AssessmentResult, output_path: Optional[str] = None) -> str:
+def generate_html_report(result: AssessmentResult, operating_states: Optional[List[str]] = None) -> str:
+    """
+    Report HTML without its stylesheet. The state annexure lists only the
+    lead's operating states. The report is dated by its assessment, not
+    the render, so a cached PDF matches a fresh render of the same content.
+    """
+    return get_report_template().render(
+        result=result,
+        logo_data_uri=get_logo_base64(),
+        category_names=CATEGORY_DISPLAY_NAMES,
+        risk_colors=RISK_LEVEL_COLORS,
+        risk_display=RISK_LEVEL_DISPLAY,
+        central_compliance=CENTRAL_COMPLIANCE,
+        state_compliance=get_state_compliance(operating_states),
+        report_date=result.submission_date.strftime("%B %d, %Y"),
+    )
+
+
+def generate_pdf_report(result: AssessmentResult, output_path: Optional[str] = None, operating_states: Optional[List[str]] = None) -> str:
     if not WEASYPRINT_AVAILABLE:
         raise RuntimeError("PDF generation is not available - WeasyPrint dependencies are missing")
     
@@ -576,8 +139,10 @@ def generate_pdf_report(result: AssessmentResult, output_path: Optional[str] = N
         os.makedirs("/tmp/compliance_reports", exist_ok=True)
         output_path = f"/tmp/compliance_reports/report_{result.id}.pdf"
     
-    html_content = generate_html_report(result)
+    from weasyprint import HTML
+    
+    html_content = generate_html_report(result, operating_states)
     
-    HTML(string=html_content).write_pdf(output_path)
+    HTML(string=html_content).write_pdf(output_path, stylesheets=[get_report_stylesheet()])
     
     return output_path
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from app.models import Question, QuestionOption, QuestionType, ComplianceCategory, RiskLevel, ApplicabilityRule, GovernmentSource, ConditionalRule
 
 QUESTIONS = [
@@ -394,6 +396,12 @@ QUESTIONS = [
     ),
 ]
 
+# Content hash of the catalog. Answer counters are keyed by it, so edits to
+# questions or options start fresh counts instead of mixing versions.
+CATALOG_VERSION = hashlib.sha256(
+    json.dumps([q.model_dump(mode="json") for q in QUESTIONS], sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
 
 def get_all_questions():
     return QUESTIONS
@@ -0,0 +1,228 @@
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from typing import Dict, List, Optional
+from app.database import db
+from app.models import AssessmentResult
+from app.pdf_pool import pdf_render_pool
+from app.pdf_service import REPORT_TEMPLATE_VERSION
+from app.state_compliance import get_state_compliance
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "/tmp/compliance_reports")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+_ASSESSMENT_ID = re.compile(r"^[A-Za-z0-9-]+$")
+
+
+def report_key(assessment: AssessmentResult, operating_states: Optional[List[str]] = None) -> str:
+    """
+    Hash of everything a rendered report depends on: the assessment,
+    except its own pdf_url, the states its annexure lists, and the report
+    template version.
+    """
+    payload = {
+        "assessment": assessment.model_dump(mode="json", exclude={"pdf_url"}),
+        "states": [state.code for state in get_state_compliance(operating_states)],
+        "template": REPORT_TEMPLATE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def report_url(assessment_id: str) -> str:
+    return f"/api/v1/reports/generate?assessment_id={assessment_id}"
+
+
+class ReportCache:
+    """
+    Rendered PDF reports on local disk, named `<assessment id>-<key>.pdf`
+    so a file is only served for the exact content it was rendered from
+    and every file of an assessment can be found for deletion.
+
+    File modification times double as last-use times: a hit touches the
+    file, and when the directory grows past `max_bytes` the least
+    recently used files are removed. Workers sharing the directory share
+    the cache.
+
+    Concurrent requests for a report that is still rendering wait on the
+    same render instead of starting their own; this holds within one
+    worker process.
+    """
+
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.joined = 0
+        self.prerendered = 0
+        self.prerenders_skipped = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def path_for(self, assessment: AssessmentResult, operating_states: Optional[List[str]] = None) -> str:
+        if not _ASSESSMENT_ID.match(assessment.id):
+            raise ValueError(f"Invalid assessment id: {assessment.id!r}")
+        return os.path.join(self.cache_dir, f"{assessment.id}-{report_key(assessment, operating_states)}.pdf")
+
+    def _files(self, assessment_id: Optional[str] = None) -> List[str]:
+        prefix = glob.escape(assessment_id) if assessment_id else "*"
+        return glob.glob(os.path.join(self.cache_dir, f"{prefix}-*.pdf"))
+
+    def get(self, assessment: AssessmentResult, operating_states: Optional[List[str]] = None) -> Optional[str]:
+        path = self.path_for(assessment, operating_states)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def get_or_render(self, assessment: AssessmentResult) -> str:
+        """
+        Path of the report PDF, rendered in the PDF pool only when no file
+        for this content is cached or already being rendered.
+        """
+        # A lead's id is the id of its assessment
+        lead = db.get_lead(assessment.id)
+        operating_states = lead.operating_states if lead else None
+        path = self.get(assessment, operating_states)
+        if path is not None:
+            self._count("hits")
+            return path
+
+        path = self.path_for(assessment, operating_states)
+        task = self._inflight.get(path)
+        if task is None:
+            self._count("misses")
+            task = asyncio.ensure_future(self._render(assessment, path, operating_states))
+            self._inflight[path] = task
+            task.add_done_callback(lambda done: self._render_done(path, done))
+        else:
+            self._count("joined")
+        # A caller giving up must not cancel the render others wait on.
+        return await asyncio.shield(task)
+
+    def _render_done(self, path: str, task: asyncio.Task) -> None:
+        self._inflight.pop(path, None)
+        if not task.cancelled():
+            # Retrieved here so a render whose callers all left is not
+            # reported as an unhandled error.
+            task.exception()
+
+    async def _render(self, assessment: AssessmentResult, path: str, operating_states: Optional[List[str]]) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            await pdf_render_pool.render(assessment, tmp_path, operating_states)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Renders of earlier content for the same assessment are dead weight.
+        for stale in self._files(assessment.id):
+            if stale != path:
+                self._remove(stale)
+        self.evict()
+        return path
+
+    async def prerender(self, assessment: AssessmentResult) -> Optional[str]:
+        """
+        Render a report ahead of its download and record its URL on the
+        assessment. Low priority: skipped when no render process is free,
+        leaving the download to render on demand.
+        """
+        if not pdf_render_pool.available or not pdf_render_pool.idle():
+            self._count("prerenders_skipped")
+            return None
+        try:
+            path = await self.get_or_render(assessment)
+        except Exception as e:
+            logger.warning(f"Pre-rendering the report for {assessment.id} failed: {str(e)}")
+            return None
+        self._count("prerendered")
+        if not db.set_assessment_pdf_url(assessment.id, report_url(assessment.id)):
+            # Deleted while rendering
+            self.invalidate(assessment.id)
+            return None
+        return path
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self) -> int:
+        """
+        Remove least recently used files until the cache fits in
+        `max_bytes`. Returns how many files were removed.
+        """
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+                self._count("evictions")
+            total -= size
+        if removed:
+            logger.info(f"Evicted {removed} cached PDF reports to stay under {self.max_bytes} bytes")
+        return removed
+
+    def invalidate(self, assessment_id: str) -> int:
+        """
+        Delete every cached report of an assessment, e.g. on a privacy
+        deletion request. Returns how many files were removed.
+        """
+        if not _ASSESSMENT_ID.match(assessment_id):
+            return 0
+        return sum(self._remove(path) for path in self._files(assessment_id))
+
+    def stats(self) -> Dict:
+        files = self._files()
+        size = 0
+        for path in files:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(files),
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "joined": self.joined,
+                "prerendered": self.prerendered,
+                "prerenders_skipped": self.prerenders_skipped,
+                "rendering": len(self._inflight),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+report_cache = ReportCache()
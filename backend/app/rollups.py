@@ -0,0 +1,183 @@
+import argparse
+import logging
+import os
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from pytz import timezone
+
+try:
+    from sqlalchemy import text
+except Exception:  # noqa: F401
+    text = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Days are bucketed in the timezone the digest is scheduled in. Stored
+# timestamps are naive server-local times.
+ROLLUP_TIMEZONE = timezone(os.getenv("ROLLUP_TIMEZONE", "Asia/Kolkata"))
+
+# (day, state, industry, risk level); "" stands for "none" so the key can be
+# a primary key. Rows with state "" count every respondent once, by
+# industry and risk level; rows with a state break the same respondents
+# down by each of their operating states, so a respondent with several
+# states is counted in each.
+RollupKey = Tuple[date, str, str, str]
+ALL_STATES = ""
+# (assessment_count, score_sum, score_sq_sum, lead_count)
+RollupValues = Tuple[int, float, float, int]
+
+ROLLUP_MEASURES = ("assessment_count", "score_sum", "score_sq_sum", "lead_count")
+
+# Cache of completed statistics buckets, cleared when a past day changes.
+SERIES_CACHE = "statistics_series"
+
+
+class DailyRollup(BaseModel):
+    day: date
+    state: str
+    industry: str
+    risk_level: str
+    assessment_count: int = 0
+    score_sum: float = 0.0
+    score_sq_sum: float = 0.0
+    lead_count: int = 0
+
+
+def _localize(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(ROLLUP_TIMEZONE)
+
+
+def rollup_day(value: datetime) -> date:
+    return _localize(value).date()
+
+
+def rollup_hour(value: datetime) -> datetime:
+    """
+    Start of the hour containing `value`, as naive ROLLUP_TIMEZONE wall time.
+    """
+    return _localize(value).replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _enum_value(value) -> str:
+    if value is None:
+        return ""
+    return getattr(value, "value", value)
+
+
+def _respondent_keys(day, states: Optional[List[str]], industry: Optional[str], risk_level) -> List[RollupKey]:
+    risk = _enum_value(risk_level)
+    return [(day, state, industry or "", risk) for state in [ALL_STATES] + sorted(set(states or []) - {ALL_STATES})]
+
+
+def assessment_rollup(
+    submission_date: datetime,
+    percentage: Optional[float],
+    risk_level,
+    states: Optional[List[str]] = None,
+    industry: Optional[str] = None,
+    bucket: Callable = rollup_day,
+) -> Dict[RollupKey, RollupValues]:
+    """
+    Contribution of one assessment, under the operating states and
+    industry of its lead (the lead with the same id), if any.
+    """
+    if percentage is None:
+        return {}
+    values = (1, percentage, percentage * percentage, 0)
+    return {key: values for key in _respondent_keys(bucket(submission_date), states, industry, risk_level)}
+
+
+def lead_rollup(submission_date: datetime, states: Optional[List[str]], industry: Optional[str], risk_level, bucket: Callable = rollup_day) -> Dict[RollupKey, RollupValues]:
+    """
+    Contribution of one lead: one lead count overall and one per operating
+    state, matching how the digest counts states.
+    """
+    return {key: (0, 0.0, 0.0, 1) for key in _respondent_keys(bucket(submission_date), states, industry, risk_level)}
+
+
+def rollup_delta(before: Dict[RollupKey, RollupValues], after: Dict[RollupKey, RollupValues]) -> Dict[RollupKey, RollupValues]:
+    """
+    What to add to the rollup table when a record changes from `before` to
+    `after` ({} for an insert or delete).
+    """
+    delta: Dict[RollupKey, RollupValues] = {}
+    accumulate(delta, after)
+    accumulate(delta, before, sign=-1)
+    return {key: values for key, values in delta.items() if any(values)}
+
+
+def touches_past_days(*contributions: Dict[RollupKey, RollupValues]) -> bool:
+    """
+    Whether a change affects a day before today, i.e. a bucket that
+    statistics caches treat as complete.
+    """
+    today = rollup_day(datetime.now())
+    return any(key[0] < today for contribution in contributions for key in contribution)
+
+
+def accumulate(totals: Dict[RollupKey, RollupValues], contribution: Dict[RollupKey, RollupValues], sign: int = 1) -> None:
+    for key, values in contribution.items():
+        current = totals.get(key, (0, 0.0, 0.0, 0))
+        totals[key] = tuple(c + sign * v for c, v in zip(current, values))
+
+
+def to_rollups(totals: Dict[RollupKey, RollupValues]) -> List[DailyRollup]:
+    return [
+        DailyRollup(day=day, state=state, industry=industry, risk_level=risk_level, **dict(zip(ROLLUP_MEASURES, values)))
+        for (day, state, industry, risk_level), values in sorted(totals.items())
+    ]
+
+
+def rebuild_daily_rollups(conn) -> int:
+    """
+    Recompute the Postgres daily_rollups table from the assessments and
+    leads tables. The table lock makes concurrent writers wait, so their
+    deltas land on top of the rebuilt rows rather than being lost.
+    """
+    conn.execute(text("LOCK TABLE daily_rollups IN EXCLUSIVE MODE"))
+    totals: Dict[RollupKey, RollupValues] = {}
+
+    assessments = conn.execute(text(
+        "SELECT a.submission_date, a.overall_percentage, a.overall_risk_level, l.operating_states, l.industry "
+        "FROM assessments a LEFT JOIN leads l ON l.id = a.id"
+    ).execution_options(yield_per=1000))
+    for row in assessments:
+        accumulate(totals, assessment_rollup(row.submission_date, row.overall_percentage, row.overall_risk_level, row.operating_states, row.industry))
+
+    leads = conn.execute(text(
+        "SELECT submission_date, operating_states, industry, overall_risk_level FROM leads"
+    ).execution_options(yield_per=1000))
+    for row in leads:
+        accumulate(totals, lead_rollup(row.submission_date, row.operating_states, row.industry, row.overall_risk_level))
+
+    conn.execute(text("DELETE FROM daily_rollups"))
+    rows = [rollup.model_dump() for rollup in to_rollups(totals)]
+    if rows:
+        conn.execute(text(
+            "INSERT INTO daily_rollups (day, state, industry, risk_level, assessment_count, score_sum, score_sq_sum, lead_count) "
+            "VALUES (:day, :state, :industry, :risk_level, :assessment_count, :score_sum, :score_sq_sum, :lead_count)"
+        ), rows)
+    return len(rows)
+
+
+def backfill() -> Tuple[int, int, int]:
+    # Imported here: app.database imports this module.
+    from app.database import db
+    return db.rebuild_rollups(), db.rebuild_sketches(), db.rebuild_funnel()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the daily statistics rollups")
+    parser.add_argument("command", choices=["backfill"], help="backfill: rebuild every rollup, score sketch and funnel counter from source tables")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    rollups, sketches, funnel = backfill()
+    logger.info(f"Rebuilt {rollups} daily rollup rows, {sketches} score sketches and {funnel} funnel counters")
+
+
+if __name__ == "__main__":
+    main()
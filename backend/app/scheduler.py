@@ -3,6 +3,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from pytz import timezone
 from app.email_service import email_service
+from app.outbox import outbox_dispatcher
 from app.statistics_service import statistics_service
 
 logging.basicConfig(level=logging.INFO)
@@ -26,9 +27,10 @@ def send_weekly_digest():
         success, error = email_service.send_weekly_digest(stats)
         
         if success:
-            logger.info("Weekly digest email sent successfully")
+            outbox_dispatcher.wake()
+            logger.info("Weekly digest email queued")
         else:
-            logger.error(f"Failed to send weekly digest email: {error}")
+            logger.error(f"Failed to queue weekly digest email: {error}")
     
     except Exception as e:
         logger.error(f"Error in weekly digest job: {str(e)}", exc_info=True)
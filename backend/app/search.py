@@ -0,0 +1,99 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+NGRAM_SIZE = 3
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """
+    Unpadded n-grams of the lowercased text, used for substring lookup.
+    """
+    text = text.lower()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _padded_trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        grams |= ngrams(f"  {word} ")
+    return grams
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    """
+    Same measure as pg_trgm's similarity(): shared word trigrams over all
+    word trigrams, so in-memory ranking matches the Postgres backend.
+    """
+    grams_a = _padded_trigrams(a)
+    grams_b = _padded_trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+class NgramIndex:
+    """
+    Inverted index from n-grams to document ids for case-insensitive
+    substring search. A query only touches the posting lists of its own
+    n-grams rather than scanning every document.
+    """
+
+    def __init__(self, n: int = NGRAM_SIZE):
+        self.n = n
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._documents: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, doc_id: str, *fields: str) -> None:
+        self.remove(doc_id)
+        fields = tuple(field or "" for field in fields)
+        self._documents[doc_id] = fields
+        for field in fields:
+            for gram in ngrams(field, self.n):
+                self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        fields = self._documents.pop(doc_id, None)
+        if fields is None:
+            return
+        for field in fields:
+            for gram in ngrams(field, self.n):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard(doc_id)
+                    if not postings:
+                        del self._postings[gram]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._documents.clear()
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """
+        Ids of documents with a field containing `query`, best match first.
+        Queries shorter than the n-gram size fall back to a scan.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        grams = ngrams(query, self.n)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = set(self._documents)
+
+        results = []
+        for doc_id in candidates:
+            fields = self._documents[doc_id]
+            if any(query in field.lower() for field in fields):
+                rank = max(trigram_similarity(field, query) for field in fields)
+                results.append((doc_id, rank))
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results
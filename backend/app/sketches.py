@@ -0,0 +1,267 @@
+import gzip
+import json
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+
+try:
+    from sqlalchemy import text
+except Exception:  # noqa: F401
+    text = None  # type: ignore
+
+from app.models import AssessmentResult
+from app.rollups import rollup_day
+
+OVERALL_METRIC = "overall"
+DEFAULT_COMPRESSION = 100.0
+REPORTED_QUANTILES = (0.1, 0.5, 0.9)
+# First key of the two-key pg_advisory_xact_lock that serializes the
+# writes to one day's sketches; the second key is the day's ordinal.
+SKETCH_DAY_LOCK_KEY = 7318422
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl) for streaming quantile estimates.
+
+    Keeps at most ~compression centroids however many values are added,
+    with the smallest centroids near the tails where p10/p90 are read.
+    Digests built on different days or workers merge into a digest of the
+    combined data.
+    """
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return sum(self._weights) + sum(w for _, w in self._buffer)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._buffer.append((value, weight))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        self._buffer.extend(zip(other._means, other._weights))
+        self._buffer.extend(other._buffer)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k_limit(self, q: float) -> float:
+        # Largest cumulative fraction a centroid starting at q may reach
+        # under the k1 scale function, k(q) = d / (2 pi) * asin(2q - 1).
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+
+        means, weights = [points[0][0]], [points[0][1]]
+        cumulative = 0.0
+        limit = total * self._k_limit(0.0)
+        for mean, weight in points[1:]:
+            if cumulative + weights[-1] + weight <= limit:
+                merged = weights[-1] + weight
+                means[-1] += (mean - means[-1]) * weight / merged
+                weights[-1] = merged
+            else:
+                cumulative += weights[-1]
+                limit = total * self._k_limit(cumulative / total)
+                means.append(mean)
+                weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._compress()
+        if not self._weights:
+            return None
+        if len(self._weights) == 1 or q <= 0:
+            return self.min if q <= 0 else self._means[0]
+        if q >= 1:
+            return self.max
+
+        total = sum(self._weights)
+        target = q * total
+        # Interpolate between centroid centres; the first and last half
+        # centroids interpolate towards the exact min and max.
+        previous_center, previous_value = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_value + fraction * (mean - previous_value)
+            previous_center, previous_value = center, mean
+            cumulative += weight
+        span = total - previous_center
+        fraction = (target - previous_center) / span if span else 1.0
+        return previous_value + fraction * (self.max - previous_value)
+
+    def to_dict(self) -> Dict:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "means": self._means,
+            "weights": self._weights,
+            "min": self.min if self._weights else None,
+            "max": self.max if self._weights else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "TDigest":
+        digest = cls(compression=(data or {}).get("compression", DEFAULT_COMPRESSION))
+        if data and data.get("weights"):
+            digest._means = list(data["means"])
+            digest._weights = list(data["weights"])
+            digest.min = data["min"]
+            digest.max = data["max"]
+        return digest
+
+
+class QuantileSummary(BaseModel):
+    count: int
+    min: Optional[float] = None
+    p10: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    max: Optional[float] = None
+
+
+class ScoreDistribution(BaseModel):
+    start: date
+    end: date
+    metrics: Dict[str, QuantileSummary]
+
+
+def summarize(digest: TDigest) -> QuantileSummary:
+    count = int(round(digest.count))
+    if count == 0:
+        return QuantileSummary(count=0)
+    p10, p50, p90 = (round(digest.quantile(q), 1) for q in REPORTED_QUANTILES)
+    return QuantileSummary(count=count, min=digest.min, p10=p10, p50=p50, p90=p90, max=digest.max)
+
+
+def assessment_metrics(result: Dict) -> Dict[str, float]:
+    """
+    Values an assessment adds to the sketches: its overall percentage and
+    each category percentage. Takes the assessment as a JSON-style dict.
+    """
+    metrics = {OVERALL_METRIC: float(result["overall_percentage"])}
+    for category in result.get("category_scores") or []:
+        metrics[category["category"]] = float(category["percentage"])
+    return metrics
+
+
+def result_metrics(assessment: AssessmentResult) -> Dict[str, float]:
+    metrics = {OVERALL_METRIC: assessment.overall_percentage}
+    for category in assessment.category_scores:
+        metrics[category.category.value] = category.percentage
+    return metrics
+
+
+def merge_sketches(rows: Iterable[Tuple[str, Dict]]) -> Dict[str, TDigest]:
+    merged: Dict[str, TDigest] = {}
+    for metric, data in rows:
+        merged.setdefault(metric, TDigest()).merge(TDigest.from_dict(data))
+    return merged
+
+
+def _stored_result(row) -> Dict:
+    if row.result_json is not None:
+        body = bytes(row.result_json)
+        return json.loads(gzip.decompress(body) if row.result_encoding == "gzip" else body)
+    return row.data
+
+
+def rebuild_score_sketches(conn) -> int:
+    """
+    Recompute the Postgres daily_score_sketches table from the stored
+    assessment JSON.
+    """
+    conn.execute(text("LOCK TABLE daily_score_sketches IN EXCLUSIVE MODE"))
+    digests: Dict[Tuple[date, str], TDigest] = {}
+    rows = conn.execute(text(
+        "SELECT submission_date, data, result_json, result_encoding FROM assessments"
+    ).execution_options(yield_per=500))
+    for row in rows:
+        day = rollup_day(row.submission_date)
+        for metric, value in assessment_metrics(_stored_result(row)).items():
+            digests.setdefault((day, metric), TDigest()).add(value)
+
+    conn.execute(text("DELETE FROM daily_score_sketches"))
+    if digests:
+        conn.execute(
+            text("INSERT INTO daily_score_sketches (day, metric, digest) VALUES (:day, :metric, CAST(:digest AS jsonb))"),
+            [
+                {"day": day, "metric": metric, "digest": json.dumps(digest.to_dict())}
+                for (day, metric), digest in sorted(digests.items())
+            ],
+        )
+    return len(digests)
+
+
+def lock_sketch_day(conn, day: date) -> None:
+    """
+    Serialize the writes to one day's sketches until the caller's
+    transaction ends. Row locks alone are not enough: a writer blocked on
+    a row that a rebuild deletes and re-inserts finds no row when it
+    wakes and drops its value.
+    """
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(:key, :day)"),
+        {"key": SKETCH_DAY_LOCK_KEY, "day": day.toordinal()},
+    )
+
+
+def rebuild_day_score_sketches(conn, day: date) -> int:
+    """
+    Recompute one day's rows of daily_score_sketches from the assessments
+    left on that day, in the caller's transaction. Digests cannot remove
+    a value, so a deletion rebuilds the day it was counted in.
+    """
+    # A writer adding to the day waits for this transaction to commit, and
+    # then adds its value to the rebuilt rows. One that committed earlier
+    # is among the assessments read below.
+    lock_sketch_day(conn, day)
+    # submission_date is naive local time; a day either side covers the
+    # rollup day whatever the server's offset from the rollup timezone.
+    rows = conn.execute(
+        text(
+            "SELECT submission_date, data, result_json, result_encoding FROM assessments"
+            " WHERE submission_date >= :start AND submission_date < :end"
+        ),
+        {"start": datetime.combine(day - timedelta(days=1), time.min), "end": datetime.combine(day + timedelta(days=2), time.min)},
+    )
+    digests: Dict[str, TDigest] = {}
+    for row in rows:
+        if rollup_day(row.submission_date) == day:
+            for metric, value in assessment_metrics(_stored_result(row)).items():
+                digests.setdefault(metric, TDigest()).add(value)
+
+    conn.execute(text("DELETE FROM daily_score_sketches WHERE day = :day"), {"day": day})
+    if digests:
+        conn.execute(
+            text("INSERT INTO daily_score_sketches (day, metric, digest) VALUES (:day, :metric, CAST(:digest AS jsonb))"),
+            [
+                {"day": day, "metric": metric, "digest": json.dumps(digest.to_dict())}
+                for metric, digest in sorted(digests.items())
+            ],
+        )
+    return len(digests)
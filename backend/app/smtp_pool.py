@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import logging
+import queue
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def connection_lost(error: Exception) -> bool:
+    """
+    Whether an error means the session cannot be used for another message.
+    SMTP reply errors subclass OSError but leave the session usable.
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class _Session:
+    def __init__(self, conn: smtplib.SMTP):
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
+    """
+    Pool of logged-in SMTP sessions, so sending a message does not pay for
+    the TCP connect, EHLO, STARTTLS and AUTH round trips every time.
+
+    At most `size` sessions are open at once. A session idle for more than
+    `idle_check_seconds` is checked with NOOP before it is used, and
+    sessions are retired after `max_messages` messages. If a reused session
+    turns out to be dead, the message is sent once more on a new session.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        use_ssl: bool = False,
+        size: int = 4,
+        timeout: float = 30,
+        idle_check_seconds: float = 30,
+        max_messages: int = 100,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.size = size
+        self.timeout = timeout
+        self.idle_check_seconds = idle_check_seconds
+        self.max_messages = max_messages
+        self._context = ssl.create_default_context()
+        self._idle: "queue.LifoQueue[_Session]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._stats_lock = threading.Lock()
+        self._open = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.health_check_failures = 0
+        self.sent = 0
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def _connect(self) -> _Session:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self._context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.starttls and not self.use_ssl:
+                conn.starttls(context=self._context)
+                conn.ehlo()
+            if self.username:
+                conn.login(self.username, self.password or "")
+        except Exception:
+            self._close(conn)
+            raise
+        self._count("connects")
+        self._count("_open")
+        return _Session(conn)
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _discard(self, session: _Session) -> None:
+        self._close(session.conn)
+        self._count("_open", -1)
+
+    def _healthy(self, session: _Session) -> bool:
+        if time.monotonic() - session.last_used < self.idle_check_seconds:
+            return True
+        try:
+            return session.conn.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> _Session:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._healthy(session):
+                return session
+            self._count("health_check_failures")
+            self._discard(session)
+
+    @contextmanager
+    def session(self) -> Iterator[_Session]:
+        """
+        Check out a session for one or more messages. A session that raised
+        a connection error is closed instead of going back to the pool.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPServerDisconnected("Timed out waiting for a pooled SMTP connection")
+        session = None
+        try:
+            session = self._checkout()
+            yield session
+        except Exception as e:
+            if session is not None and connection_lost(e):
+                self._discard(session)
+                session = None
+            raise
+        finally:
+            if session is not None:
+                session.last_used = time.monotonic()
+                if session.sent >= self.max_messages:
+                    self._discard(session)
+                else:
+                    self._idle.put(session)
+            self._slots.release()
+
+    def send(self, message: EmailMessage) -> None:
+        """
+        Send one message, retrying once on a new connection if a pooled one
+        was dropped by the server.
+        """
+        for attempt in range(2):
+            reused = False
+            try:
+                with self.session() as session:
+                    reused = session.sent > 0
+                    session.conn.send_message(message)
+                    session.sent += 1
+            except Exception as e:
+                if attempt or not reused or not connection_lost(e):
+                    raise
+                self._count("reconnects")
+                continue
+            self._count("sent")
+            return
+
+    def close(self) -> None:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(session)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "host": self.host,
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "connects": self.connects,
+                "reconnects": self.reconnects,
+                "health_check_failures": self.health_check_failures,
+                "sent": self.sent,
+                "messages_per_connection": self.sent / self.connects if self.connects else 0.0,
+            }
+
+
+def _benchmark_message(index: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "bench@example.com"
+    message["To"] = "inbox@example.com"
+    message["Subject"] = f"Benchmark message {index}"
+    message.set_content("Benchmark body\n" * 20)
+    return message
+
+
+def _send_unpooled(host: str, port: int, message: EmailMessage) -> None:
+    with smtplib.SMTP(host, port) as conn:
+        conn.ehlo()
+        conn.send_message(message)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def benchmark(messages: int, concurrency: int, latency_ms: float) -> List[Dict]:
+    """
+    Send `messages` messages to a local aiosmtpd server, once with a new
+    connection per message and once through the pool. `latency_ms` is
+    added to the server's reply to every connection and command, standing
+    in for the network round trips a real provider costs.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.smtp import SMTP as SMTPServer
+    except ImportError:
+        raise SystemExit("The SMTP benchmark needs aiosmtpd: pip install aiosmtpd")
+
+    delay = latency_ms / 1000
+
+    class Sink:
+        async def handle_DATA(self, server, session, envelope):
+            return "250 OK"
+
+    class SlowSMTP(SMTPServer):
+        async def push(self, status):
+            if delay:
+                await asyncio.sleep(delay)
+            await super().push(status)
+
+    class SlowController(Controller):
+        def factory(self):
+            return SlowSMTP(self.handler)
+
+    host, port = "127.0.0.1", _free_port()
+    controller = SlowController(Sink(), hostname=host, port=port)
+    controller.start()
+    pool = SMTPPool(host, port, starttls=False, size=concurrency)
+    results = []
+    try:
+        runs = [
+            ("connection per message", lambda i: _send_unpooled(host, port, _benchmark_message(i))),
+            ("pooled", lambda i: pool.send(_benchmark_message(i))),
+        ]
+        for name, send in runs:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(send, range(messages)))
+            elapsed = time.perf_counter() - started
+            results.append({"transport": name, "messages": messages, "seconds": elapsed, "per_second": messages / elapsed})
+        results[-1]["connections"] = pool.connects
+    finally:
+        pool.close()
+        controller.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="SMTP connection pool tools")
+    parser.add_argument("command", choices=["benchmark"], help="benchmark: compare pooled and per-message SMTP sends against a local aiosmtpd server")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated round-trip time added to every server reply")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # aiosmtpd logs every connection
+    logging.getLogger("mail.log").setLevel(logging.WARNING)
+    for result in benchmark(args.messages, args.concurrency, args.latency_ms):
+        logger.info(
+            f"{result['transport']}: {result['messages']} messages in {result['seconds']:.2f}s "
+            f"({result['per_second']:.0f}/s)"
+            + (f" over {result['connections']} connections" if "connections" in result else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from typing import List, Optional
+from app.models import ComplianceReference, GovernmentSource, StateComplianceReferences
+
+CENTRAL_COMPLIANCE = [
+    ComplianceReference(
+        title="Employees' Provident Fund (EPF)",
+        description="Applicable to establishments with 20+ employees.",
+        source=GovernmentSource(name="EPFO Official Website", url="https://www.epfindia.gov.in/"),
+    ),
+    ComplianceReference(
+        title="Employees' State Insurance (ESI)",
+        description="Applicable to establishments with 10+ employees earning up to ₹21,000/month.",
+        source=GovernmentSource(name="ESIC Official Website", url="https://www.esic.gov.in/"),
+    ),
+    ComplianceReference(
+        title="Income Tax (TDS)",
+        description="Mandatory for all employers.",
+        source=GovernmentSource(name="Income Tax Department", url="https://www.incometax.gov.in/"),
+    ),
+    ComplianceReference(
+        title="Goods and Services Tax (GST)",
+        description="Registration required if turnover exceeds ₹40 lakhs (₹20 lakhs for special category states).",
+        source=GovernmentSource(name="GST Portal", url="https://www.gst.gov.in/"),
+    ),
+    ComplianceReference(
+        title="Prevention of Sexual Harassment (POSH)",
+        description="Mandatory for all organizations with 10+ employees.",
+        source=GovernmentSource(name="Ministry of Women and Child Development", url="https://wcd.gov.in/"),
+    ),
+]
+
+STATE_COMPLIANCE = [
+    StateComplianceReferences(
+        code="KA",
+        name="Karnataka",
+        references=[
+            ComplianceReference(
+                title="Karnataka Shops and Commercial Establishments Act",
+                description="Registration required within 30 days of commencement.",
+                source=GovernmentSource(name="Karnataka Labour Department", url="https://labour.karnataka.gov.in/"),
+            ),
+            ComplianceReference(
+                title="Professional Tax",
+                description="Applicable to all employees and employers. Maximum ₹2,500/year.",
+                source=GovernmentSource(name="Karnataka One Portal", url="https://karnatakaone.gov.in/"),
+            ),
+        ],
+    ),
+    StateComplianceReferences(
+        code="MH",
+        name="Maharashtra",
+        references=[
+            ComplianceReference(
+                title="Maharashtra Shops and Establishments Act",
+                description="Registration required within 30 days.",
+                source=GovernmentSource(name="Maharashtra Labour Department", url="https://mahakamgar.maharashtra.gov.in/"),
+            ),
+            ComplianceReference(
+                title="Professional Tax",
+                description="Applicable to all employees and employers. Maximum ₹2,500/year.",
+                source=GovernmentSource(name="MahaVAT Portal", url="https://mahavat.gov.in/"),
+            ),
+        ],
+    ),
+    StateComplianceReferences(
+        code="TN",
+        name="Tamil Nadu",
+        references=[
+            ComplianceReference(
+                title="Tamil Nadu Shops and Establishments Act",
+                description="Registration required within 30 days.",
+                source=GovernmentSource(name="Tamil Nadu Labour Department", url="https://www.tn.gov.in/labour"),
+            ),
+            ComplianceReference(
+                title="Professional Tax",
+                description="Applicable to all employees and employers. Maximum ₹2,500/year.",
+                source=GovernmentSource(name="TN Professional Tax", url="https://www.tnprofessionaltax.com/"),
+            ),
+        ],
+    ),
+    StateComplianceReferences(
+        code="DL",
+        name="Delhi",
+        references=[
+            ComplianceReference(
+                title="Delhi Shops and Establishments Act",
+                description="Registration required within 30 days.",
+                source=GovernmentSource(name="Delhi Labour Department", url="https://labour.delhi.gov.in/"),
+            ),
+            ComplianceReference(
+                title="No Professional Tax",
+                description="Delhi does not levy professional tax.",
+            ),
+        ],
+    ),
+    StateComplianceReferences(
+        code="GJ",
+        name="Gujarat",
+        references=[
+            ComplianceReference(
+                title="Gujarat Shops and Establishments Act",
+                description="Registration required within 30 days.",
+                source=GovernmentSource(name="Gujarat Labour Department", url="https://labour.gujarat.gov.in/"),
+            ),
+            ComplianceReference(
+                title="Professional Tax",
+                description="Applicable to all employees and employers. Maximum ₹2,500/year.",
+                source=GovernmentSource(name="Gujarat Professional Tax", url="https://www.ptax.gujarat.gov.in/"),
+            ),
+        ],
+    ),
+    StateComplianceReferences(
+        code="WB",
+        name="West Bengal",
+        references=[
+            ComplianceReference(
+                title="West Bengal Shops and Establishments Act",
+                description="Registration required within 60 days.",
+                source=GovernmentSource(name="West Bengal Labour Department", url="https://wblabour.gov.in/"),
+            ),
+            ComplianceReference(
+                title="Professional Tax",
+                description="Applicable to all employees and employers. Maximum ₹2,500/year.",
+                source=GovernmentSource(name="WB Commercial Tax", url="https://wbcomtax.gov.in/"),
+            ),
+        ],
+    ),
+]
+
+# Leads store the state codes sent by the frontend; older leads and the
+# admin API use full names, so both are accepted.
+_STATES_BY_KEY = {key.lower(): state for state in STATE_COMPLIANCE for key in (state.code, state.name)}
+
+
+def get_state_compliance(operating_states: Optional[List[str]]) -> List[StateComplianceReferences]:
+    """
+    State references for a lead's operating states, in annexure order.
+    A lead with no operating states recorded gets every state.
+    """
+    if not operating_states:
+        return STATE_COMPLIANCE
+    wanted = {_STATES_BY_KEY[key.strip().lower()].code for key in operating_states if key.strip().lower() in _STATES_BY_KEY}
+    return [state for state in STATE_COMPLIANCE if state.code in wanted]
@@ -1,78 +1,294 @@
-from typing import List, Dict, Tuple
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, time, timedelta
 from collections import Counter
-from app.models import AssessmentResult, Lead, LeadStatus
+import math
+import os
+from app.admin_models import AnswerDistribution, AnswerSegment, FunnelSummary, SeriesBucket, SeriesGroupBy, SeriesPoint, StatisticsSeries
+from app.cache import cache_registry
 from app.database import db
+from app.answer_counts import ALL_RESPONDENTS, build_distribution
+from app.funnel import summarize_funnel
+from app.questions_data import CATALOG_VERSION, get_all_questions, get_question_by_id
+from app.rollups import ALL_STATES, DailyRollup, RollupValues, SERIES_CACHE, accumulate, rollup_day
+from app.sketches import OVERALL_METRIC, ScoreDistribution, TDigest, summarize
+
+# "rollup" reads the daily rollup table; "aggregate" runs COUNT/AVG and the
+# state count over the source tables. Rollups stay the default on every
+# backend since their cost does not grow with the number of assessments;
+# see .env.example.
+STATISTICS_SOURCE = os.getenv("STATISTICS_SOURCE", "rollup").lower()
+
+SERIES_CACHE_MAX_ENTRIES = int(os.getenv("SERIES_CACHE_MAX_ENTRIES", "10000"))
+# Writes to past days clear the writing worker's series cache at once, and
+# other workers' only with CACHE_INVALIDATION=postgres. Without that channel
+# this TTL bounds how long other workers serve stale buckets.
+SERIES_CACHE_TTL_SECONDS = float(os.getenv("SERIES_CACHE_TTL_SECONDS", "300"))
+# Hourly buckets are computed from source rows, so their range is capped.
+MAX_HOURLY_RANGE_DAYS = 31
+MAX_SERIES_BUCKETS = 2000
+
+series_cache = cache_registry.create(SERIES_CACHE, SERIES_CACHE_MAX_ENTRIES, SERIES_CACHE_TTL_SECONDS)
+
+_GROUP_INDEX = {
+    SeriesGroupBy.STATE: 1,
+    SeriesGroupBy.INDUSTRY: 2,
+    SeriesGroupBy.RISK_LEVEL: 3,
+}
+
+
+def bucket_start(value: date, bucket: SeriesBucket) -> datetime:
+    """
+    Start of the bucket containing `value` (an IST day, or an IST hour for
+    hourly buckets). Weeks start on Monday.
+    """
+    if bucket == SeriesBucket.HOUR:
+        if isinstance(value, datetime):
+            return value.replace(minute=0, second=0, microsecond=0)
+        return datetime.combine(value, time.min)
+    day = value.date() if isinstance(value, datetime) else value
+    if bucket == SeriesBucket.WEEK:
+        day = day - timedelta(days=day.weekday())
+    elif bucket == SeriesBucket.MONTH:
+        day = day.replace(day=1)
+    return datetime.combine(day, time.min)
+
+
+def next_bucket(start: datetime, bucket: SeriesBucket) -> datetime:
+    if bucket == SeriesBucket.HOUR:
+        return start + timedelta(hours=1)
+    if bucket == SeriesBucket.DAY:
+        return start + timedelta(days=1)
+    if bucket == SeriesBucket.WEEK:
+        return start + timedelta(weeks=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
 
 
 class StatisticsService:
-    def get_weekly_statistics(self) -> Dict:
-        """
-        Calculate weekly statistics for the digest email.
-        Returns total assessments, average score, and top 5 states.
-        """
-        assessments = db.get_all_assessments()
-        leads = db.get_all_leads()
-        
-        one_week_ago = datetime.now() - timedelta(days=7)
-        
-        weekly_assessments = [
-            a for a in assessments 
-            if a.submission_date >= one_week_ago
-        ]
-        
-        total_assessments = len(weekly_assessments)
-        
-        if total_assessments > 0:
-            total_score = sum(a.overall_percentage for a in weekly_assessments)
-            avg_score = total_score / total_assessments
-        else:
-            avg_score = 0.0
-        
+    def __init__(self, source: str = STATISTICS_SOURCE):
+        self.source = source
+    
+    @staticmethod
+    def _aggregate(since: Optional[datetime] = None) -> Dict:
+        total_assessments, avg_score, top_5_states = db.aggregate_statistics(since, top_states=5)
+        return {
+            "total_assessments": total_assessments,
+            "avg_score": avg_score,
+            "top_5_states": top_5_states
+        }
+    
+    @staticmethod
+    def _summarize(rollups: List[DailyRollup]) -> Dict:
+        total_assessments = 0
+        total_score = 0.0
         state_counter = Counter()
-        for lead in leads:
-            if lead.operating_states and lead.submission_date >= one_week_ago:
-                for state in lead.operating_states:
-                    state_counter[state] += 1
+        for rollup in rollups:
+            if rollup.state == ALL_STATES:
+                total_assessments += rollup.assessment_count
+                total_score += rollup.score_sum
+            elif rollup.lead_count:
+                state_counter[rollup.state] += rollup.lead_count
         
-        top_5_states = state_counter.most_common(5)
+        avg_score = total_score / total_assessments if total_assessments > 0 else 0.0
         
         return {
             "total_assessments": total_assessments,
             "avg_score": avg_score,
-            "top_5_states": top_5_states,
-            "period_start": one_week_ago,
-            "period_end": datetime.now()
+            "top_5_states": state_counter.most_common(5)
         }
     
+    @staticmethod
+    def _score_quantiles(start_day: Optional[date] = None, end_day: Optional[date] = None) -> Dict:
+        summary = summarize(db.get_score_sketches(start_day, end_day).get(OVERALL_METRIC, TDigest()))
+        return {"score_p10": summary.p10, "score_p50": summary.p50, "score_p90": summary.p90}
+    
+    def get_weekly_statistics(self) -> Dict:
+        """
+        Calculate weekly statistics for the digest email.
+        Returns total assessments, average score, score p10/p50/p90 and top
+        5 states. Reads the daily rollups for the last 7 days (IST), today
+        included, or aggregates the last 7 x 24 hours of source rows.
+        Quantiles always come from the daily score sketches.
+        """
+        now = datetime.now()
+        today = rollup_day(now)
+        if self.source == "aggregate":
+            since = now - timedelta(days=7)
+            stats = self._aggregate(since)
+            stats.update(self._score_quantiles(rollup_day(since), today))
+            stats["period_start"] = since
+            stats["period_end"] = now
+            return stats
+        
+        start_day = today - timedelta(days=6)
+        stats = self._summarize(db.get_rollups(start_day=start_day, end_day=today))
+        stats.update(self._score_quantiles(start_day, today))
+        stats["period_start"] = datetime.combine(start_day, time.min)
+        stats["period_end"] = now
+        return stats
+    
     def get_all_time_statistics(self) -> Dict:
         """
         Calculate all-time statistics.
         """
-        assessments = db.get_all_assessments()
-        leads = db.get_all_leads()
+        if self.source == "aggregate":
+            stats = self._aggregate()
+        else:
+            stats = self._summarize(db.get_rollups())
+        stats.update(self._score_quantiles())
+        return stats
+    
+    def get_distribution(self, start: date, end: date) -> ScoreDistribution:
+        """
+        Quantiles of the overall and per-category percentages of assessments
+        submitted between two IST days (inclusive), merged from the daily
+        score sketches.
+        """
+        if end < start:
+            raise ValueError("end must not be before start")
+        sketches = db.get_score_sketches(start, end)
+        return ScoreDistribution(
+            start=start,
+            end=end,
+            metrics={metric: summarize(sketches[metric]) for metric in sorted(sketches)},
+        )
+
+    
+    def get_funnel(self) -> FunnelSummary:
+        """
+        Conversion funnel from started to completed sessions. Reads the
+        counters kept on the write path, never the in-progress records.
+        """
+        return summarize_funnel(db.get_funnel_counters(), db.get_completion_times())
+    
+    def get_answer_distributions(
+        self,
+        question_id: Optional[str] = None,
+        segment: Optional[AnswerSegment] = None,
+        segment_value: Optional[str] = None,
+    ) -> List[AnswerDistribution]:
+        """
+        Share of respondents choosing each option, for one question or the
+        whole current catalog, among everyone or one state or industry.
+        Reads one counter row per option.
+        """
+        if (segment is None) != (segment_value is None):
+            raise ValueError("segment and segment_value must be given together")
+        if question_id is None:
+            questions = [q for q in get_all_questions() if q.options]
+        else:
+            question = get_question_by_id(question_id)
+            if question is None:
+                raise KeyError(question_id)
+            questions = [question]
         
-        total_assessments = len(assessments)
+        key = (segment.value, segment_value) if segment else ALL_RESPONDENTS
+        counts = db.get_answer_counts(CATALOG_VERSION, [q.id for q in questions], key)
+        return [
+            build_distribution(CATALOG_VERSION, q, counts[q.id], segment, segment_value)
+            for q in questions
+        ]
+    
+    def get_series(
+        self,
+        start: date,
+        end: date,
+        bucket: SeriesBucket = SeriesBucket.DAY,
+        group_by: Optional[SeriesGroupBy] = None,
+    ) -> StatisticsSeries:
+        """
+        Assessment counts, score mean/stddev and lead counts per time bucket
+        between two IST days (inclusive), optionally split by state,
+        industry or risk level. Buckets are aligned, so the first and last
+        may extend past the range. Split by state, a respondent counts in
+        each of their states and those without a state are left out.
+
+        Day, week and month buckets are summed from the daily rollups; hourly
+        buckets are computed from source rows. Buckets that ended before
+        today are cached for SERIES_CACHE_TTL_SECONDS, so mostly only the
+        open bucket is recomputed.
+        """
+        if end < start:
+            raise ValueError("end must not be before start")
+        if bucket == SeriesBucket.HOUR and (end - start).days >= MAX_HOURLY_RANGE_DAYS:
+            raise ValueError(f"hourly series are limited to {MAX_HOURLY_RANGE_DAYS} days")
         
-        if total_assessments > 0:
-            total_score = sum(a.overall_percentage for a in assessments)
-            avg_score = total_score / total_assessments
-        else:
-            avg_score = 0.0
+        starts = []
+        current = bucket_start(start, bucket)
+        range_end = datetime.combine(end + timedelta(days=1), time.min)
+        while current < range_end:
+            starts.append(current)
+            current = next_bucket(current, bucket)
+            if len(starts) > MAX_SERIES_BUCKETS:
+                raise ValueError(f"series are limited to {MAX_SERIES_BUCKETS} buckets")
         
-        state_counter = Counter()
-        for lead in leads:
-            if lead.operating_states:
-                for state in lead.operating_states:
-                    state_counter[state] += 1
+        today = datetime.combine(rollup_day(datetime.now()), time.min)
+        buckets: Dict[datetime, Dict[Optional[str], RollupValues]] = {}
+        missing = []
+        for bucket_at in starts:
+            cached = series_cache.get((bucket, bucket_at, group_by))
+            if cached is None:
+                missing.append(bucket_at)
+            else:
+                buckets[bucket_at] = cached
         
-        top_5_states = state_counter.most_common(5)
+        if missing:
+            generation = series_cache.generation
+            computed = self._compute_buckets(missing[0], next_bucket(missing[-1], bucket), bucket, group_by)
+            for bucket_at in missing:
+                buckets[bucket_at] = computed.get(bucket_at, {})
+                if next_bucket(bucket_at, bucket) <= today:
+                    series_cache.set((bucket, bucket_at, group_by), buckets[bucket_at], generation)
         
-        return {
-            "total_assessments": total_assessments,
-            "avg_score": avg_score,
-            "top_5_states": top_5_states
-        }
+        points = []
+        for bucket_at in starts:
+            groups = buckets[bucket_at]
+            if group_by is None and not groups:
+                groups = {None: (0, 0.0, 0.0, 0)}
+            for group in sorted(groups, key=lambda g: (g is None, g or "")):
+                points.append(self._point(bucket_at, group, groups[group]))
+        
+        return StatisticsSeries(bucket=bucket, group_by=group_by, start=start, end=end, points=points)
+    
+    @staticmethod
+    def _compute_buckets(
+        since: datetime, until: datetime, bucket: SeriesBucket, group_by: Optional[SeriesGroupBy]
+    ) -> Dict[datetime, Dict[Optional[str], RollupValues]]:
+        last_day = (until - timedelta(microseconds=1)).date()
+        if bucket == SeriesBucket.HOUR:
+            rows = db.get_hourly_totals(since.date(), last_day).items()
+        else:
+            rows = (
+                ((r.day, r.state, r.industry, r.risk_level), (r.assessment_count, r.score_sum, r.score_sq_sum, r.lead_count))
+                for r in db.get_rollups(start_day=since.date(), end_day=last_day)
+            )
+        
+        buckets: Dict[datetime, Dict[Optional[str], RollupValues]] = {}
+        for key, values in rows:
+            # Per-state rows only make up the state split; every other
+            # view reads the rows that count each respondent once.
+            if (key[1] != ALL_STATES) != (group_by == SeriesGroupBy.STATE):
+                continue
+            group = (key[_GROUP_INDEX[group_by]] or None) if group_by else None
+            accumulate(buckets.setdefault(bucket_start(key[0], bucket), {}), {group: values})
+        return buckets
+    
+    @staticmethod
+    def _point(bucket_at: datetime, group: Optional[str], values: Tuple) -> SeriesPoint:
+        assessment_count, score_sum, score_sq_sum, lead_count = values
+        avg_score = score_stddev = None
+        if assessment_count > 0:
+            avg_score = score_sum / assessment_count
+            score_stddev = math.sqrt(max(score_sq_sum / assessment_count - avg_score * avg_score, 0.0))
+        return SeriesPoint(
+            bucket_start=bucket_at,
+            group=group,
+            assessment_count=assessment_count,
+            avg_score=avg_score,
+            score_stddev=score_stddev,
+            lead_count=lead_count,
+        )
 
 
 statistics_service = StatisticsService()
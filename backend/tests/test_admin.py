@@ -0,0 +1,354 @@
+import csv
+import gzip
+import io
+import pytest
+import time
+import uuid
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.models import Lead, LeadStatus, RiskLevel
+from app.admin_service import stream_trials_csv, facets_cache
+from app import export_jobs
+from app.admin_models import ExportFormat, ExportJob, ExportJobStatus
+from app.export_jobs import export_job_manager
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.search_index.clear()
+    facets_cache.clear()
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.search_index.clear()
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+def make_lead(company: str, days_ago: int, score=None, states=None, status=LeadStatus.STARTED, **kwargs) -> Lead:
+    kwargs.setdefault("email", f"{company.lower().replace(' ', '')}@example.com")
+    lead = Lead(
+        id=str(uuid.uuid4()),
+        company_name=company,
+        contact_name="",
+        company_size="10-50",
+        operating_states=states,
+        status=status,
+        submission_date=datetime.now() - timedelta(days=days_ago),
+        overall_score=score,
+        overall_risk_level=RiskLevel.MODERATE if score is not None else None,
+        **kwargs
+    )
+    db.save_lead(lead)
+    return lead
+
+
+class TestAdminTrials:
+    def test_trials_sorted_newest_first(self, admin_headers):
+        """Test trials come back newest first"""
+        make_lead("Old Co", days_ago=10)
+        make_lead("New Co", days_ago=1)
+
+        response = client.get("/api/v1/admin/trials", headers=admin_headers)
+        assert response.status_code == 200
+        assert [t["company"] for t in response.json()] == ["New Co", "Old Co"]
+
+    def test_trials_filtered(self, admin_headers):
+        """Test score, state and date filters are combined"""
+        make_lead("Match Co", days_ago=2, score=60, states=["Karnataka", "Delhi"])
+        make_lead("Low Co", days_ago=2, score=20, states=["Karnataka"])
+        make_lead("Elsewhere Co", days_ago=2, score=60, states=["Gujarat"])
+        make_lead("Stale Co", days_ago=30, score=60, states=["Delhi"])
+
+        start = (datetime.now() - timedelta(days=7)).isoformat()
+        response = client.get(
+            "/api/v1/admin/trials",
+            params={"start_date": start, "states": "Delhi,Karnataka", "score_min": 50},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        assert [t["company"] for t in response.json()] == ["Match Co"]
+
+    def test_state_filter_keeps_trials_without_states(self, admin_headers):
+        """Test trials without states are not excluded by a state filter"""
+        make_lead("No States Co", days_ago=1)
+        make_lead("Gujarat Co", days_ago=1, states=["Gujarat"])
+
+        response = client.get("/api/v1/admin/trials", params={"states": "Delhi"}, headers=admin_headers)
+        assert [t["company"] for t in response.json()] == ["No States Co"]
+
+    def test_trials_paginated(self, admin_headers):
+        """Test limit and offset page through the sorted trials"""
+        for days_ago in range(5):
+            make_lead(f"Company {days_ago}", days_ago=days_ago)
+
+        response = client.get("/api/v1/admin/trials", params={"limit": 2, "offset": 2}, headers=admin_headers)
+        assert [t["company"] for t in response.json()] == ["Company 2", "Company 3"]
+
+    def test_invalid_filter_is_rejected(self, admin_headers):
+        """Test malformed filter values return 400"""
+        response = client.get("/api/v1/admin/trials", params={"status": "bogus"}, headers=admin_headers)
+        assert response.status_code == 400
+
+
+class TestAdminTrialSearch:
+    def test_search_matches_company_and_email(self, admin_headers):
+        """Test the search is a case-insensitive substring of company or email"""
+        make_lead("Acme Widgets", days_ago=1)
+        make_lead("Globex", days_ago=1, email="ops@acmeholdings.com")
+        make_lead("Initech", days_ago=1)
+
+        response = client.get("/api/v1/admin/trials", params={"q": "ACME"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert sorted(t["company"] for t in response.json()) == ["Acme Widgets", "Globex"]
+
+    def test_search_results_are_ranked(self, admin_headers):
+        """Test closer matches come first regardless of age"""
+        make_lead("Acme International Holdings", days_ago=1)
+        make_lead("Acme", days_ago=5)
+
+        response = client.get("/api/v1/admin/trials", params={"q": "acme"}, headers=admin_headers)
+        assert [t["company"] for t in response.json()] == ["Acme", "Acme International Holdings"]
+
+    def test_search_is_paginated_and_combined_with_filters(self, admin_headers):
+        """Test search results respect other filters and limit/offset"""
+        for days_ago in range(4):
+            make_lead(f"Acme {days_ago}", days_ago=days_ago, score=60)
+        make_lead("Acme Low", days_ago=1, score=10)
+
+        response = client.get(
+            "/api/v1/admin/trials",
+            params={"q": "acme", "score_min": 50, "limit": 2, "offset": 1},
+            headers=admin_headers,
+        )
+        assert [t["company"] for t in response.json()] == ["Acme 1", "Acme 2"]
+
+    def test_search_follows_renamed_leads(self, admin_headers):
+        """Test the index is updated when a lead is saved again"""
+        lead = make_lead("Initech", days_ago=1, email="team@example.com")
+        db.save_lead(lead.model_copy(update={"company_name": "Umbrella"}))
+
+        assert client.get("/api/v1/admin/trials", params={"q": "initech"}, headers=admin_headers).json() == []
+        assert len(client.get("/api/v1/admin/trials", params={"q": "umbrella"}, headers=admin_headers).json()) == 1
+
+
+class TestAdminTrialFacets:
+    def test_facet_counts(self, admin_headers):
+        """Test every facet is counted for the filtered trials"""
+        make_lead("Alpha Co", days_ago=1, score=85, states=["Delhi", "Gujarat"], status=LeadStatus.COMPLETED)
+        make_lead("Beta Co", days_ago=1, score=42, states=["Delhi"], status=LeadStatus.COMPLETED)
+        make_lead("Gamma Co", days_ago=1)
+
+        response = client.get("/api/v1/admin/trials/facets", headers=admin_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["total"] == 3
+        assert body["status"] == {"completed": 2, "started": 1}
+        assert body["rating"] == {"moderate": 2, "unrated": 1}
+        assert body["state"] == {"Delhi": 2, "Gujarat": 1}
+        assert body["score_band"] == {"80-89": 1, "40-49": 1, "unscored": 1}
+
+    def test_facets_follow_filters(self, admin_headers):
+        """Test facets are computed for the current filter set only"""
+        make_lead("Alpha Co", days_ago=1, score=100, states=["Delhi"])
+        make_lead("Beta Co", days_ago=1, score=20, states=["Delhi"])
+
+        response = client.get("/api/v1/admin/trials/facets", params={"score_min": 50}, headers=admin_headers)
+        body = response.json()
+        assert body["total"] == 1
+        assert body["score_band"] == {"90-100": 1}
+
+    def test_facets_are_cached(self, admin_headers):
+        """Test repeated requests for the same filters are served from cache"""
+        make_lead("Alpha Co", days_ago=1)
+        client.get("/api/v1/admin/trials/facets", headers=admin_headers)
+        make_lead("Beta Co", days_ago=1)
+
+        response = client.get("/api/v1/admin/trials/facets", headers=admin_headers)
+        assert response.json()["total"] == 1
+
+
+class TestAdminTrialsExport:
+    def test_export_streams_csv(self, admin_headers):
+        """Test the export returns every filtered trial as CSV"""
+        make_lead("Alpha Co", days_ago=1, score=80, states=["Delhi"])
+        make_lead("Beta Co", days_ago=2, score=30, states=["Delhi"])
+
+        response = client.get("/api/v1/admin/trials/export", params={"score_min": 50}, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][0] == "Email"
+        assert [row[1] for row in rows[1:]] == ["Alpha Co"]
+
+    def test_export_gzip(self, admin_headers):
+        """Test the export can be gzipped on the fly"""
+        make_lead("Alpha Co", days_ago=1)
+
+        response = client.get("/api/v1/admin/trials/export", params={"compress": "gzip"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        assert ".csv.gz" in response.headers["content-disposition"]
+
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode())))
+        assert [row[1] for row in rows[1:]] == ["Alpha Co"]
+
+    def test_export_is_written_in_chunks(self):
+        """Test rows are yielded in bounded chunks rather than one string"""
+        for days_ago in range(5):
+            make_lead(f"Company {days_ago}", days_ago=days_ago)
+
+        chunks = list(stream_trials_csv(chunk_rows=2))
+        assert len(chunks) == 3
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        assert len(rows) == 6
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_job_manager, "export_dir", str(tmp_path))
+    return tmp_path
+
+
+def wait_for_job(job_id: str, headers: dict) -> dict:
+    for _ in range(100):
+        job = client.get(f"/api/v1/admin/trials/export/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed", "expired"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("export job did not finish")
+
+
+class TestExportJobs:
+    def test_export_job_produces_gzip_csv(self, admin_headers, export_dir):
+        """Test an export job runs in the background and serves a gzip CSV"""
+        make_lead("Alpha Co", days_ago=1, score=80)
+        make_lead("Beta Co", days_ago=2, score=30)
+
+        response = client.post("/api/v1/admin/trials/export/jobs", params={"score_min": 50}, headers=admin_headers)
+        assert response.status_code == 202
+
+        job = wait_for_job(response.json()["id"], admin_headers)
+        assert job["status"] == "completed"
+        assert job["rows_written"] == job["total_rows"] == 1
+
+        download = client.get(f"/api/v1/admin/trials/export/jobs/{job['id']}/download", headers=admin_headers)
+        assert download.status_code == 200
+        rows = list(csv.reader(io.StringIO(gzip.decompress(download.content).decode())))
+        assert [row[1] for row in rows[1:]] == ["Alpha Co"]
+
+    def test_download_supports_ranges(self, admin_headers, export_dir):
+        """Test the artifact can be fetched in byte ranges"""
+        make_lead("Alpha Co", days_ago=1)
+        job_id = client.post("/api/v1/admin/trials/export/jobs", headers=admin_headers).json()["id"]
+        wait_for_job(job_id, admin_headers)
+
+        response = client.get(
+            f"/api/v1/admin/trials/export/jobs/{job_id}/download",
+            headers={**admin_headers, "Range": "bytes=0-9"},
+        )
+        assert response.status_code == 206
+        assert len(response.content) == 10
+
+    def test_identical_filters_reuse_job(self, admin_headers, export_dir):
+        """Test repeated requests for the same export share one artifact"""
+        first = client.post("/api/v1/admin/trials/export/jobs", params={"status": "started"}, headers=admin_headers).json()
+        second = client.post("/api/v1/admin/trials/export/jobs", params={"status": "started"}, headers=admin_headers).json()
+        other = client.post("/api/v1/admin/trials/export/jobs", params={"status": "completed"}, headers=admin_headers).json()
+
+        assert first["id"] == second["id"]
+        assert other["id"] != first["id"]
+
+    def test_expired_export_is_gone(self, admin_headers, export_dir, monkeypatch):
+        """Test artifacts are removed once their TTL has passed"""
+        monkeypatch.setattr(export_job_manager, "ttl_seconds", 0)
+        job_id = client.post("/api/v1/admin/trials/export/jobs", headers=admin_headers).json()["id"]
+        wait_for_job(job_id, admin_headers)
+
+        response = client.get(f"/api/v1/admin/trials/export/jobs/{job_id}/download", headers=admin_headers)
+        assert response.status_code == 410
+        assert not list(export_dir.glob("*.csv.gz"))
+
+    def test_parquet_export(self, admin_headers, export_dir):
+        """Test exports can be written as Parquet"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        make_lead("Alpha Co", days_ago=1, score=80, states=["Delhi"])
+
+        job_id = client.post("/api/v1/admin/trials/export/jobs", params={"format": "parquet"}, headers=admin_headers).json()["id"]
+        job = wait_for_job(job_id, admin_headers)
+        assert job["status"] == "completed"
+
+        table = pq.read_table(export_dir / f"{job_id}.parquet")
+        assert table.column("company").to_pylist() == ["Alpha Co"]
+        assert table.column("states").to_pylist() == [["Delhi"]]
+
+    def test_abandoned_job_is_not_reused(self, admin_headers, export_dir):
+        """Test a running job that missed its lease is failed instead of reused"""
+        stale = ExportJob(
+            id=uuid.uuid4().hex,
+            key=export_job_manager.job_key(None, ExportFormat.CSV_GZIP),
+            format=ExportFormat.CSV_GZIP,
+            status=ExportJobStatus.RUNNING,
+            created_at=datetime.now(),
+        )
+        export_job_manager._save(stale)
+        manifest = export_dir / f"{stale.id}.json"
+        stale.heartbeat_at = datetime.now() - timedelta(seconds=export_job_manager.lease_seconds + 1)
+        manifest.write_text(stale.model_dump_json())
+
+        job_id = client.post("/api/v1/admin/trials/export/jobs", headers=admin_headers).json()["id"]
+        assert job_id != stale.id
+        assert wait_for_job(job_id, admin_headers)["status"] == "completed"
+
+        abandoned = client.get(f"/api/v1/admin/trials/export/jobs/{stale.id}", headers=admin_headers).json()
+        assert abandoned["status"] == "failed"
+
+    def test_running_job_within_lease_is_reused(self, admin_headers, export_dir):
+        """Test a running job with a recent heartbeat is still shared"""
+        running = ExportJob(
+            id=uuid.uuid4().hex,
+            key=export_job_manager.job_key(None, ExportFormat.CSV_GZIP),
+            format=ExportFormat.CSV_GZIP,
+            status=ExportJobStatus.RUNNING,
+            created_at=datetime.now(),
+        )
+        export_job_manager._save(running)
+
+        job = client.post("/api/v1/admin/trials/export/jobs", headers=admin_headers).json()
+        assert job["id"] == running.id
+
+    def test_unavailable_format_is_bad_request(self, admin_headers, export_dir, monkeypatch):
+        """Test a missing Parquet writer is a 400 but other failures are a 500"""
+        monkeypatch.setattr(export_jobs, "PARQUET_AVAILABLE", False)
+        response = client.post("/api/v1/admin/trials/export/jobs", params={"format": "parquet"}, headers=admin_headers)
+        assert response.status_code == 400
+
+        def shut_down(*args, **kwargs):
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        monkeypatch.setattr(export_job_manager.executor, "submit", shut_down)
+        response = client.post("/api/v1/admin/trials/export/jobs", headers=admin_headers)
+        assert response.status_code == 500
+
+    def test_unknown_job(self, admin_headers, export_dir):
+        """Test unknown or malformed job ids return 404"""
+        response = client.get("/api/v1/admin/trials/export/jobs/../../etc/passwd", headers=admin_headers)
+        assert response.status_code == 404
+        response = client.get(f"/api/v1/admin/trials/export/jobs/{uuid.uuid4().hex}", headers=admin_headers)
+        assert response.status_code == 404
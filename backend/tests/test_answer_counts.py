@@ -0,0 +1,147 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.answer_counts import answer_segments, chosen_options
+from app.database import db
+from app.models import Answer
+from app.questions_data import CATALOG_VERSION, get_all_questions
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.answer_counts = {}
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.answer_counts = {}
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+def start_session(states, industry=None) -> str:
+    response = client.post("/api/v1/assessments/start", json={
+        "email": "jo@example.com",
+        "company_name": "Answer Co",
+        "industry": industry,
+        "employee_range": "10-50",
+        "operating_states": states,
+        "consent": True
+    })
+    return response.json()["id"]
+
+
+def submit(option_index: int, lead_id: str = None, industry: str = None):
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[min(option_index, len(q.options) - 1)].id, "score": 0}
+        for q in get_all_questions() if q.options
+    ]
+    response = client.post("/api/v1/assessments", json={
+        "company_name": "Answer Co",
+        "contact_name": "Jo",
+        "email": "jo@example.com",
+        "company_size": "10-50",
+        "industry": industry,
+        "answers": answers,
+        "lead_id": lead_id
+    })
+    assert response.status_code == 200
+
+
+class TestAnswerDistribution:
+    def test_shares_for_all_respondents(self, admin_headers):
+        """Test each option's share among all respondents of a question"""
+        submit(0)
+        submit(0)
+        submit(1)
+
+        response = client.get("/api/v1/admin/statistics/answers", params={"question_id": "q1"}, headers=admin_headers)
+        assert response.status_code == 200
+        [distribution] = response.json()
+        assert distribution["catalog_version"] == CATALOG_VERSION
+        assert distribution["total"] == 3
+        assert [(o["option_id"], o["count"]) for o in distribution["options"]] == [("q1_yes", 2), ("q1_no", 1), ("q1_not_sure", 0)]
+        assert distribution["options"][0]["share"] == pytest.approx(2 / 3)
+
+    def test_state_and_industry_segments(self, admin_headers):
+        """Test respondents are counted in each of their states and their industry"""
+        submit(0, lead_id=start_session(["Delhi", "Goa"], industry="Retail"))
+        submit(1, lead_id=start_session(["Delhi"]))
+
+        def totals(segment, value):
+            response = client.get(
+                "/api/v1/admin/statistics/answers",
+                params={"question_id": "q1", "segment": segment, "segment_value": value},
+                headers=admin_headers,
+            )
+            return {o["option_id"]: o["count"] for o in response.json()[0]["options"] if o["count"]}
+
+        assert totals("state", "Delhi") == {"q1_yes": 1, "q1_no": 1}
+        assert totals("state", "Goa") == {"q1_yes": 1}
+        assert totals("industry", "Retail") == {"q1_yes": 1}
+
+    def test_whole_catalog(self, admin_headers):
+        """Test omitting the question returns every question with options"""
+        submit(0)
+        response = client.get("/api/v1/admin/statistics/answers", headers=admin_headers)
+        assert len(response.json()) == len([q for q in get_all_questions() if q.options])
+        assert all(d["total"] == 1 for d in response.json())
+
+    def test_resubmission_counts_once(self):
+        """Test a rejected second submission of a session does not count its answers"""
+        lead_id = start_session(["Delhi"])
+        submit(0, lead_id=lead_id)
+        response = client.post("/api/v1/assessments", json={
+            "company_name": "Answer Co",
+            "contact_name": "Jo",
+            "email": "jo@example.com",
+            "company_size": "10-50",
+            "answers": [{"question_id": "q1", "answer_value": "q1_no", "score": 0}],
+            "lead_id": lead_id
+        })
+        assert response.status_code == 409
+        assert db.get_answer_counts(CATALOG_VERSION, ["q1"], ("", ""))["q1"] == {"q1_yes": 1}
+
+    def test_counts_outlive_data_deletion(self):
+        """Test deleting a respondent's data keeps the anonymous answer counts"""
+        submit(0, lead_id=start_session(["Delhi"]))
+        response = client.post("/api/v1/privacy/delete-my-data", json={"email": "jo@example.com"})
+        assert response.status_code == 200
+        assert not db.leads
+        assert db.get_answer_counts(CATALOG_VERSION, ["q1"], ("state", "Delhi"))["q1"] == {"q1_yes": 1}
+
+    def test_invalid_requests(self, admin_headers):
+        """Test unknown questions and half-given segments are rejected"""
+        response = client.get("/api/v1/admin/statistics/answers", params={"question_id": "nope"}, headers=admin_headers)
+        assert response.status_code == 404
+        response = client.get("/api/v1/admin/statistics/answers", params={"segment": "state"}, headers=admin_headers)
+        assert response.status_code == 400
+
+
+class TestAnswerCountKeys:
+    def test_unknown_options_are_ignored(self):
+        """Test only answers naming one of the question's options are counted"""
+        answers = [
+            Answer(question_id="q1", answer_value="q1_yes", score=10),
+            Answer(question_id="q1", answer_value="bogus", score=0),
+            Answer(question_id="missing", answer_value="x", score=0),
+        ]
+        assert chosen_options(answers) == [("q1", "q1_yes")]
+
+    def test_segments(self):
+        """Test a respondent's segments cover everyone, their states and industry"""
+        assert answer_segments(["Goa", "Delhi", "Goa"], "Tech") == [
+            ("", ""), ("state", "Delhi"), ("state", "Goa"), ("industry", "Tech")
+        ]
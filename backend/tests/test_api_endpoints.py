@@ -1,7 +1,8 @@
+import gzip
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime
-from app.main import app
+from app.main import app, accepts_gzip
 from app.database import db
 from app.models import (
     ComplianceCategory,
@@ -289,6 +290,55 @@ class TestAssessmentRetrieval:
         assessment = response.json()
         assert assessment["id"] == assessment_id
 
+    def test_get_assessment_returns_stored_json(self):
+        """Test the stored result is returned unchanged"""
+        questions = client.get("/api/v1/questions").json()
+        
+        answers = []
+        for question in questions:
+            if question["options"]:
+                answers.append({
+                    "question_id": question["id"],
+                    "answer_value": question["options"][-1]["id"],
+                    "score": question["options"][-1]["score"]
+                })
+        
+        submission = {
+            "company_name": "Test Company",
+            "contact_name": "John Doe",
+            "email": "john@example.com",
+            "company_size": "10-50",
+            "answers": answers
+        }
+        
+        created = client.post("/api/v1/assessments", json=submission).json()
+        
+        response = client.get(f"/api/v1/assessments/{created['id']}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == created
+
+    def test_gzip_follows_accept_encoding(self, monkeypatch):
+        """Test gzip-stored results are only sent compressed to clients accepting gzip"""
+        body = b'{"id": "abc"}'
+        monkeypatch.setattr(db, "get_assessment_json", lambda assessment_id: (gzip.compress(body), "gzip"))
+
+        for accept, compressed in (("gzip", True), ("br, gzip;q=0.5", True), ("gzip;q=0", False), ("*;q=0.1, gzip;q=0", False), ("identity", False)):
+            response = client.get("/api/v1/assessments/abc", headers={"Accept-Encoding": accept})
+            assert response.headers.get("content-encoding") == ("gzip" if compressed else None)
+            assert "Accept-Encoding" in response.headers["vary"]
+            assert response.content == body
+
+    def test_accepts_gzip(self):
+        """Test Accept-Encoding parsing honours q-values and wildcards"""
+        assert accepts_gzip("gzip, deflate")
+        assert accepts_gzip("*")
+        assert accepts_gzip("GZIP;Q=0.8")
+        assert not accepts_gzip("gzip;q=0")
+        assert not accepts_gzip("gzip;q=0.0, *")
+        assert not accepts_gzip("")
+        assert not accepts_gzip("deflate")
+
     def test_get_nonexistent_assessment(self):
         """Test retrieving non-existent assessment returns 404"""
         response = client.get("/api/v1/assessments/nonexistent-id")
@@ -0,0 +1,99 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.cache import LRUCache, CacheRegistry, PostgresInvalidationChannel
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+class TestLRUCache:
+    def test_hit_and_miss_are_counted(self):
+        """Test hits and misses feed the hit rate"""
+        cache = LRUCache("test", max_entries=4, ttl_seconds=60)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the cache stays bounded and evicts the coldest entry"""
+        cache = LRUCache("test", max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entries_are_not_returned(self, monkeypatch):
+        """Test entries older than the TTL count as misses"""
+        now = [1000.0]
+        monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+        cache = LRUCache("test", max_entries=4, ttl_seconds=10)
+        cache.set("a", 1)
+        now[0] += 11
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_stale_load_is_not_cached_after_invalidation(self):
+        """Test a value read before a concurrent write is discarded"""
+        cache = LRUCache("test", max_entries=4, ttl_seconds=60)
+        generation = cache.generation
+        cache.invalidate("a")
+        cache.set("a", "stale", generation)
+
+        assert cache.get("a") is None
+
+
+class TestInvalidationChannel:
+    def test_remote_message_invalidates_key(self):
+        """Test notifications from other workers drop the cached key"""
+        registry = CacheRegistry()
+        cache = registry.create("leads", 4, 60)
+        cache.set("lead-1", "cached")
+
+        channel = PostgresInvalidationChannel("postgresql://unused", registry)
+        channel.handle(json.dumps({"sender": "other-worker", "cache": "leads", "key": "lead-1"}))
+
+        assert cache.get("lead-1") is None
+
+    def test_own_messages_are_ignored(self):
+        """Test a worker does not re-invalidate its own writes"""
+        registry = CacheRegistry()
+        cache = registry.create("leads", 4, 60)
+        cache.set("lead-1", "cached")
+
+        channel = PostgresInvalidationChannel("postgresql://unused", registry)
+        channel.handle(channel.payload("leads", "lead-1"))
+
+        assert cache.get("lead-1") == "cached"
+
+
+class TestCacheStatsEndpoint:
+    def test_cache_stats_requires_auth(self):
+        """Test cache statistics are admin-only"""
+        response = client.get("/api/v1/admin/cache/stats")
+        assert response.status_code in (401, 403)
+
+    def test_cache_stats(self, admin_headers):
+        """Test cache statistics are reported"""
+        response = client.get("/api/v1/admin/cache/stats", headers=admin_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert "caches" in body
+        assert isinstance(body["caches"], list)
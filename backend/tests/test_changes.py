@@ -0,0 +1,110 @@
+import pytest
+import uuid
+from datetime import datetime
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.models import Lead, AuditLog, EmailStatus
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.change_log = []
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.change_log = []
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+def make_lead(company: str, email: str = "team@acme.com") -> Lead:
+    lead = Lead(
+        id=str(uuid.uuid4()),
+        company_name=company,
+        contact_name="",
+        email=email,
+        company_size="10-50",
+        submission_date=datetime.now(),
+    )
+    return db.save_lead(lead)
+
+
+class TestChangeFeed:
+    def test_changes_require_auth(self):
+        """Test the change feed is admin-only"""
+        response = client.get("/api/v1/changes")
+        assert response.status_code in (401, 403)
+
+    def test_upserts_carry_current_record(self, admin_headers):
+        """Test upserts are returned in order with the record's current state"""
+        lead = make_lead("Acme")
+        db.save_lead(lead.model_copy(update={"company_name": "Acme Corp"}))
+
+        response = client.get("/api/v1/changes", headers=admin_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert [(c["entity"], c["op"]) for c in body["changes"]] == [("lead", "upsert"), ("lead", "upsert")]
+        assert body["changes"][0]["seq"] < body["changes"][1]["seq"]
+        assert body["changes"][-1]["data"]["company_name"] == "Acme Corp"
+        assert body["has_more"] is False
+
+    def test_cursor_returns_only_the_delta(self, admin_headers):
+        """Test polling from the cursor returns only newer changes"""
+        make_lead("Acme")
+        cursor = client.get("/api/v1/changes", headers=admin_headers).json()["next_cursor"]
+
+        make_lead("Globex")
+        body = client.get("/api/v1/changes", params={"since": cursor}, headers=admin_headers).json()
+        assert [c["data"]["company_name"] for c in body["changes"]] == ["Globex"]
+
+        body = client.get("/api/v1/changes", params={"since": body["next_cursor"]}, headers=admin_headers).json()
+        assert body["changes"] == []
+
+    def test_changes_are_paged(self, admin_headers):
+        """Test limit pages through the feed"""
+        for i in range(5):
+            make_lead(f"Company {i}")
+
+        first = client.get("/api/v1/changes", params={"limit": 3}, headers=admin_headers).json()
+        assert len(first["changes"]) == 3
+        assert first["has_more"] is True
+
+        second = client.get("/api/v1/changes", params={"since": first["next_cursor"], "limit": 3}, headers=admin_headers).json()
+        assert len(second["changes"]) == 2
+        assert second["has_more"] is False
+
+    def test_privacy_deletion_leaves_tombstones(self, admin_headers):
+        """Test privacy deletions appear as tombstones without personal data"""
+        lead = make_lead("Acme", email="jo@acme.com")
+        db.save_audit_log(AuditLog(
+            id=str(uuid.uuid4()),
+            assessment_id=str(uuid.uuid4()),
+            company_name="Acme",
+            email="jo@acme.com",
+            score=50,
+            email_status=EmailStatus.SUCCESS,
+            attempts=1,
+            timestamp=datetime.now(),
+        ))
+        cursor = client.get("/api/v1/changes", headers=admin_headers).json()["next_cursor"]
+
+        client.post("/api/v1/privacy/delete-my-data", json={"email": "jo@acme.com"})
+
+        changes = client.get("/api/v1/changes", params={"since": cursor}, headers=admin_headers).json()["changes"]
+        assert {(c["entity"], c["op"]) for c in changes} == {("lead", "delete"), ("audit_log", "delete")}
+        assert all(c["data"] is None for c in changes)
+        assert lead.id in [c["entity_id"] for c in changes]
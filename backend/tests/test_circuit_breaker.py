@@ -0,0 +1,174 @@
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.circuit_breaker import BreakerState, CircuitBreaker
+from app.email_service import email_service
+from app.models import OutboxStatus
+from app.outbox import OutboxDispatcher
+from app.questions_data import get_all_questions
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.outbox = {}
+    email_service.breaker.reset()
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.outbox = {}
+    email_service.breaker.reset()
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = OutboxDispatcher(concurrency=5, poll_seconds=0.1, lease_seconds=60)
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+class FakeSES:
+    def __init__(self, error_code=None):
+        self.error_code = error_code
+        self.calls = 0
+
+    def send_email(self, **kwargs):
+        self.calls += 1
+        if self.error_code:
+            raise ClientError({"Error": {"Code": self.error_code, "Message": self.error_code}}, "SendEmail")
+        return {"MessageId": "1"}
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = {"window": 10, "min_calls": 4, "failure_rate": 0.5, "open_seconds": 60}
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def compute() -> None:
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    response = client.post("/api/v1/assessments/compute", json={
+        "company_name": "Breaker Co",
+        "contact_name": "Jo",
+        "email": "jo@example.com",
+        "company_size": "10-50",
+        "answers": answers
+    })
+    assert response.status_code == 200
+
+
+class TestCircuitBreaker:
+    def test_opens_at_failure_rate(self):
+        """Test the breaker opens once the window failure rate is reached"""
+        breaker = make_breaker()
+        for success in (True, False, True):
+            breaker.record(success)
+        assert breaker.state == BreakerState.CLOSED
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+        assert not breaker.allow()
+        assert breaker.capacity(4) == 0
+        assert breaker.stats()["rejected"] == 1
+
+    def test_needs_min_calls(self):
+        """Test a few early failures do not open the breaker"""
+        breaker = make_breaker()
+        for _ in range(3):
+            breaker.record(False)
+        assert breaker.state == BreakerState.CLOSED
+
+    def test_half_open_probe_closes(self):
+        """Test one probe is let through after the open period and success closes the breaker"""
+        breaker = make_breaker(open_seconds=0)
+        for _ in range(4):
+            breaker.record(False)
+        assert breaker.state == BreakerState.HALF_OPEN
+        assert breaker.capacity(4) == 1
+        assert breaker.allow()
+        assert not breaker.allow()
+        assert breaker.capacity(4) == 0
+
+        breaker.record(True)
+        assert breaker.state == BreakerState.CLOSED
+        assert breaker.stats()["window_calls"] == 0
+
+    def test_failed_probe_reopens(self):
+        """Test a failed probe opens the breaker again"""
+        breaker = make_breaker(open_seconds=0)
+        for _ in range(4):
+            breaker.record(False)
+        assert breaker.allow()
+        breaker.open_seconds = 60
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+        assert breaker.times_opened == 2
+
+
+class TestEmailBreaker:
+    def test_provider_errors_open_breaker(self, monkeypatch, dispatcher):
+        """Test throttling opens the breaker and queued mail then waits without SES calls"""
+        ses = FakeSES("Throttling")
+        monkeypatch.setattr(email_service, "ses_client", ses)
+        for _ in range(6):
+            compute()
+
+        assert dispatcher.dispatch_once() == 5
+        assert email_service.breaker.state == BreakerState.OPEN
+        for message in db.outbox.values():
+            message.next_attempt_at = message.created_at
+        assert dispatcher.dispatch_once() == 0
+        assert ses.calls == 5
+        assert [m.attempts for m in db.outbox.values()].count(0) == 1
+
+    def test_rejected_message_does_not_count(self, monkeypatch, dispatcher):
+        """Test message-level SES errors leave the breaker closed"""
+        monkeypatch.setattr(email_service, "ses_client", FakeSES("MessageRejected"))
+        for _ in range(5):
+            compute()
+        dispatcher.dispatch_once()
+        dispatcher.dispatch_once()
+        assert email_service.breaker.state == BreakerState.CLOSED
+
+    def test_probe_recovers(self, monkeypatch, dispatcher):
+        """Test a successful half-open probe lets the rest of the queue through"""
+        monkeypatch.setattr(email_service, "ses_client", FakeSES())
+        monkeypatch.setattr(email_service.breaker, "open_seconds", 0)
+        for _ in range(5):
+            email_service.breaker.record(False)
+        for _ in range(3):
+            compute()
+
+        assert dispatcher.dispatch_once() == 1
+        assert email_service.breaker.state == BreakerState.CLOSED
+        assert dispatcher.dispatch_once() == 2
+        assert all(m.status == OutboxStatus.SENT for m in db.outbox.values())
+
+    def test_stats_endpoint(self, admin_headers):
+        """Test breaker state is exposed to admins"""
+        for _ in range(5):
+            email_service.breaker.record(False)
+        response = client.get("/api/v1/admin/email/stats", headers=admin_headers)
+        assert response.status_code == 200
+        stats = response.json()["circuit_breaker"]
+        assert stats["state"] == "open"
+        assert stats["window_failure_rate"] == 1.0
+        assert stats["times_opened"] >= 1
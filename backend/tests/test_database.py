@@ -0,0 +1,58 @@
+import gzip
+from datetime import datetime
+from app.database import encode_result_json, decode_result_json, parse_uuid
+from app.models import AssessmentResult, CategoryScore, ComplianceCategory, RiskLevel
+
+
+def make_result(issue_count: int = 1) -> AssessmentResult:
+    return AssessmentResult(
+        id="result-1",
+        submission_date=datetime(2024, 1, 15, 10, 30),
+        company_name="Test Company",
+        contact_name="John Doe",
+        email="john@example.com",
+        overall_score=55,
+        max_score=100,
+        overall_percentage=55.0,
+        overall_risk_level=RiskLevel.MODERATE,
+        category_scores=[
+            CategoryScore(
+                category=ComplianceCategory.REGISTRATION,
+                score=20,
+                max_score=40,
+                percentage=50.0,
+                risk_level=RiskLevel.MODERATE,
+                issues=[f"Issue {i}" for i in range(issue_count)],
+                recommendations=["Register"],
+            )
+        ],
+        priority_actions=["Act"],
+    )
+
+
+class TestResultJsonEncoding:
+    def test_small_results_are_stored_uncompressed(self):
+        """Test small payloads skip compression"""
+        result = make_result()
+        body, encoding = encode_result_json(result)
+        assert encoding == "identity"
+        assert AssessmentResult.model_validate_json(body) == result
+
+    def test_large_results_are_gzipped(self):
+        """Test large payloads are compressed and round-trip"""
+        result = make_result(issue_count=100)
+        body, encoding = encode_result_json(result)
+        assert encoding == "gzip"
+        assert gzip.decompress(body) == result.model_dump_json().encode()
+        assert AssessmentResult.model_validate_json(decode_result_json(body, encoding)) == result
+
+
+class TestParseUuid:
+    def test_valid_uuid(self):
+        """Test UUID text parses to a native UUID"""
+        value = "12e11448-31e1-435d-b284-a389ce7d78d7"
+        assert str(parse_uuid(value)) == value
+
+    def test_invalid_uuid_is_not_found(self):
+        """Test ids that are not UUIDs map to None instead of raising"""
+        assert parse_uuid("nonexistent-id") is None
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+from app.assessment_service import calculate_assessment_result
+from app.email_service import email_service
+from app.email_templates import EMAIL_TEMPLATES, EmailTemplates, TEMPLATES_DIR
+from app.models import AssessmentSubmission, AuditLog, EmailStatus
+from app.questions_data import get_all_questions
+
+
+def make_assessment(company_name: str = "Acme <Labs> & Co"):
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    return calculate_assessment_result(AssessmentSubmission(
+        company_name=company_name, contact_name="Jo", email="jo@example.com", company_size="10-50", answers=answers
+    ))
+
+
+class TestEmailTemplates:
+    def test_templates_are_compiled_at_startup(self):
+        """Test every email template is loaded when the service is created"""
+        assert set(email_service.templates.templates) == set(EMAIL_TEMPLATES)
+
+    def test_bytecode_cache(self, tmp_path):
+        """Test compiled templates are written to the bytecode cache"""
+        EmailTemplates(TEMPLATES_DIR, str(tmp_path))
+        assert len(os.listdir(tmp_path)) == len(EMAIL_TEMPLATES)
+
+    def test_plain_text_notification(self):
+        """Test the plain-text notification is rendered from its template without escaping"""
+        assessment = make_assessment()
+        body = email_service._format_email_body(assessment)
+        assert "- Company Name: Acme <Labs> & Co" in body
+        assert "- Company Size: N/A" in body
+        assert f"- Overall Score: {assessment.overall_percentage:.1f}%" in body
+        assert f"- Risk Level: {assessment.overall_risk_level.value.upper()}" in body
+        assert f"1. {assessment.priority_actions[0]}" in body
+        assert body.endswith(f"Assessment ID: {assessment.id}\n")
+
+    def test_html_is_autoescaped(self):
+        """Test user-supplied values are escaped in HTML emails"""
+        audit_log = AuditLog(
+            id="a1", assessment_id="x1", company_name="<script>alert(1)</script>", email="jo@example.com",
+            score=72.0, email_status=EmailStatus.PENDING, attempts=0, timestamp=datetime.now()
+        )
+        body = email_service.build_notification_batch([audit_log]).body
+        assert "<script>" not in body
+        assert "&lt;script&gt;" in body
@@ -0,0 +1,192 @@
+import pytest
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.funnel import ANSWERED, COMPLETED, DROP_OFF, STARTED, funnel_delta, session_funnel
+from app.models import LeadStatus
+from app.sketches import TDigest
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.funnel_counters = {}
+    db.completion_times = TDigest()
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.funnel_counters = {}
+    db.completion_times = TDigest()
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def questions():
+    return [q for q in client.get("/api/v1/questions").json() if q["options"]]
+
+
+def start_session(email: str = "jo@example.com") -> str:
+    response = client.post("/api/v1/assessments/start", json={
+        "email": email,
+        "company_name": "Funnel Co",
+        "employee_range": "10-50",
+        "operating_states": ["NSW"],
+        "consent": True
+    })
+    return response.json()["id"]
+
+
+def answer(lead_id: str, question: dict) -> None:
+    response = client.post("/api/v1/assessments/answer", json={
+        "assessment_id": lead_id,
+        "question_id": question["id"],
+        "answer_value": question["options"][0]["id"]
+    })
+    assert response.status_code == 200
+
+
+def submit(questions: list, lead_id: str = None):
+    return client.post("/api/v1/assessments", json={
+        "company_name": "Funnel Co",
+        "contact_name": "Jo",
+        "email": "jo@example.com",
+        "company_size": "10-50",
+        "answers": [
+            {"question_id": q["id"], "answer_value": q["options"][0]["id"], "score": q["options"][0]["score"]}
+            for q in questions
+        ],
+        "lead_id": lead_id
+    })
+
+
+class TestFunnelCounters:
+    def test_funnel_steps(self, admin_headers, questions):
+        """Test started, answered, drop-off and completed counts follow the sessions"""
+        first = start_session()
+        answer(first, questions[0])
+        answer(first, questions[1])
+        second = start_session()
+        answer(second, questions[0])
+        start_session()
+
+        funnel = client.get("/api/v1/admin/statistics/funnel", headers=admin_headers).json()
+        assert funnel["started"] == 3
+        assert funnel["answered_at_least"] == {"1": 2, "2": 1}
+        assert funnel["drop_off"] == {questions[0]["id"]: 1, questions[1]["id"]: 1}
+        assert funnel["completed"] == 0
+
+        assert submit(questions, lead_id=first).status_code == 200
+        funnel = client.get("/api/v1/admin/statistics/funnel", headers=admin_headers).json()
+        assert funnel["completed"] == 1
+        assert funnel["completion_rate"] == pytest.approx(1 / 3)
+        assert funnel["drop_off"] == {questions[0]["id"]: 1}
+        assert funnel["median_seconds_to_complete"] >= 0
+
+    def test_reanswering_does_not_count_twice(self, questions):
+        """Test changing an answer leaves the counters unchanged"""
+        lead_id = start_session()
+        answer(lead_id, questions[0])
+        answer(lead_id, questions[0])
+        assert db.get_funnel_counters() == {(STARTED, ""): 1, (ANSWERED, "1"): 1, (DROP_OFF, questions[0]["id"]): 1}
+
+    def test_completion_reuses_started_lead(self, questions):
+        """Test a submission with lead_id completes that lead instead of adding one"""
+        lead_id = start_session()
+        result = submit(questions, lead_id=lead_id).json()
+        assert result["id"] == lead_id
+        assert len(db.leads) == 1
+        assert db.get_lead(lead_id).status == LeadStatus.COMPLETED
+        assert db.get_funnel_counters()[(COMPLETED, "")] == 1
+
+    def test_completed_lead_is_not_resubmitted(self, questions):
+        """Test a lead_id whose session is already completed is rejected"""
+        lead_id = start_session()
+        first = submit(questions, lead_id=lead_id).json()
+        sketched = db.get_score_sketches()["overall"].count
+        response = submit(questions, lead_id=lead_id)
+        assert response.status_code == 409
+        assert db.get_assessment(lead_id).submission_date.isoformat() == first["submission_date"]
+        assert db.get_funnel_counters()[(COMPLETED, "")] == 1
+        assert db.get_completion_times().count == 1
+        assert db.get_score_sketches()["overall"].count == sketched
+
+    def test_lead_id_of_another_email(self, questions):
+        """Test a lead_id started with a different email is rejected"""
+        lead_id = start_session(email="sam@example.com")
+        assert submit(questions, lead_id=lead_id).status_code == 409
+        assert db.get_lead(lead_id).status == LeadStatus.STARTED
+        assert db.get_assessment(lead_id) is None
+
+    def test_completed_lead_matches_assessment(self, questions):
+        """Test the completed lead carries the submission's identity like its assessment"""
+        lead_id = start_session(email="Jo@Example.com")
+        result = submit(questions, lead_id=lead_id).json()
+        lead = db.get_lead(lead_id)
+        assert (lead.company_name, lead.contact_name, lead.email) == (result["company_name"], result["contact_name"], result["email"])
+
+    def test_unknown_lead_id(self, questions):
+        """Test submitting with an unknown lead_id returns 404"""
+        assert submit(questions, lead_id="missing").status_code == 404
+
+    def test_direct_submission_counts_as_started_and_completed(self, questions):
+        """Test submissions without a start session count at both ends without a duration"""
+        submit(questions)
+        assert db.get_funnel_counters() == {(STARTED, ""): 1, (COMPLETED, ""): 1}
+        assert db.get_completion_times().count == 0
+
+    def test_delete_removes_contribution(self, questions):
+        """Test deleting a lead removes its session from the funnel"""
+        lead_id = start_session()
+        answer(lead_id, questions[0])
+        db.delete_lead(lead_id)
+        assert db.get_funnel_counters() == {}
+        assert db.get_in_progress_assessment(lead_id) is None
+
+    def test_rebuild_matches_incremental_counters(self, questions):
+        """Test rebuilding from source records gives the incrementally kept counters"""
+        first = start_session()
+        answer(first, questions[0])
+        answer(first, questions[1])
+        second = start_session()
+        answer(second, questions[0])
+        submit(questions, lead_id=second)
+        db.assessments[second] = db.assessments[second].model_copy(
+            update={"submission_date": db.leads[second].submission_date + timedelta(minutes=5)}
+        )
+
+        incremental = db.get_funnel_counters()
+        db.rebuild_funnel()
+        assert db.get_funnel_counters() == incremental
+        assert db.get_completion_times().quantile(0.5) == 300.0
+
+
+class TestSessionFunnel:
+    def test_next_answer_moves_drop_off(self):
+        """Test answering one more question touches only the changed keys"""
+        before = session_funnel(LeadStatus.STARTED, ["q1"])
+        after = session_funnel(LeadStatus.STARTED, ["q1", "q2"])
+        assert funnel_delta(before, after) == {(ANSWERED, "2"): 1, (DROP_OFF, "q2"): 1, (DROP_OFF, "q1"): -1}
+
+    def test_completion_clears_drop_off(self):
+        """Test completing a session replaces its drop-off with a completion"""
+        answers = ["q1", "q2"]
+        delta = funnel_delta(session_funnel(LeadStatus.STARTED, answers), session_funnel(LeadStatus.COMPLETED, answers))
+        assert delta == {(COMPLETED, ""): 1, (DROP_OFF, "q2"): -1}
+
+    def test_session_without_lead(self):
+        """Test answers without a lead contribute nothing"""
+        assert session_funnel(None, ["q1"]) == {}
@@ -0,0 +1,301 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.email_service import email_service
+from app.models import EmailStatus, OutboxKind, OutboxStatus
+from app.outbox import OutboxDispatcher
+from app.questions_data import get_all_questions
+from app.statistics_service import statistics_service
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.outbox = {}
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.outbox = {}
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = OutboxDispatcher(
+        concurrency=2, poll_seconds=0.1, lease_seconds=60,
+        retry_base_seconds=30, retry_max_seconds=3600, max_age_seconds=86400
+    )
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def compute() -> dict:
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    response = client.post("/api/v1/assessments/compute", json={
+        "company_name": "Outbox Co",
+        "contact_name": "Jo",
+        "email": "jo@example.com",
+        "company_size": "10-50",
+        "answers": answers
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def only_message():
+    [message] = db.outbox.values()
+    return db.get_outbox_message(message.id)
+
+
+class TestOutboxEnqueue:
+    def test_compute_queues_notification(self, monkeypatch):
+        """Test /compute stores the email in the outbox instead of sending it"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: pytest.fail("sent inline"))
+        compute()
+
+        message = only_message()
+        assert message.status == OutboxStatus.PENDING
+        assert "Outbox Co" in message.subject
+        [audit_log] = db.get_all_audit_logs()
+        assert audit_log.id == message.audit_log_id
+        assert audit_log.email_status == EmailStatus.PENDING
+        assert audit_log.attempts == 0
+
+
+class TestOutboxDispatcher:
+    def test_successful_delivery(self, monkeypatch, dispatcher):
+        """Test a delivered message is marked sent and its audit log succeeds"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: (True, None))
+        compute()
+
+        assert dispatcher.dispatch_once() == 1
+        message = only_message()
+        assert message.status == OutboxStatus.SENT
+        assert db.get_audit_log(message.audit_log_id).email_status == EmailStatus.SUCCESS
+        assert dispatcher.dispatch_once() == 0
+
+    def test_failed_delivery_is_rescheduled(self, monkeypatch, dispatcher):
+        """Test a failed attempt stays pending until its backoff has passed"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: (False, "SES Error: throttled"))
+        compute()
+
+        dispatcher.dispatch_once()
+        message = only_message()
+        assert message.status == OutboxStatus.PENDING
+        assert message.next_attempt_at > datetime.now()
+        assert dispatcher.dispatch_once() == 0
+        audit_log = db.get_audit_log(message.audit_log_id)
+        assert audit_log.email_status == EmailStatus.PENDING
+        assert audit_log.error_message == "SES Error: throttled"
+
+    def test_gives_up_after_max_age(self, monkeypatch, dispatcher):
+        """Test a message whose next retry would fall past its max age fails for good"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: (False, "SES Error: throttled"))
+        compute()
+        message = only_message()
+        db.outbox[message.id].created_at = datetime.now() - timedelta(hours=24)
+
+        dispatcher.dispatch_once()
+        message = only_message()
+        assert message.status == OutboxStatus.FAILED
+        audit_log = db.get_audit_log(message.audit_log_id)
+        assert audit_log.email_status == EmailStatus.FAILED
+        assert audit_log.attempts == 1
+
+    def test_expired_lease_is_reclaimed(self, monkeypatch, dispatcher):
+        """Test a message left in flight by a dead worker is sent again"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: (True, None))
+        compute()
+        [claimed] = db.claim_outbox(1, lease_seconds=60)
+        assert dispatcher.dispatch_once() == 0
+
+        db.outbox[claimed.id].locked_until = datetime.now() - timedelta(seconds=1)
+        assert dispatcher.dispatch_once() == 1
+        assert only_message().attempts == 2
+
+    def test_concurrency_is_bounded(self, monkeypatch, dispatcher):
+        """Test no more than `concurrency` sends run at once"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def deliver(message):
+            with lock:
+                active.append(message.id)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(message.id)
+            return True, None
+
+        monkeypatch.setattr(email_service, "deliver", deliver)
+        for _ in range(5):
+            compute()
+
+        dispatcher.start()
+        deadline = time.time() + 5
+        while any(m.status != OutboxStatus.SENT for m in db.outbox.values()) and time.time() < deadline:
+            time.sleep(0.02)
+        assert all(m.status == OutboxStatus.SENT for m in db.outbox.values())
+        assert max(peak) <= 2
+
+
+class TestRetrySchedule:
+    def make_message(self, attempts: int, created_at: datetime = None):
+        compute()
+        message = only_message()
+        return message.model_copy(update={"attempts": attempts, "created_at": created_at or datetime.now()})
+
+    @pytest.mark.parametrize("attempts,delay", [(1, 30), (2, 60), (5, 480), (20, 3600)])
+    def test_backoff_is_jittered_and_capped(self, dispatcher, attempts, delay):
+        """Test the delay doubles per attempt, is capped, and falls in its upper half"""
+        message = self.make_message(attempts)
+        for _ in range(20):
+            wait = (dispatcher.retry_at(message) - datetime.now()).total_seconds()
+            assert delay / 2 - 1 <= wait <= delay
+
+    def test_expires_at_overrides_max_age(self, dispatcher):
+        """Test a requeued message retries within its renewed window even when old"""
+        message = self.make_message(1, created_at=datetime.now() - timedelta(days=3))
+        assert dispatcher.retry_at(message) is None
+        renewed = message.model_copy(update={"expires_at": datetime.now() + timedelta(hours=1)})
+        assert dispatcher.retry_at(renewed) is not None
+
+
+class TestRequeue:
+    def fail_all(self, monkeypatch, dispatcher):
+        monkeypatch.setattr(email_service, "deliver", lambda message: (False, "SES Error: outage"))
+        for message in db.outbox.values():
+            message.created_at = datetime.now() - timedelta(hours=24)
+        while dispatcher.dispatch_once():
+            pass
+
+    def test_requeue_endpoint(self, monkeypatch, dispatcher, admin_headers):
+        """Test failed messages are made due again with a fresh window and then delivered"""
+        compute()
+        compute()
+        self.fail_all(monkeypatch, dispatcher)
+        assert all(m.status == OutboxStatus.FAILED for m in db.outbox.values())
+
+        response = client.post("/api/v1/admin/outbox/requeue", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json() == {"requeued": 2}
+        for message in db.outbox.values():
+            assert message.status == OutboxStatus.PENDING
+            assert message.expires_at > datetime.now() + timedelta(hours=23)
+            assert db.get_audit_log(message.audit_log_id).email_status == EmailStatus.PENDING
+
+        monkeypatch.setattr(email_service, "deliver", lambda message: (True, None))
+        assert dispatcher.dispatch_once() == 2
+        assert all(m.status == OutboxStatus.SENT for m in db.outbox.values())
+
+    def test_requeue_filters(self, monkeypatch, dispatcher, admin_headers):
+        """Test kind, created_since and limit narrow the requeued messages"""
+        compute()
+        compute()
+        self.fail_all(monkeypatch, dispatcher)
+
+        response = client.post("/api/v1/admin/outbox/requeue", params={"kind": "digest"}, headers=admin_headers)
+        assert response.json() == {"requeued": 0}
+        since = (datetime.now() - timedelta(hours=1)).isoformat()
+        response = client.post("/api/v1/admin/outbox/requeue", params={"created_since": since}, headers=admin_headers)
+        assert response.json() == {"requeued": 0}
+        response = client.post("/api/v1/admin/outbox/requeue", params={"limit": 1}, headers=admin_headers)
+        assert response.json() == {"requeued": 1}
+        response = client.post("/api/v1/admin/outbox/requeue", params={"limit": 0}, headers=admin_headers)
+        assert response.status_code == 422
+
+
+class TestDigestOutbox:
+    def test_digest_is_queued(self, monkeypatch):
+        """Test the weekly digest goes through the outbox instead of sending inline"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: pytest.fail("sent inline"))
+        success, error = email_service.send_weekly_digest(statistics_service.get_weekly_statistics())
+        assert success and error is None
+
+        message = only_message()
+        assert message.kind == OutboxKind.DIGEST
+        assert message.html
+        assert message.audit_log_id is None
+
+
+class TestCoalescing:
+    @pytest.fixture
+    def coalescing(self, monkeypatch):
+        monkeypatch.setattr(email_service, "coalesce_seconds", 300)
+        monkeypatch.setattr(email_service, "coalesce_max", 3)
+        sent = []
+        monkeypatch.setattr(email_service, "deliver", lambda message: (sent.append(message), (True, None))[1])
+        return sent
+
+    def test_full_batch_is_sent_as_one_email(self, coalescing, dispatcher):
+        """Test notifications are held until the batch fills, then sent as one summary"""
+        compute()
+        compute()
+        assert dispatcher.dispatch_once() == 0
+        assert all(m.status == OutboxStatus.BUFFERED for m in db.outbox.values())
+
+        compute()
+        assert dispatcher.dispatch_once() == 1
+        [batch] = coalescing
+        assert batch.kind == OutboxKind.NOTIFICATION_BATCH
+        assert batch.subject.startswith("3 New Compliance Checks")
+        assert batch.body.count("Outbox Co") == 3
+
+        members = [m for m in db.outbox.values() if m.kind == OutboxKind.NOTIFICATION]
+        assert all(m.status == OutboxStatus.BATCHED and m.batch_id == batch.id for m in members)
+        for audit_log in db.get_all_audit_logs():
+            assert audit_log.batch_id == batch.id
+            assert audit_log.email_status == EmailStatus.SUCCESS
+            assert audit_log.attempts == 1
+
+    def test_window_flushes_partial_batch(self, coalescing, dispatcher):
+        """Test a partial batch is sent once its oldest notification has waited for the window"""
+        compute()
+        assert dispatcher.dispatch_once() == 0
+        for message in db.outbox.values():
+            message.created_at -= timedelta(minutes=5)
+        assert dispatcher.dispatch_once() == 1
+        assert coalescing[0].subject.startswith("1 New Compliance Check –")
+
+    def test_failed_batch_updates_members(self, monkeypatch, coalescing, dispatcher):
+        """Test a failed batch send is reported on every member audit log and can be requeued"""
+        monkeypatch.setattr(email_service, "deliver", lambda message: (False, "SES Error: outage"))
+        for _ in range(3):
+            compute()
+        dispatcher.coalesce()
+        [batch] = [m for m in db.outbox.values() if m.kind == OutboxKind.NOTIFICATION_BATCH]
+        db.outbox[batch.id].created_at -= timedelta(hours=24)
+        dispatcher.dispatch_once()
+        assert all(a.email_status == EmailStatus.FAILED for a in db.get_all_audit_logs())
+
+        assert dispatcher.requeue_failed() == 1
+        assert all(a.email_status == EmailStatus.PENDING for a in db.get_all_audit_logs())
+
+    def test_buffer_is_flushed_when_coalescing_is_switched_off(self, monkeypatch, coalescing, dispatcher):
+        """Test notifications buffered before coalescing was disabled still go out"""
+        compute()
+        monkeypatch.setattr(email_service, "coalesce_seconds", 0)
+        compute()
+        assert dispatcher.dispatch_once() == 2
+        assert sorted(m.kind.value for m in coalescing) == ["notification", "notification_batch"]
@@ -0,0 +1,141 @@
+import asyncio
+import subprocess
+import sys
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.pdf_pool import PDFPoolBusy, PDFRenderPool, PDFRenderTimeout, pdf_render_pool
+from app.questions_data import get_all_questions
+from app.report_cache import report_cache
+
+client = TestClient(app)
+
+
+def write_pdf(assessment_json: str, output_path: str, operating_states=None) -> str:
+    with open(output_path, "wb") as f:
+        f.write(b"%PDF-1.7 " + str(len(assessment_json)).encode())
+    return output_path
+
+
+def slow_render(assessment_json: str, output_path: str, operating_states=None) -> str:
+    time.sleep(float(output_path))
+    return output_path
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.audit_logs = {}
+    db.outbox = {}
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.audit_logs = {}
+    db.outbox = {}
+
+
+@pytest.fixture
+def assessment():
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    response = client.post("/api/v1/assessments", json={
+        "company_name": "Report Co",
+        "contact_name": "Jo",
+        "email": "jo@example.com",
+        "company_size": "10-50",
+        "answers": answers
+    })
+    return db.get_assessment(response.json()["id"])
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**options):
+        pool = PDFRenderPool(**options)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+class TestPDFRenderPool:
+    async def test_render_in_pool_process(self, make_pool, assessment, tmp_path):
+        """Test a report is rendered by a pool process"""
+        pool = make_pool(processes=1, render_fn=write_pdf)
+        path = await pool.render(assessment, str(tmp_path / "report.pdf"))
+        with open(path, "rb") as f:
+            assert f.read().startswith(b"%PDF")
+        assert pool.stats()["completed"] == 1
+
+    async def test_timeout_restarts_pool(self, make_pool, assessment):
+        """Test a render past the deadline fails and its process is replaced"""
+        pool = make_pool(processes=1, timeout_seconds=2, render_fn=slow_render)
+        # Warm the pool so the deadline is spent rendering, not spawning
+        await pool.render(assessment, "0")
+        with pytest.raises(PDFRenderTimeout):
+            await pool.render(assessment, "30")
+        assert pool.stats()["restarts"] == 1
+        assert await pool.render(assessment, "0") == "0"
+
+    async def test_queue_is_bounded(self, make_pool, assessment):
+        """Test renders beyond the processes plus queue size are turned away"""
+        pool = make_pool(processes=1, queue_size=1, render_fn=slow_render)
+        running = [asyncio.create_task(pool.render(assessment, "1")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PDFPoolBusy):
+            await pool.render(assessment, "0")
+        assert await asyncio.gather(*running) == ["1", "1"]
+        assert pool.stats()["rejected"] == 1
+
+    async def test_cancel_queued_render(self, make_pool, assessment):
+        """Test cancelling a caller frees its place in the queue"""
+        pool = make_pool(processes=1, queue_size=4, render_fn=slow_render)
+        task = asyncio.create_task(pool.render(assessment, "1"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert pool.stats()["cancelled"] == 1
+        assert pool.stats()["jobs"] == 0
+
+
+class TestReportEndpoint:
+    def test_web_process_does_not_import_weasyprint(self):
+        """Test importing the app leaves WeasyPrint to the render processes"""
+        code = "import sys, app.main; print('weasyprint' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        assert output.strip().endswith("False")
+
+    def test_report_is_rendered_off_loop(self, monkeypatch, assessment, tmp_path):
+        """Test the report endpoint returns the PDF rendered by the pool"""
+        async def render(result, output_path=None, operating_states=None):
+            return write_pdf(result.model_dump_json(), output_path)
+
+        monkeypatch.setattr(report_cache, "cache_dir", str(tmp_path))
+        monkeypatch.setattr(pdf_render_pool, "available", True)
+        monkeypatch.setattr(pdf_render_pool, "render", render)
+        response = client.post(f"/api/v1/reports/generate?assessment_id={assessment.id}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.content.startswith(b"%PDF")
+
+    def test_busy_pool_returns_503(self, monkeypatch, assessment):
+        """Test a full render queue asks the client to retry"""
+        async def render(result, output_path=None, operating_states=None):
+            raise PDFPoolBusy("Too many PDF reports are being generated")
+
+        monkeypatch.setattr(pdf_render_pool, "available", True)
+        monkeypatch.setattr(pdf_render_pool, "render", render)
+        response = client.post(f"/api/v1/reports/generate?assessment_id={assessment.id}")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
@@ -0,0 +1,75 @@
+from datetime import datetime
+from app.assessment_service import calculate_assessment_result
+from app.models import AssessmentSubmission
+from app.pdf_service import generate_html_report, get_logo_base64
+from app.questions_data import get_all_questions
+from app.report_cache import report_key
+from app.state_compliance import STATE_COMPLIANCE, get_state_compliance
+
+
+def make_assessment(company_name: str = "Acme Labs"):
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    return calculate_assessment_result(AssessmentSubmission(
+        company_name=company_name, contact_name="Jo", email="jo@example.com", company_size="10-50", answers=answers
+    ))
+
+
+class TestStateCompliance:
+    def test_states_match_codes_and_names(self):
+        """Test operating states are matched by frontend code or full name"""
+        assert [state.name for state in get_state_compliance(["KA", "delhi"])] == ["Karnataka", "Delhi"]
+
+    def test_no_states_lists_every_state(self):
+        """Test a lead without operating states gets the full annexure"""
+        assert get_state_compliance(None) == STATE_COMPLIANCE
+        assert get_state_compliance([]) == STATE_COMPLIANCE
+
+    def test_uncovered_states(self):
+        """Test states without references produce an empty list"""
+        assert get_state_compliance(["KL"]) == []
+
+
+class TestReportHTML:
+    def test_annexure_lists_operating_states(self):
+        """Test the annexure only covers the lead's operating states"""
+        html = generate_html_report(make_assessment(), ["MH"])
+        assert "<h4>Maharashtra</h4>" in html
+        assert "<h4>Karnataka</h4>" not in html
+        assert "Goods and Services Tax (GST)" in html
+
+    def test_annexure_without_references(self):
+        """Test states without references get a note instead of an empty section"""
+        html = generate_html_report(make_assessment(), ["KL"])
+        assert not any(f"<h4>{state.name}</h4>" in html for state in STATE_COMPLIANCE)
+        assert "We do not yet have state-specific references" in html
+
+    def test_user_input_is_escaped(self):
+        """Test values entered by the user are escaped in the report"""
+        html = generate_html_report(make_assessment("<b>Acme</b> & Co"))
+        assert "<b>Acme</b>" not in html
+        assert "&lt;b&gt;Acme&lt;/b&gt; &amp; Co" in html
+
+    def test_report_is_dated_by_its_assessment(self):
+        """Test the report date is the submission date, so cached renders stay current"""
+        assessment = make_assessment().model_copy(update={"submission_date": datetime(2024, 3, 5, 10, 30)})
+        html = generate_html_report(assessment)
+        assert "Assessment completed on <strong>March 05, 2024</strong>" in html
+        assert generate_html_report(assessment) == html
+
+    def test_logo_is_loaded_once(self):
+        """Test the logo data URI is read from disk once per process"""
+        get_logo_base64.cache_clear()
+        generate_html_report(make_assessment())
+        generate_html_report(make_assessment())
+        info = get_logo_base64.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
+        assert get_logo_base64().startswith("data:image/png;base64,")
+
+    def test_report_key_follows_listed_states(self):
+        """Test cached reports are keyed by the states their annexure lists"""
+        assessment = make_assessment()
+        assert report_key(assessment, ["KA"]) != report_key(assessment, ["MH"])
+        assert report_key(assessment, ["KA"]) == report_key(assessment, ["KA", "KL"])
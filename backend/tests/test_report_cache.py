@@ -0,0 +1,202 @@
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import db
+from app.pdf_pool import pdf_render_pool
+from app.questions_data import get_all_questions
+from app.report_cache import ReportCache, report_cache, report_key
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.audit_logs = {}
+    db.outbox = {}
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.audit_logs = {}
+    db.outbox = {}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Replace the render pool with one that writes a small PDF and records each render"""
+    rendered = []
+
+    async def render(assessment, output_path=None, operating_states=None):
+        rendered.append(assessment.id)
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.7 " + assessment.company_name.encode() + b" " * 1000)
+        return output_path
+
+    monkeypatch.setattr(pdf_render_pool, "available", True)
+    monkeypatch.setattr(pdf_render_pool, "render", render)
+    return rendered
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(report_cache, "cache_dir", str(tmp_path))
+    for counter in ("hits", "misses", "evictions", "joined", "prerendered", "prerenders_skipped"):
+        monkeypatch.setattr(report_cache, counter, 0)
+    return report_cache
+
+
+def create_assessment(company_name: str = "Report Co", email: str = "jo@example.com"):
+    answers = [
+        {"question_id": q.id, "answer_value": q.options[0].id, "score": q.options[0].score}
+        for q in get_all_questions() if q.options
+    ]
+    response = client.post("/api/v1/assessments", json={
+        "company_name": company_name,
+        "contact_name": "Jo",
+        "email": email,
+        "company_size": "10-50",
+        "answers": answers
+    })
+    return db.get_assessment(response.json()["id"])
+
+
+class TestReportKey:
+    def test_key_follows_content(self):
+        """Test the key changes with the assessment content"""
+        assessment = create_assessment()
+        changed = assessment.model_copy(update={"company_name": "Renamed Co"})
+        assert report_key(assessment) == report_key(assessment.model_copy())
+        assert report_key(assessment) != report_key(changed)
+
+    def test_key_ignores_pdf_url(self):
+        """Test recording where the PDF lives does not invalidate it"""
+        assessment = create_assessment()
+        assert report_key(assessment) == report_key(assessment.model_copy(update={"pdf_url": "/reports/x.pdf"}))
+
+    def test_key_follows_template_version(self, monkeypatch):
+        """Test a new report template version changes every key"""
+        assessment = create_assessment()
+        key = report_key(assessment)
+        monkeypatch.setattr("app.report_cache.REPORT_TEMPLATE_VERSION", "changed")
+        assert report_key(assessment) != key
+
+
+class TestReportCache:
+    def test_second_request_is_served_from_cache(self, renders, cache, monkeypatch):
+        """Test a report is rendered once and then served from disk"""
+        monkeypatch.setattr(cache, "prerender", lambda assessment: None)
+        assessment = create_assessment()
+        for _ in range(2):
+            response = client.post(f"/api/v1/reports/generate?assessment_id={assessment.id}")
+            assert response.status_code == 200
+            assert response.content.startswith(b"%PDF")
+        assert renders == [assessment.id]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["files"]) == (1, 1, 1)
+
+    async def test_changed_content_replaces_old_render(self, renders, cache):
+        """Test a render of new content removes the assessment's older file"""
+        assessment = create_assessment()
+        first = await cache.get_or_render(assessment)
+        second = await cache.get_or_render(assessment.model_copy(update={"company_name": "Renamed Co"}))
+        assert first != second
+        assert not os.path.exists(first)
+        assert len(renders) == 2
+
+    async def test_least_recently_used_are_evicted(self, renders, cache, tmp_path):
+        """Test the cache evicts the least recently used files past its size cap"""
+        cache = ReportCache(str(tmp_path / "lru"), max_bytes=2500)
+        first, second, third = create_assessment("One"), create_assessment("Two"), create_assessment("Three")
+        first_path = await cache.get_or_render(first)
+        second_path = await cache.get_or_render(second)
+        os.utime(first_path, (1, 1))
+        os.utime(second_path, (2, 2))
+        # A hit makes the first report the most recently used
+        assert await cache.get_or_render(first) == first_path
+        await cache.get_or_render(third)
+        assert os.path.exists(first_path)
+        assert not os.path.exists(second_path)
+        assert cache.stats()["evictions"] == 1
+
+    async def test_privacy_deletion_removes_cached_reports(self, renders, cache):
+        """Test deleting a user's data removes their cached reports"""
+        mine, theirs = create_assessment(email="jo@example.com"), create_assessment(email="sam@example.com")
+        mine_path = await cache.get_or_render(mine)
+        theirs_path = await cache.get_or_render(theirs)
+        response = client.post("/api/v1/privacy/delete-my-data", json={"email": "jo@example.com"})
+        assert response.status_code == 200
+        assert not os.path.exists(mine_path)
+        assert os.path.exists(theirs_path)
+
+    async def test_failed_render_leaves_no_file(self, monkeypatch, cache):
+        """Test a failed render caches nothing"""
+        async def render(assessment, output_path=None, operating_states=None):
+            with open(output_path, "wb") as f:
+                f.write(b"%PDF partial")
+            raise RuntimeError("layout failed")
+
+        monkeypatch.setattr(pdf_render_pool, "render", render)
+        with pytest.raises(RuntimeError):
+            await cache.get_or_render(create_assessment())
+        assert os.listdir(cache.cache_dir) == []
+
+
+class TestPrerender:
+    def test_submission_prerenders_report(self, renders, cache):
+        """Test a submitted assessment gets its report rendered and its pdf_url set"""
+        assessment = create_assessment()
+        assert renders == [assessment.id]
+        assert db.get_assessment(assessment.id).pdf_url == f"/api/v1/reports/generate?assessment_id={assessment.id}"
+        response = client.post(f"/api/v1/reports/generate?assessment_id={assessment.id}")
+        assert response.status_code == 200
+        assert renders == [assessment.id]
+        assert cache.stats()["hits"] == 1
+
+    def test_prerender_skipped_when_pool_is_busy(self, renders, cache, monkeypatch):
+        """Test pre-rendering yields to requested renders"""
+        monkeypatch.setattr(pdf_render_pool, "idle", lambda: False)
+        assessment = create_assessment()
+        assert renders == []
+        assert db.get_assessment(assessment.id).pdf_url is None
+        assert cache.stats()["prerenders_skipped"] == 1
+
+    async def test_download_waits_on_inflight_render(self, monkeypatch, cache):
+        """Test a download during a pre-render shares it instead of rendering again"""
+        started = asyncio.Event()
+        release = asyncio.Event()
+        rendered = []
+
+        async def render(assessment, output_path=None, operating_states=None):
+            rendered.append(assessment.id)
+            started.set()
+            await release.wait()
+            with open(output_path, "wb") as f:
+                f.write(b"%PDF-1.7")
+            return output_path
+
+        monkeypatch.setattr(pdf_render_pool, "render", render)
+        monkeypatch.setattr(pdf_render_pool, "available", False)
+        assessment = create_assessment()
+        monkeypatch.setattr(pdf_render_pool, "available", True)
+        prerender = asyncio.create_task(cache.prerender(assessment))
+        await started.wait()
+        download = asyncio.create_task(cache.get_or_render(assessment))
+        await asyncio.sleep(0)
+        release.set()
+        assert await download == await prerender
+        assert rendered == [assessment.id]
+        assert cache.stats()["joined"] == 1
+
+    async def test_prerender_of_deleted_assessment(self, renders, cache, monkeypatch):
+        """Test a report finishing after a privacy deletion is discarded"""
+        monkeypatch.setattr(pdf_render_pool, "available", False)
+        assessment = create_assessment()
+        monkeypatch.setattr(pdf_render_pool, "available", True)
+        db.delete_assessment(assessment.id)
+        assert await cache.prerender(assessment) is None
+        assert db.get_assessment(assessment.id) is None
+        assert os.listdir(cache.cache_dir) == []
@@ -0,0 +1,58 @@
+from app.search import NgramIndex, ngrams, trigram_similarity
+
+
+class TestNgramIndex:
+    def test_substring_lookup(self):
+        """Test documents are found by any substring of any field"""
+        index = NgramIndex()
+        index.add("1", "Acme Widgets", "ops@acme.com")
+        index.add("2", "Globex", "hr@globex.com")
+
+        assert [doc_id for doc_id, _ in index.search("widg")] == ["1"]
+        assert [doc_id for doc_id, _ in index.search("@GLOBEX")] == ["2"]
+        assert index.search("initech") == []
+
+    def test_ngrams_must_be_contiguous(self):
+        """Test shared n-grams alone are not a match"""
+        index = NgramIndex()
+        index.add("1", "abcxbcd")
+
+        assert index.search("abcd") == []
+
+    def test_short_queries_scan(self):
+        """Test queries shorter than the n-gram size still match"""
+        index = NgramIndex()
+        index.add("1", "Acme")
+        index.add("2", "Globex")
+
+        assert [doc_id for doc_id, _ in index.search("ac")] == ["1"]
+
+    def test_remove_and_re_add(self):
+        """Test re-adding a document replaces its old postings"""
+        index = NgramIndex()
+        index.add("1", "Old Name")
+        index.add("1", "New Name")
+        assert index.search("old") == []
+
+        index.remove("1")
+        assert index.search("new") == []
+        assert len(index) == 0
+
+    def test_exact_match_ranks_first(self):
+        """Test ranking follows trigram similarity"""
+        index = NgramIndex()
+        index.add("long", "Acme International Holdings")
+        index.add("exact", "Acme")
+
+        assert [doc_id for doc_id, _ in index.search("acme")] == ["exact", "long"]
+
+
+class TestTrigramSimilarity:
+    def test_similarity_bounds(self):
+        """Test identical strings score 1 and unrelated strings 0"""
+        assert trigram_similarity("Acme", "acme") == 1.0
+        assert trigram_similarity("Acme", "xyz") == 0.0
+
+    def test_ngrams(self):
+        """Test n-grams are lowercased and unpadded"""
+        assert ngrams("AbCd") == {"abc", "bcd"}
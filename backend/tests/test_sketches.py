@@ -0,0 +1,73 @@
+import random
+from app.sketches import TDigest, assessment_metrics, summarize
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class TestTDigest:
+    def test_quantiles_are_close_to_exact(self):
+        """Test quantile estimates stay within a small error of the exact values"""
+        rng = random.Random(7)
+        values = [100 * rng.betavariate(2, 5) for _ in range(20000)]
+        digest = TDigest()
+        for value in values:
+            digest.add(value)
+
+        for q in (0.1, 0.5, 0.9):
+            assert abs(digest.quantile(q) - exact_quantile(values, q)) < 0.5
+        assert digest.count == 20000
+
+    def test_size_is_bounded(self):
+        """Test the digest keeps a bounded number of centroids"""
+        digest = TDigest()
+        for value in range(50000):
+            digest.add(float(value))
+        assert len(digest.to_dict()["means"]) <= digest.compression
+
+    def test_merge_matches_single_digest(self):
+        """Test merging per-day digests estimates the combined data"""
+        rng = random.Random(11)
+        values = [rng.uniform(0, 100) for _ in range(7000)]
+        merged = TDigest()
+        for day in range(7):
+            part = TDigest()
+            for value in values[day::7]:
+                part.add(value)
+            merged.merge(TDigest.from_dict(part.to_dict()))
+
+        assert merged.count == 7000
+        assert merged.min == min(values)
+        assert merged.max == max(values)
+        for q in (0.1, 0.5, 0.9):
+            assert abs(merged.quantile(q) - exact_quantile(values, q)) < 1.0
+
+    def test_small_inputs_are_exact_at_the_edges(self):
+        """Test small digests return observed values"""
+        digest = TDigest()
+        digest.add(42.0)
+        assert digest.quantile(0.1) == 42.0
+        assert digest.quantile(0.9) == 42.0
+
+        digest = TDigest()
+        for value in (10.0, 20.0, 30.0, 40.0, 50.0):
+            digest.add(value)
+        assert digest.quantile(0.5) == 30.0
+        assert digest.quantile(0.0) == 10.0
+        assert digest.quantile(1.0) == 50.0
+
+    def test_empty_digest(self):
+        """Test an empty digest has no quantiles"""
+        assert TDigest().quantile(0.5) is None
+        assert summarize(TDigest()).count == 0
+        assert TDigest.from_dict(None).count == 0
+
+    def test_assessment_metrics(self):
+        """Test stored assessment JSON maps to overall and category values"""
+        result = {
+            "overall_percentage": 55,
+            "category_scores": [{"category": "governance", "percentage": 30.0}],
+        }
+        assert assessment_metrics(result) == {"overall": 55.0, "governance": 30.0}
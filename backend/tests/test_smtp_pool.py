@@ -0,0 +1,149 @@
+import smtplib
+import socket
+import pytest
+from datetime import datetime
+from email.message import EmailMessage
+from app.circuit_breaker import BreakerState
+from app.email_service import email_service
+from app.models import OutboxKind, OutboxMessage
+from app.smtp_pool import SMTPPool
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class Handler:
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+        self.reply = "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reply.startswith("250"):
+            self.messages.append(envelope.content.decode())
+            self.peers.add(session.peer)
+        return self.reply
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = Handler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SMTPPool(smtp_server.hostname, smtp_server.port, starttls=False, size=2, idle_check_seconds=30)
+    yield pool
+    pool.close()
+
+
+def make_message(subject: str = "Hello") -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "noreply@example.com"
+    message["To"] = "inbox@example.com"
+    message["Subject"] = subject
+    message.set_content("Body")
+    return message
+
+
+class TestSMTPPool:
+    def test_sessions_are_reused(self, smtp_server, pool):
+        """Test consecutive sends share one connection"""
+        for i in range(5):
+            pool.send(make_message(f"Message {i}"))
+        assert len(smtp_server.handler.messages) == 5
+        assert len(smtp_server.handler.peers) == 1
+        assert pool.stats()["connects"] == 1
+        assert pool.stats()["idle"] == 1
+
+    def test_dropped_connection_is_replaced(self, smtp_server, pool):
+        """Test a session closed under the pool is reconnected and the message still sent"""
+        pool.send(make_message())
+        pool._idle.queue[0].conn.sock.shutdown(socket.SHUT_RDWR)
+
+        pool.send(make_message())
+        assert len(smtp_server.handler.messages) == 2
+        assert pool.stats()["reconnects"] == 1
+        assert pool.stats()["open"] == 1
+
+    def test_idle_health_check(self, smtp_server, pool):
+        """Test an idle session failing NOOP is replaced before use"""
+        pool.idle_check_seconds = 0
+        pool.send(make_message())
+        pool._idle.queue[0].conn.sock.shutdown(socket.SHUT_RDWR)
+
+        pool.send(make_message())
+        assert pool.stats()["health_check_failures"] == 1
+        assert pool.stats()["reconnects"] == 0
+
+    def test_sessions_are_retired(self, smtp_server, pool):
+        """Test a session is closed after max_messages"""
+        pool.max_messages = 2
+        for _ in range(3):
+            pool.send(make_message())
+        assert pool.stats()["connects"] == 2
+
+    def test_rejection_keeps_session(self, smtp_server, pool):
+        """Test a rejected message raises without discarding the session"""
+        smtp_server.handler.reply = "550 Rejected"
+        with pytest.raises(smtplib.SMTPDataError):
+            pool.send(make_message())
+        smtp_server.handler.reply = "250 OK"
+        pool.send(make_message())
+        assert pool.stats()["connects"] == 1
+
+
+class TestSMTPTransport:
+    @pytest.fixture(autouse=True)
+    def smtp_transport(self, monkeypatch, pool):
+        monkeypatch.setattr(email_service, "transport", "smtp")
+        monkeypatch.setattr(email_service, "smtp_pool", pool)
+        email_service.breaker.reset()
+        yield
+        email_service.breaker.reset()
+
+    def message(self, html: bool = False) -> OutboxMessage:
+        now = datetime.now()
+        return OutboxMessage(
+            id="m1", kind=OutboxKind.NOTIFICATION, recipient="inbox@example.com",
+            subject="New Compliance Check", body="<p>Hi</p>" if html else "Hi",
+            html=html, created_at=now, next_attempt_at=now
+        )
+
+    def test_deliver_over_smtp(self, smtp_server):
+        """Test outbox messages are delivered through the pool when SMTP is selected"""
+        assert email_service.deliver(self.message(html=True)) == (True, None)
+        [content] = smtp_server.handler.messages
+        assert "Subject: New Compliance Check" in content
+        assert "text/html" in content
+
+    def test_transient_reply_counts_against_breaker(self, smtp_server):
+        """Test 4xx replies count as provider failures and 5xx do not"""
+        smtp_server.handler.reply = "421 Try later"
+        for _ in range(5):
+            success, error = email_service.deliver(self.message())
+            assert not success
+        assert error.startswith("SMTP Error: 421")
+        assert email_service.breaker.state == BreakerState.OPEN
+
+        email_service.breaker.reset()
+        smtp_server.handler.reply = "550 No such user"
+        for _ in range(5):
+            email_service.deliver(self.message())
+        assert email_service.breaker.state == BreakerState.CLOSED
+
+    def test_stats_include_pool(self, smtp_server):
+        """Test email stats report the SMTP pool"""
+        email_service.deliver(self.message())
+        stats = email_service.stats()
+        assert stats["transport"] == "smtp"
+        assert stats["smtp_pool"]["sent"] == 1
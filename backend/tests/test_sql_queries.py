@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timedelta
+from app import database
+from app.admin_models import TrialFilters
+from app.funnel import STARTED
+from app.models import LeadStatus, RiskLevel
+from app.rollups import assessment_rollup
+
+postgresql = pytest.importorskip("sqlalchemy.dialects.postgresql")
+
+pytestmark = pytest.mark.skipif(database.create_engine is None, reason="SQLAlchemy is not installed")
+
+
+class RecordingSession:
+    """Collects executed statements instead of sending them to a database"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        return []
+
+    def commit(self):
+        pass
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    recorder = RecordingSession()
+    monkeypatch.setattr(database, "SessionLocal", lambda: recorder)
+    return recorder
+
+
+ALL_FILTERS = TrialFilters(
+    start_date=datetime(2024, 1, 1),
+    end_date=datetime(2024, 2, 1),
+    states=["Delhi"],
+    score_min=20,
+    score_max=80,
+    status=LeadStatus.STARTED,
+    search="acme_50%",
+)
+
+
+class TestPostgresStatements:
+    def test_trial_query(self):
+        """Test the filtered trial query compiles for Postgres"""
+        stmt = database._trial_query(ALL_FILTERS).order_by(*database._trial_order(ALL_FILTERS))
+        sql = compile_sql(stmt)
+        assert "?|" in sql
+        assert "jsonb_array_length" in sql
+        assert "ILIKE" in sql
+        assert "similarity" in sql
+
+    def test_trial_facets(self, session):
+        """Test the facet counts compile to one GROUPING SETS query"""
+        database.SQLDatabase.trial_facets(None, ALL_FILTERS)
+        [stmt] = session.statements
+        sql = compile_sql(stmt)
+        assert "GROUPING SETS" in sql
+        assert "jsonb_array_elements_text" in sql
+        assert "LATERAL" in sql
+
+    def test_rollup_upsert(self):
+        """Test rollup changes compile to an additive upsert"""
+        recorder = RecordingSession()
+        yesterday = datetime.now() - timedelta(days=1)
+        after = assessment_rollup(yesterday, 80.0, RiskLevel.HEALTHY, ["Delhi"], "technology")
+        database._apply_rollup_change(recorder, {}, after)
+        sql = compile_sql(recorder.statements[-1])
+        assert "ON CONFLICT (day, state, industry, risk_level) DO UPDATE" in sql
+        assert "excluded.assessment_count" in sql
+
+    def test_funnel_upsert(self):
+        """Test funnel counter changes compile to an additive upsert"""
+        recorder = RecordingSession()
+        database._apply_funnel_change(recorder, {}, {(STARTED, ""): 1})
+        sql = compile_sql(recorder.statements[-1])
+        assert "ON CONFLICT (step, key) DO UPDATE" in sql
+
+    def test_answer_count_upsert(self, session):
+        """Test answer counts compile to an additive upsert"""
+        database.SQLDatabase.record_answer_counts(None, "v1", [("q1", "a")], [("all", "")])
+        sql = compile_sql(session.statements[-1])
+        assert "ON CONFLICT (catalog_version, question_id, segment, segment_value, option_id) DO UPDATE" in sql
@@ -0,0 +1,402 @@
+import pytest
+import time
+import uuid
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.admin_models import SeriesBucket, SeriesGroupBy
+from app.database import db
+from app.email_service import email_service
+from app.models import AssessmentResult, CategoryScore, ComplianceCategory, Lead, RiskLevel
+from app.rollups import lead_rollup, rollup_delta, rollup_day, rollup_hour
+from app.statistics_service import StatisticsService, statistics_service, series_cache
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    """Reset database before each test"""
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.daily_rollups = {}
+    db.daily_sketches = {}
+    series_cache.clear()
+    yield
+    db.assessments = {}
+    db.leads = {}
+    db.in_progress_assessments = {}
+    db.audit_logs = {}
+    db.daily_rollups = {}
+    db.daily_sketches = {}
+    series_cache.clear()
+
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setenv("DISABLE_AUTH", "true")
+    return {"Authorization": "Bearer test-token"}
+
+
+def make_category(category: ComplianceCategory, percentage: float) -> CategoryScore:
+    return CategoryScore(
+        category=category,
+        score=int(percentage),
+        max_score=100,
+        percentage=percentage,
+        risk_level=RiskLevel.MODERATE,
+        issues=[],
+        recommendations=[],
+    )
+
+
+def make_assessment(percentage: float, days_ago: int = 0, risk=RiskLevel.MODERATE, category_scores=None) -> AssessmentResult:
+    assessment = AssessmentResult(
+        id=str(uuid.uuid4()),
+        submission_date=datetime.now() - timedelta(days=days_ago),
+        company_name="Acme",
+        contact_name="Jo",
+        email="jo@acme.com",
+        overall_score=int(percentage),
+        max_score=100,
+        overall_percentage=percentage,
+        overall_risk_level=risk,
+        category_scores=category_scores or [],
+        priority_actions=[],
+    )
+    return db.save_assessment(assessment)
+
+
+def make_lead(states, days_ago: int = 0, industry: str = "Tech", lead_id: str = None) -> Lead:
+    lead = Lead(
+        id=lead_id or str(uuid.uuid4()),
+        company_name="Acme",
+        contact_name="Jo",
+        email="jo@acme.com",
+        company_size="10-50",
+        industry=industry,
+        operating_states=states,
+        submission_date=datetime.now() - timedelta(days=days_ago),
+    )
+    return db.save_lead(lead)
+
+
+class TestRollupStatistics:
+    def test_weekly_statistics(self):
+        """Test the weekly digest numbers come from the last 7 days of rollups"""
+        make_assessment(40.0)
+        make_assessment(80.0, days_ago=3)
+        make_assessment(10.0, days_ago=30)
+        make_lead(["Delhi", "Karnataka"])
+        make_lead(["Delhi"], days_ago=2, industry="Retail")
+        make_lead(["Gujarat"], days_ago=30)
+
+        stats = statistics_service.get_weekly_statistics()
+        assert stats["total_assessments"] == 2
+        assert stats["avg_score"] == 60.0
+        assert stats["top_5_states"] == [("Delhi", 2), ("Karnataka", 1)]
+        assert stats["period_start"] < stats["period_end"]
+
+    def test_all_time_statistics(self):
+        """Test all-time statistics cover every day"""
+        make_assessment(40.0)
+        make_assessment(10.0, days_ago=300)
+        make_lead(["Gujarat"], days_ago=300)
+
+        stats = statistics_service.get_all_time_statistics()
+        assert stats["total_assessments"] == 2
+        assert stats["avg_score"] == 25.0
+        assert stats["top_5_states"] == [("Gujarat", 1)]
+
+    def test_resave_applies_only_the_difference(self):
+        """Test re-saving a record moves its contribution instead of adding it twice"""
+        assessment = make_assessment(40.0)
+        db.save_assessment(assessment.model_copy(update={"overall_percentage": 90.0}))
+        lead = make_lead(["Delhi"])
+        db.save_lead(lead.model_copy(update={"operating_states": ["Gujarat"]}))
+
+        stats = statistics_service.get_all_time_statistics()
+        assert stats["total_assessments"] == 1
+        assert stats["avg_score"] == 90.0
+        assert stats["top_5_states"] == [("Gujarat", 1)]
+
+    def test_delete_subtracts_contribution(self):
+        """Test deleted records no longer count"""
+        assessment = make_assessment(40.0)
+        make_assessment(60.0)
+        lead = make_lead(["Delhi"])
+        db.delete_assessment(assessment.id)
+        db.delete_lead(lead.id)
+
+        stats = statistics_service.get_all_time_statistics()
+        assert stats["total_assessments"] == 1
+        assert stats["avg_score"] == 60.0
+        assert stats["top_5_states"] == []
+
+    def test_scores_follow_lead_states_and_industry(self):
+        """Test an assessment's score is rolled up under its lead's states and industry"""
+        assessment = make_assessment(40.0)
+        make_lead(["Delhi", "Goa"], industry="Retail", lead_id=assessment.id)
+        make_lead(["Delhi"], industry="Tech", lead_id=make_assessment(80.0).id)
+        make_assessment(10.0)
+
+        stats = statistics_service.get_all_time_statistics()
+        assert stats["total_assessments"] == 3
+        assert stats["top_5_states"] == [("Delhi", 2), ("Goa", 1)]
+
+        today = rollup_day(datetime.now())
+        by_state = statistics_service.get_series(today, today, SeriesBucket.DAY, SeriesGroupBy.STATE)
+        assert [(p.group, p.assessment_count, p.avg_score) for p in by_state.points] == [("Delhi", 2, 60.0), ("Goa", 1, 40.0)]
+        by_industry = statistics_service.get_series(today, today, SeriesBucket.DAY, SeriesGroupBy.INDUSTRY)
+        assert [(p.group, p.assessment_count, p.avg_score) for p in by_industry.points] == [
+            ("Retail", 1, 40.0), ("Tech", 1, 80.0), (None, 1, 10.0)
+        ]
+
+    def test_lead_changes_move_its_score(self):
+        """Test changing or deleting a lead moves its assessment's score with it"""
+        assessment = make_assessment(40.0)
+        lead = make_lead(["Delhi"], lead_id=assessment.id)
+        db.save_lead(lead.model_copy(update={"operating_states": ["Goa"]}))
+        today = rollup_day(datetime.now())
+
+        def by_state():
+            series = statistics_service.get_series(today, today, SeriesBucket.DAY, SeriesGroupBy.STATE)
+            return [(p.group, p.assessment_count) for p in series.points if p.assessment_count]
+
+        assert by_state() == [("Goa", 1)]
+        db.delete_lead(lead.id)
+        assert by_state() == []
+        assert statistics_service.get_all_time_statistics()["total_assessments"] == 1
+
+    def test_backfill_matches_incremental_rollups(self):
+        """Test rebuilding from source rows gives the incrementally kept totals"""
+        assessment = make_assessment(40.0, days_ago=1)
+        db.save_assessment(assessment.model_copy(update={"overall_percentage": 70.0}))
+        make_assessment(55.0, days_ago=9)
+        make_lead(["Delhi", "Goa"], days_ago=1)
+        make_lead(["Goa"], days_ago=1, lead_id=make_assessment(65.0, days_ago=1).id)
+
+        incremental = [r for r in db.get_rollups() if r.assessment_count or r.lead_count]
+        db.rebuild_rollups()
+        assert db.get_rollups() == incremental
+
+
+class TestAggregateStatistics:
+    def test_aggregate_matches_rollups(self):
+        """Test both statistics sources agree"""
+        make_assessment(40.0)
+        make_assessment(80.0, days_ago=3)
+        make_assessment(10.0, days_ago=30)
+        make_lead(["Delhi", "Karnataka"])
+        make_lead(["Delhi", "Delhi"], days_ago=2)
+        make_lead(["Gujarat", "Karnataka", "Delhi"], days_ago=30)
+
+        aggregate = StatisticsService(source="aggregate")
+        for name in ("get_weekly_statistics", "get_all_time_statistics"):
+            expected = getattr(statistics_service, name)()
+            actual = getattr(aggregate, name)()
+            for key in ("total_assessments", "avg_score", "top_5_states"):
+                assert actual[key] == expected[key]
+
+    def test_aggregate_without_data(self):
+        """Test empty tables give zero counts"""
+        stats = StatisticsService(source="aggregate").get_weekly_statistics()
+        assert stats["total_assessments"] == 0
+        assert stats["avg_score"] == 0.0
+        assert stats["top_5_states"] == []
+
+
+class TestStatisticsSeries:
+    def test_daily_series_is_dense(self):
+        """Test every day in the range gets a point, empty days included"""
+        today = rollup_day(datetime.now())
+        make_assessment(40.0)
+        make_assessment(80.0)
+        make_lead(["Delhi"])
+
+        series = statistics_service.get_series(today - timedelta(days=2), today)
+        assert [p.bucket_start.date() for p in series.points] == [today - timedelta(days=d) for d in (2, 1, 0)]
+        assert [p.assessment_count for p in series.points] == [0, 0, 2]
+        assert series.points[-1].avg_score == 60.0
+        assert series.points[-1].score_stddev == 20.0
+        assert series.points[-1].lead_count == 1
+
+    def test_grouped_weekly_series(self):
+        """Test points are split by the group-by dimension"""
+        today = rollup_day(datetime.now())
+        make_lead(["Delhi", "Goa"])
+        make_lead(["Delhi"])
+
+        series = statistics_service.get_series(today, today, SeriesBucket.WEEK, SeriesGroupBy.STATE)
+        assert series.points[0].bucket_start.weekday() == 0
+        assert [(p.group, p.lead_count) for p in series.points] == [("Delhi", 2), ("Goa", 1)]
+
+    def test_hourly_series(self):
+        """Test hourly buckets are computed from source records"""
+        today = rollup_day(datetime.now())
+        make_assessment(50.0, risk=RiskLevel.HEALTHY)
+
+        series = statistics_service.get_series(today, today, SeriesBucket.HOUR, SeriesGroupBy.RISK_LEVEL)
+        assert len({p.bucket_start for p in series.points}) == 1
+        assert [(p.bucket_start, p.group, p.assessment_count) for p in series.points] == [
+            (rollup_hour(datetime.now()), "healthy", 1)
+        ]
+
+    def test_completed_buckets_are_cached(self):
+        """Test past buckets are served from cache while today is recomputed"""
+        today = rollup_day(datetime.now())
+        statistics_service.get_series(today - timedelta(days=1), today)
+
+        yesterday = (today - timedelta(days=1), "", "", "moderate")
+        db.daily_rollups[yesterday] = (1, 50.0, 2500.0, 0)
+        db.daily_rollups[(today, "", "", "moderate")] = (1, 50.0, 2500.0, 0)
+
+        series = statistics_service.get_series(today - timedelta(days=1), today)
+        assert [p.assessment_count for p in series.points] == [0, 1]
+
+    def test_cached_buckets_expire(self, monkeypatch):
+        """Test a past-day write made by another worker shows up once cached buckets expire"""
+        today = rollup_day(datetime.now())
+        statistics_service.get_series(today - timedelta(days=1), today)
+        # Written elsewhere: this worker's cache is not told
+        db.daily_rollups[(today - timedelta(days=1), "", "", "moderate")] = (1, 50.0, 2500.0, 0)
+
+        now = time.monotonic()
+        monkeypatch.setattr("app.cache.time.monotonic", lambda: now + series_cache.ttl_seconds + 1)
+        series = statistics_service.get_series(today - timedelta(days=1), today)
+        assert [p.assessment_count for p in series.points] == [1, 0]
+
+    def test_past_writes_invalidate_cached_buckets(self):
+        """Test a write to a past day clears the cached buckets"""
+        today = rollup_day(datetime.now())
+        start = today - timedelta(days=3)
+        statistics_service.get_series(start, today)
+
+        make_assessment(70.0, days_ago=2)
+
+        series = statistics_service.get_series(start, today)
+        assert sum(p.assessment_count for p in series.points) == 1
+
+    def test_series_endpoint(self, admin_headers):
+        """Test the series endpoint validates its range"""
+        today = rollup_day(datetime.now())
+        response = client.get(
+            "/api/v1/admin/statistics/series",
+            params={"start": str(today), "end": str(today), "bucket": "month", "group_by": "industry"},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["bucket"] == "month"
+
+        response = client.get(
+            "/api/v1/admin/statistics/series",
+            params={"start": str(today), "end": str(today - timedelta(days=1))},
+            headers=admin_headers,
+        )
+        assert response.status_code == 400
+
+
+class TestScoreDistribution:
+    def test_weekly_statistics_include_quantiles(self):
+        """Test the weekly digest numbers include score percentiles for the week only"""
+        for percentage in range(101):
+            make_assessment(float(percentage), days_ago=percentage % 3)
+        make_assessment(5.0, days_ago=30)
+
+        stats = statistics_service.get_weekly_statistics()
+        assert stats["score_p10"] == pytest.approx(10.0, abs=1.0)
+        assert stats["score_p50"] == 50.0
+        assert stats["score_p90"] == pytest.approx(90.0, abs=1.0)
+
+    def test_quantiles_without_data(self):
+        """Test empty periods report no percentiles"""
+        stats = statistics_service.get_all_time_statistics()
+        assert stats["score_p50"] is None
+
+    def test_distribution_per_category(self):
+        """Test the distribution covers the overall and each category percentage"""
+        today = rollup_day(datetime.now())
+        make_assessment(40.0, category_scores=[make_category(ComplianceCategory.GOVERNANCE, 20.0)])
+        make_assessment(60.0, days_ago=1, category_scores=[make_category(ComplianceCategory.GOVERNANCE, 80.0)])
+
+        distribution = statistics_service.get_distribution(today - timedelta(days=1), today)
+        assert set(distribution.metrics) == {"overall", "governance"}
+        assert distribution.metrics["overall"].count == 2
+        assert distribution.metrics["governance"].min == 20.0
+        assert distribution.metrics["governance"].max == 80.0
+
+        distribution = statistics_service.get_distribution(today, today)
+        assert distribution.metrics["governance"].p50 == 20.0
+
+    def test_resave_does_not_double_count(self):
+        """Test re-saving an assessment keeps a single value in the sketches"""
+        assessment = make_assessment(40.0)
+        db.save_assessment(assessment)
+
+        stats = statistics_service.get_all_time_statistics()
+        assert db.get_score_sketches()["overall"].count == 1
+        assert stats["score_p50"] == 40.0
+
+    def test_delete_rebuilds_the_day(self):
+        """Test deleting an assessment removes its value from its day's sketches"""
+        kept = make_assessment(40.0, category_scores=[make_category(ComplianceCategory.GOVERNANCE, 20.0)])
+        deleted = make_assessment(90.0, category_scores=[make_category(ComplianceCategory.LABOUR_FILINGS, 80.0)])
+        make_assessment(10.0, days_ago=2)
+
+        assert db.delete_assessment(deleted.id)
+        sketches = db.get_score_sketches(rollup_day(kept.submission_date), rollup_day(kept.submission_date))
+        assert set(sketches) == {"overall", "governance"}
+        assert sketches["overall"].count == 1
+        assert sketches["overall"].max == 40.0
+        assert db.get_score_sketches()["overall"].count == 2
+
+    def test_backfill_rebuilds_sketches(self):
+        """Test rebuilding sketches from stored assessments gives the same quantiles"""
+        for percentage in (10.0, 35.0, 70.0):
+            make_assessment(percentage, days_ago=2)
+        before = statistics_service.get_all_time_statistics()
+        db.daily_sketches = {}
+        assert db.rebuild_sketches() == 1
+        assert statistics_service.get_all_time_statistics() == before
+
+    def test_digest_renders_quantiles(self):
+        """Test the digest email shows the score percentiles"""
+        make_assessment(40.0)
+        html = email_service._render_digest_template(statistics_service.get_weekly_statistics())
+        assert "Score Distribution" in html
+        assert "40.0%" in html
+
+    def test_distribution_endpoint(self, admin_headers):
+        """Test the distribution endpoint validates its range"""
+        today = rollup_day(datetime.now())
+        make_assessment(40.0)
+        response = client.get(
+            "/api/v1/admin/statistics/distribution",
+            params={"start": str(today), "end": str(today)},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["metrics"]["overall"]["p50"] == 40.0
+
+        response = client.get(
+            "/api/v1/admin/statistics/distribution",
+            params={"start": str(today), "end": str(today - timedelta(days=1))},
+            headers=admin_headers,
+        )
+        assert response.status_code == 400
+
+
+class TestRollupDelta:
+    def test_unchanged_record_has_no_delta(self):
+        """Test saving an identical record writes nothing"""
+        contribution = lead_rollup(datetime(2024, 1, 15, 10, 30), ["Delhi"], "Tech", None)
+        assert rollup_delta(contribution, contribution) == {}
+
+    def test_state_change_moves_count(self):
+        """Test a changed state moves the lead count between keys"""
+        when = datetime(2024, 1, 15, 10, 30)
+        delta = rollup_delta(lead_rollup(when, ["Delhi"], None, None), lead_rollup(when, ["Goa"], None, None))
+        day = rollup_day(when)
+        assert delta == {(day, "Goa", "", ""): (0, 0.0, 0.0, 1), (day, "Delhi", "", ""): (0, 0.0, 0.0, -1)}
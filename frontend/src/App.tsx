@@ -42,6 +42,7 @@ function App() {
     business_age: "",
     consent: false,
   });
+  const [leadId, setLeadId] = useState<string | null>(null);
   const [result, setResult] = useState<AssessmentResult | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -103,7 +104,8 @@ function App() {
     setError(null);
     setEmailError(null);
     try {
-      await startAssessment(contactInfo);
+      const lead = await startAssessment(contactInfo);
+      setLeadId(lead.id);
       trackStartAssessment({
         company_name: contactInfo.company_name,
         industry: contactInfo.industry,
@@ -175,6 +177,7 @@ function App() {
         company_size: contactInfo.employee_range,
         industry: contactInfo.industry,
         answers: answers,
+        lead_id: leadId ?? undefined,
       };
       const assessmentResult = await submitAssessment(submission);
       setResult(assessmentResult);
@@ -218,6 +218,26 @@ describe('App Component', () => {
       
       expect(option1).toBeChecked();
     });
+
+    it('submits the answers under the started lead', async () => {
+      await waitFor(() => {
+        expect(screen.getByText('Test Question 1')).toBeInTheDocument();
+      });
+
+      fireEvent.click(screen.getByLabelText('Option 1'));
+      fireEvent.click(screen.getByRole('button', { name: /next/i }));
+      await waitFor(() => {
+        expect(screen.getByText('Test Question 2')).toBeInTheDocument();
+      });
+      fireEvent.click(screen.getByLabelText('Option 3'));
+      fireEvent.click(screen.getByRole('button', { name: /submit assessment/i }));
+
+      await waitFor(() => {
+        expect(api.submitAssessment).toHaveBeenCalledWith(
+          expect.objectContaining({ lead_id: 'lead-123' })
+        );
+      });
+    });
   });
 
   describe('Error Handling', () => {
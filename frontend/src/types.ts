@@ -62,6 +62,7 @@ export interface AssessmentSubmission {
   company_size: string;
   industry?: string;
   answers: Answer[];
+  lead_id?: string;
 }
 
 export interface CategoryScore {